@@ -103,6 +103,29 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+#
+# The `journal` cache holds the serialized program and workout trees. Keys
+# carry the user's catalog version, which is kept in the database and bumped by
+# the journal's signal handlers, so a stale tree is never read again and simply
+# expires. Each process can therefore keep its own locmem cache; a shared
+# backend, e.g., 'django.core.cache.backends.redis.RedisCache' with
+# 'redis://127.0.0.1:6379' (which needs the redis package), only saves the
+# workers from building the same trees separately.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'journal': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'journal-trees',
+        'TIMEOUT': 60 * 60 * 24,
+    },
+}
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.0/topics/i18n/
 
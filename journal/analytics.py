@@ -0,0 +1,262 @@
+"""
+Progression analytics over a single exercise's history, served by the
+`exerciseAnalytics` view.
+
+The exercise's entries are read with a single query straight into contiguous
+NumPy arrays and collapsed into one point per training day (a session). Every
+statistic is then computed over whole arrays at once instead of entry by
+entry, so that histories of tens of thousands of entries are analysed in a few
+milliseconds.
+
+The one rep max estimates follow `PersonalRecord.set_metrics()`: sets of zero
+reps lifted nothing and are left out, and the Brzycki formula is undefined from
+37 reps on.
+"""
+from collections import namedtuple
+
+from django.db.models import FloatField
+from django.db.models.functions import Cast
+
+import numpy as np
+
+
+# default number of sessions averaged by the moving average
+MOVING_AVERAGE_WINDOW = 5
+
+# default number of sessions without a new best estimated 1RM making a plateau
+PLATEAU_SESSIONS = 6
+
+TRENDS = ("linear", "robust")
+
+# the robust trend is a Huber regression, fitted by iteratively reweighted
+# least squares; the constant is in units of the residuals' robust scale
+HUBER_K = 1.345
+ROBUST_ITERATIONS = 20
+
+History = namedtuple("History", ["dates", "sets", "reps", "intensity"])
+
+Sessions = namedtuple("Sessions", [
+    "dates", "entries", "max_intensity", "epley_1rm", "brzycki_1rm", "volume"
+])
+
+
+def load_history(entries):
+    """
+    Reads the given entries, in order of their dates, into a `History` of
+    parallel arrays.
+
+    The intensities are cast to floats by the database, which saves building a
+    `Decimal` for every entry only to convert it right away.
+    """
+    rows = list(entries.order_by("timestamp").values_list(
+        "timestamp", "sets", "reps", Cast("intensity", FloatField())
+    ))
+    dates, sets, reps, intensity = zip(*rows) if rows else ((), (), (), ())
+    return History(
+        dates=np.array(dates, dtype="datetime64[D]"),
+        sets=np.array(sets, dtype=np.float64),
+        reps=np.array(reps, dtype=np.float64),
+        intensity=np.array(intensity, dtype=np.float64)
+    )
+
+
+def epley_1rm(reps, intensity):
+    """
+    Returns the Epley one rep max estimate of each set, NaN where no reps were
+    done.
+    """
+    estimate = np.where(reps == 1, intensity, intensity * (1 + reps / 30))
+    return np.where(reps == 0, np.nan, estimate)
+
+
+def brzycki_1rm(reps, intensity):
+    """
+    Returns the Brzycki one rep max estimate of each set, NaN where no reps
+    were done or where the formula breaks down.
+    """
+    valid = (reps > 0) & (reps < 37)
+    # the invalid sets are divided by one, only to be masked out afterwards
+    return np.where(valid, intensity * 36 / np.where(valid, 37 - reps, 1), np.nan)
+
+
+def sessions(history):
+    """
+    Collapses a history into one point per day: the number of entries, the
+    heaviest intensity lifted, the best one rep max estimates and the total
+    volume (sets x reps x intensity).
+    """
+    dates = history.dates
+    if not len(dates):
+        empty = np.empty(0)
+        return Sessions(dates, np.empty(0, dtype=np.int64), empty, empty, empty, empty)
+
+    # the history is ordered by date, so every day is a contiguous run
+    starts = np.flatnonzero(np.concatenate(([True], dates[1:] != dates[:-1])))
+    lifted = np.where(history.reps > 0, history.intensity, np.nan)
+
+    return Sessions(
+        dates=dates[starts],
+        entries=np.diff(np.append(starts, len(dates))),
+        max_intensity=np.fmax.reduceat(lifted, starts),
+        epley_1rm=np.fmax.reduceat(epley_1rm(history.reps, history.intensity), starts),
+        brzycki_1rm=np.fmax.reduceat(brzycki_1rm(history.reps, history.intensity), starts),
+        volume=np.add.reduceat(history.sets * history.reps * history.intensity, starts)
+    )
+
+
+def moving_average(values, window):
+    """
+    Returns the trailing moving average of the values over `window` points,
+    skipping NaNs. The first points are averaged over as many points as there
+    are so far.
+    """
+    valid = ~np.isnan(values)
+    sums = np.concatenate(([0.0], np.cumsum(np.where(valid, values, 0.0))))
+    counts = np.concatenate(([0], np.cumsum(valid)))
+
+    upper = np.arange(1, len(values) + 1)
+    lower = np.maximum(upper - window, 0)
+    with np.errstate(invalid="ignore"):
+        return (sums[upper] - sums[lower]) / (counts[upper] - counts[lower])
+
+
+def _weighted_fit(x, y, weights):
+    """
+    Returns the (slope, intercept) of the weighted least squares line through
+    the points, or None if all of them share the same x.
+    """
+    total = weights.sum()
+    x_mean = weights @ x / total
+    y_mean = weights @ y / total
+    dx = x - x_mean
+    spread = weights @ (dx * dx)
+    if spread <= 0:
+        return None
+    slope = weights @ (dx * (y - y_mean)) / spread
+    return slope, y_mean - slope * x_mean
+
+
+def linear_trend(x, y):
+    """
+    Returns the (slope, intercept) of the least squares line through the
+    points, or None if there isn't one.
+    """
+    return _weighted_fit(x, y, np.ones_like(x))
+
+
+def robust_trend(x, y):
+    """
+    Returns the (slope, intercept) of a Huber regression line through the
+    points, which unlike the least squares line isn't dragged around by a few
+    outlying sessions (a botched day or a mislogged weight), or None if there
+    isn't one.
+    """
+    fit = linear_trend(x, y)
+    for _ in range(ROBUST_ITERATIONS):
+        if fit is None:
+            break
+        residuals = np.abs(y - (fit[0] * x + fit[1]))
+        # median absolute deviation, scaled to match the standard deviation
+        scale = np.median(residuals) / 0.6745
+        if scale <= 0:
+            break
+
+        weights = 1 / np.maximum(residuals / (HUBER_K * scale), 1)
+        previous, fit = fit, _weighted_fit(x, y, weights)
+        if fit is not None and np.allclose(fit, previous, rtol=1e-6, atol=1e-9):
+            break
+    return fit
+
+
+def plateaus(values, min_sessions):
+    """
+    Finds the stretches in which no new best value was set for at least
+    `min_sessions` sessions.
+
+    Returns three arrays: the index of the best session starting each stretch,
+    the index of the stretch's last session, and the number of sessions after
+    the best in the stretch.
+    """
+    best = np.fmax.accumulate(values)
+    previous = np.concatenate(([-np.inf], np.nan_to_num(best[:-1], nan=-np.inf)))
+    # NaNs compare as false, so sessions without an estimate never set a best
+    records = np.flatnonzero(values > previous)
+
+    # each stretch runs up to the session before the next best, or to the end
+    ends = np.append(records[1:], len(values))[:len(records)] - 1
+    lengths = ends - records
+    stretch = lengths >= min_sessions
+    return records[stretch], ends[stretch], lengths[stretch]
+
+
+def _to_list(values):
+    """
+    Returns the values rounded to two decimals, as a list with None for NaN.
+    """
+    return [None if value != value else value for value in np.round(values, 2).tolist()]
+
+
+def _trend_serialize(method, days, values):
+    known = ~np.isnan(values)
+    x, y = days[known], values[known]
+    if len(x) < 2:
+        return None
+
+    fit = (robust_trend if method == "robust" else linear_trend)(x, y)
+    if fit is None:
+        return None
+
+    slope, intercept = fit
+    start, end = intercept + slope * x[0], intercept + slope * x[-1]
+    return {
+        "method": method,
+        "slopePerWeek": round(float(slope * 7), 2),
+        "start": round(float(start), 2),
+        "end": round(float(end), 2),
+        "changePercent": round(float((end - start) / start * 100), 2) if start > 0 else None
+    }
+
+
+def analyze(history, window=MOVING_AVERAGE_WINDOW, trend="linear",
+            plateau=PLATEAU_SESSIONS):
+    """
+    Returns the JSON ready analysis of a history: its sessions as parallel
+    arrays, with the dates as plain YYYY-MM-DD strings and a missing estimate
+    as None, the moving average of the best Epley estimate over `window`
+    sessions, the `trend` (linear or robust) of that estimate, and the
+    plateaus of at least `plateau` sessions in it.
+    """
+    daily = sessions(history)
+    dates = daily.dates.astype(str).tolist()
+
+    if dates:
+        days = (daily.dates - daily.dates[0]).astype(np.float64)
+    else:
+        days = np.empty(0)
+
+    starts, ends, lengths = plateaus(daily.epley_1rm, plateau)
+    periods = [{
+        "start": dates[start],
+        "end": dates[end],
+        "sessions": int(length),
+        "best": round(float(daily.epley_1rm[start]), 2)
+        } for start, end, length in zip(starts, ends, lengths)]
+
+    return {
+        "entryCount": len(history.dates),
+        "sessionCount": len(dates),
+        "sessions": {
+            "date": dates,
+            "entries": daily.entries.tolist(),
+            "maxIntensity": _to_list(daily.max_intensity),
+            "epley1rm": _to_list(daily.epley_1rm),
+            "brzycki1rm": _to_list(daily.brzycki_1rm),
+            "volume": _to_list(daily.volume),
+            "movingAverage": _to_list(moving_average(daily.epley_1rm, window))
+        },
+        "window": window,
+        "trend": _trend_serialize(trend, days, daily.epley_1rm),
+        "plateaus": periods,
+        # the latest stretch is still going if it runs up to the last session
+        "plateaued": bool(len(ends)) and int(ends[-1]) == len(dates) - 1
+    }
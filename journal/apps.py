@@ -1,6 +1,19 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_migrate, post_save
 
 
 class JournalConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'journal'
+
+    def ready(self):
+        # connect the signal handlers which keep the derived tables in sync
+        from . import signals
+
+        # the reference data registry is filled lazily on first use, since the
+        # tables may not exist yet (or be empty) while the app is starting up
+        from .registry import registry
+        for model in (self.get_model("BodyPart"), self.get_model("Day")):
+            post_save.connect(registry.invalidate, sender=model, weak=False)
+            post_delete.connect(registry.invalidate, sender=model, weak=False)
+        post_migrate.connect(registry.invalidate, weak=False)
@@ -0,0 +1,41 @@
+"""
+Cache of the serialized program and workout trees returned by the
+`programWorkouts` and `workoutExercises` views.
+
+The trees are stored per user in the `journal` cache, keyed on the user's
+catalog version, which the signal handlers in signals.py bump whenever anything
+the trees are built from changes. A tree cached before a change is never read
+again by any process and simply expires, so every worker can keep a cache of
+its own.
+"""
+from django.core.cache import caches
+
+import hashlib
+
+
+CACHE_ALIAS = "journal"
+
+
+def tree_key(kind, user, object_id):
+    """
+    Returns the cache key of a user's program or workout tree, as of the user's
+    current catalog version.
+    """
+    digest = hashlib.sha1(str(user.pk).encode()).hexdigest()
+    return f"tree:{kind}:{digest}:{user.catalog_version}:{object_id}"
+
+
+def get_tree(kind, user, object_id):
+    return caches[CACHE_ALIAS].get(tree_key(kind, user, object_id))
+
+
+def set_tree(kind, user, object_id, tree):
+    caches[CACHE_ALIAS].set(tree_key(kind, user, object_id), tree)
+
+
+async def aget_tree(kind, user, object_id):
+    return await caches[CACHE_ALIAS].aget(tree_key(kind, user, object_id))
+
+
+async def aset_tree(kind, user, object_id, tree):
+    await caches[CACHE_ALIAS].aset(tree_key(kind, user, object_id), tree)
@@ -0,0 +1,98 @@
+from asgiref.sync import iscoroutinefunction
+from django.contrib.auth.decorators import login_required as sync_login_required
+from django.contrib.auth.views import redirect_to_login
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from functools import wraps
+
+import datetime
+import hashlib
+
+
+def login_required(view_func):
+    """
+    Django's `login_required` which also accepts async views.
+
+    For async views the user is loaded on the event loop with `request.auser()`
+    and stored on the request, so that the view and the decorators below it can
+    read `request.user` without a synchronous query.
+    """
+    if not iscoroutinefunction(view_func):
+        return sync_login_required(view_func)
+
+    @wraps(view_func)
+    async def wrapper(request, *args, **kwargs):
+        request.user = await request.auser()
+        if not request.user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await view_func(request, *args, **kwargs)
+
+    return wrapper
+
+
+def data_version_etag(request, *args, **kwargs):
+    """
+    Returns the ETag of the user's data as of its current version.
+
+    Today's date is part of the tag since the read views fall back to ranges
+    relative to it.
+    """
+    user = request.user
+    tag = f"{user.pk}:{user.data_version}:{datetime.date.today().isoformat()}"
+    return '"' + hashlib.sha1(tag.encode()).hexdigest() + '"'
+
+
+def etag_data_version(view_func):
+    """
+    Decorator for read views which tags their responses with the user's data
+    version, and answers requests whose `If-None-Match` still matches it with
+    a 304 before running the view.
+
+    The responses are marked to be revalidated on every use, so that clients
+    never see a stale copy after the data changes.
+    """
+    conditional_view = condition(etag_func=data_version_etag)(view_func)
+
+    def revalidate(request, response):
+        if request.method in ("GET", "HEAD"):
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def wrapper(request, *args, **kwargs):
+            return revalidate(request, await conditional_view(request, *args, **kwargs))
+    else:
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            return revalidate(request, conditional_view(request, *args, **kwargs))
+
+    return wrapper
+
+
+def bumps_data_version(view_func):
+    """
+    Decorator for views which modify the user's data. Bumps the user's data
+    version after every successful non-GET request.
+    """
+    def bumps(request, response):
+        return (request.method not in ("GET", "HEAD", "OPTIONS") and
+                response.status_code < 400 and request.user.is_authenticated)
+
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def wrapper(request, *args, **kwargs):
+            response = await view_func(request, *args, **kwargs)
+            if bumps(request, response):
+                await request.user.abump_data_version()
+            return response
+    else:
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            response = view_func(request, *args, **kwargs)
+            if bumps(request, response):
+                request.user.bump_data_version()
+            return response
+
+    return wrapper
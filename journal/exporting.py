@@ -0,0 +1,302 @@
+"""
+Streaming export of a user's whole journal, used by the `exportJournal` view
+and the `export_journal` command.
+
+The programs, workouts, exercises and entries are written one record per row,
+as NDJSON (one JSON object per line) or as CSV with a column for every field
+of every kind, each row filling in its kind's fields. Entries carry the same
+fields as the logs taken by importing.py, which skips the rows of the other
+kinds, so an export can be imported again to restore its entries, along with
+their exercises by name. An entry whose exercise was deleted has no name to
+be imported by, and rejects the import.
+
+The rows are read in chunks through server-side cursors and encoded as they
+come, so an export of any size is written in constant memory. Every exporter
+has an async twin reading through `aiterator()`, so that the ASGI handler can
+stream the export instead of buffering it whole.
+"""
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch
+
+import csv
+import itertools
+import json
+
+from .models import Day, Entry, Exercise, Program, Workout
+
+
+FORMATS = ("csv", "ndjson")
+
+KINDS = ("program", "workout", "exercise", "entry")
+
+CONTENT_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson"
+}
+
+# rows read from the database at a time
+CHUNK_SIZE = 2000
+
+# records encoded into each chunk of the output
+RECORDS_PER_CHUNK = 500
+
+CSV_COLUMNS = (
+    "type", "id", "name", "description", "program", "days", "workouts",
+    "bodyparts", "date", "exercise", "exerciseId", "sets", "reps", "intensity"
+)
+
+# separates the items of list fields within a CSV cell
+CSV_LIST_SEPARATOR = ";"
+
+
+def rows(queryset, fields):
+    """
+    Yields the given fields of the queryset's objects as tuples.
+    """
+    return queryset.values_list(*fields).iterator(chunk_size=CHUNK_SIZE)
+
+
+async def arows(queryset, fields):
+    """
+    Async version of `rows()`.
+    """
+    # values_list() runs its query as soon as its iterable is created, which
+    # aiterator() does on the event loop, so the rows are read as dicts
+    async for row in queryset.values(*fields).aiterator(chunk_size=CHUNK_SIZE):
+        yield tuple(row.values())
+
+
+PROGRAM_FIELDS = ("id", "name", "description")
+
+
+def program_rows(user):
+    return Program.objects.filter(trainee=user).order_by("name", "id")
+
+
+def program_record(row):
+    id, name, description = row
+    return {"type": "program", "id": id, "name": name, "description": description}
+
+
+def programs(user):
+    for row in rows(program_rows(user), PROGRAM_FIELDS):
+        yield program_record(row)
+
+
+async def aprograms(user):
+    async for row in arows(program_rows(user), PROGRAM_FIELDS):
+        yield program_record(row)
+
+
+# one row per day of each workout, which are grouped back together
+WORKOUT_FIELDS = ("id", "name", "program_id", "day__day")
+
+
+def workout_rows(user):
+    return Workout.objects.filter(trainee=user).order_by("id", "day__day")
+
+
+def workout_record(days):
+    """
+    Returns the record of a workout, given all of its rows.
+    """
+    id, name, program, _ = days[0]
+    return {
+        "type": "workout",
+        "id": id,
+        "name": name,
+        "program": program,
+        "days": [Day.DayChoices(row[3]).label for row in days if row[3] is not None]
+    }
+
+
+def workouts(user):
+    for _, days in itertools.groupby(
+        rows(workout_rows(user), WORKOUT_FIELDS), lambda row : row[0]
+        ):
+        yield workout_record(list(days))
+
+
+async def aworkouts(user):
+    days = []
+    async for row in arows(workout_rows(user), WORKOUT_FIELDS):
+        if days and row[0] != days[0][0]:
+            yield workout_record(days)
+            days = []
+        days.append(row)
+    if days:
+        yield workout_record(days)
+
+
+def exercise_rows(user):
+    # joining both links would multiply the rows, so they're prefetched for
+    # every chunk instead
+    return Exercise.objects.filter(trainee=user).order_by("name", "id").only(
+        "id", "name", "description"
+    ).prefetch_related(
+        Prefetch("workout", queryset=Workout.objects.only("id")),
+        "body_part"
+    )
+
+
+def exercise_record(exercise):
+    return {
+        "type": "exercise",
+        "id": exercise.id,
+        "name": exercise.name,
+        "description": exercise.description,
+        "workouts": [workout.id for workout in exercise.workout.all()],
+        "bodyparts": [part.name for part in exercise.body_part.all()]
+    }
+
+
+def exercises(user):
+    for exercise in exercise_rows(user).iterator(chunk_size=CHUNK_SIZE):
+        yield exercise_record(exercise)
+
+
+async def aexercises(user):
+    async for exercise in exercise_rows(user).aiterator(chunk_size=CHUNK_SIZE):
+        yield exercise_record(exercise)
+
+
+ENTRY_FIELDS = ("id", "timestamp", "exercise__name", "exercise_id", "sets", "reps", "intensity")
+
+
+def entry_rows(user):
+    return Entry.objects.filter(trainee=user).order_by("timestamp", "id")
+
+
+def entry_record(row):
+    id, date, name, exercise, sets, reps, intensity = row
+    return {
+        "type": "entry",
+        "id": id,
+        "date": date,
+        "exercise": name,
+        "exerciseId": exercise,
+        "sets": sets,
+        "reps": reps,
+        "intensity": intensity
+    }
+
+
+def entries(user):
+    for row in rows(entry_rows(user), ENTRY_FIELDS):
+        yield entry_record(row)
+
+
+async def aentries(user):
+    async for row in arows(entry_rows(user), ENTRY_FIELDS):
+        yield entry_record(row)
+
+
+EXPORTERS = {
+    "program": programs,
+    "workout": workouts,
+    "exercise": exercises,
+    "entry": entries
+}
+
+ASYNC_EXPORTERS = {
+    "program": aprograms,
+    "workout": aworkouts,
+    "exercise": aexercises,
+    "entry": aentries
+}
+
+
+def records(user, kinds=KINDS):
+    """
+    Yields the records of the given kinds of the user's objects, one kind
+    after another.
+    """
+    for kind in kinds:
+        yield from EXPORTERS[kind](user)
+
+
+async def arecords(user, kinds=KINDS):
+    """
+    Async version of `records()`.
+    """
+    for kind in kinds:
+        async for record in ASYNC_EXPORTERS[kind](user):
+            yield record
+
+
+class Echo:
+    """
+    File-like object handing back whatever is written to it, so that a CSV
+    writer returns its rows instead of buffering them.
+    """
+    def write(self, value):
+        return value
+
+
+def csv_row(record):
+    row = []
+    for column in CSV_COLUMNS:
+        value = record.get(column)
+        if value is None:
+            value = ""
+        elif isinstance(value, list):
+            value = CSV_LIST_SEPARATOR.join(str(item) for item in value)
+        row.append(value)
+    return row
+
+
+def encoder(format):
+    """
+    Returns the header of the given format, if it has one, and the function
+    encoding a record into a line of it.
+    """
+    if format == "csv":
+        writer = csv.writer(Echo())
+        return writer.writerow(CSV_COLUMNS), lambda record : writer.writerow(csv_row(record))
+    return None, lambda record : json.dumps(record, cls=DjangoJSONEncoder) + "\n"
+
+
+def encode(records, format):
+    """
+    Yields the records encoded in the given format, a chunk of rows at a time.
+    """
+    header, line = encoder(format)
+    if header is not None:
+        yield header
+
+    records = iter(records)
+    while chunk := list(itertools.islice(records, RECORDS_PER_CHUNK)):
+        yield "".join(line(record) for record in chunk)
+
+
+async def aencode(records, format):
+    """
+    Async version of `encode()`, taking an async iterable of records.
+    """
+    header, line = encoder(format)
+    if header is not None:
+        yield header
+
+    chunk = []
+    async for record in records:
+        chunk.append(line(record))
+        if len(chunk) == RECORDS_PER_CHUNK:
+            yield "".join(chunk)
+            chunk = []
+    if chunk:
+        yield "".join(chunk)
+
+
+def export(user, format, kinds=KINDS):
+    """
+    Yields the user's journal (or only the given kinds of objects in it),
+    encoded in the given format, a chunk at a time.
+    """
+    return encode(records(user, kinds), format)
+
+
+def aexport(user, format, kinds=KINDS):
+    """
+    Async version of `export()`.
+    """
+    return aencode(arecords(user, kinds), format)
@@ -0,0 +1,242 @@
+"""
+Bulk import of historical training logs, used by the `import_logs` command and
+the `importEntries` view.
+
+A log is a CSV file with a header row or an NDJSON file (one JSON object per
+line), each row holding a set's `date` (YYYY-MM-DD), `exercise` name, `sets`,
+`reps` and `intensity`. Exercises are matched by name, ignoring case, and the
+ones the user doesn't have yet are created along the way. Rows whose `type` is
+given and isn't `entry`, i.e. the programs, workouts and exercises of a full
+export (see exporting.py), are skipped.
+
+The file is streamed twice: once to validate every row, so that a bad row
+doesn't leave half of the log imported, and once to insert the entries in
+batches, each in its own transaction. Only a single batch and the map of
+exercise names are held in memory, however long the log is.
+"""
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+
+import csv
+import datetime
+import json
+
+from .models import ChangeLog, Entry, Exercise, User
+
+
+FORMATS = ("csv", "ndjson")
+
+# entries inserted per transaction
+BATCH_SIZE = 2000
+
+FIELDS = ("date", "exercise", "sets", "reps", "intensity")
+
+# the largest value a PositiveSmallIntegerField holds on every database
+MAX_COUNT = 32767
+
+# the largest intensity fitting Entry.intensity's six digits
+MAX_INTENSITY = Decimal("9999.99")
+
+CENTS = Decimal("0.01")
+
+
+class LogError(ValueError):
+    """
+    Raised for a log which can't be imported, naming the offending line.
+    """
+    def __init__(self, line, message):
+        super().__init__(f"Line {line}: {message}")
+        self.line = line
+
+
+def guess_format(filename):
+    """
+    Returns the log format matching the file's extension, or None.
+    """
+    extension = filename.rpartition(".")[2].lower()
+    if extension == "csv":
+        return "csv"
+    if extension in ("ndjson", "jsonl"):
+        return "ndjson"
+    return None
+
+
+def is_entry(row):
+    """
+    Returns whether a row is an entry, which is any row without a `type`.
+    """
+    return row.get("type") in (None, "", "entry")
+
+
+def read_rows(lines, format):
+    """
+    Yields the (line number, row) pairs of the entries of a log, given as an
+    iterable of text lines.
+    """
+    if format == "csv":
+        reader = csv.DictReader(lines)
+        missing = set(FIELDS) - set(reader.fieldnames or ())
+        if missing:
+            raise LogError(1, f"Missing column(s) {', '.join(sorted(missing))}")
+        for row in reader:
+            if is_entry(row):
+                yield reader.line_num, row
+        return
+
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            raise LogError(number, "Invalid JSON")
+        if not isinstance(row, dict):
+            raise LogError(number, "Row must be an object")
+        if is_entry(row):
+            yield number, row
+
+
+def parse_count(line, row, field):
+    value = row[field]
+    # int() would take JSON's true as 1 and truncate 3.7 to 3
+    if isinstance(value, bool) or isinstance(value, float) and not value.is_integer():
+        raise LogError(line, f"{field.capitalize()} must be an integer")
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise LogError(line, f"{field.capitalize()} must be an integer")
+    if not 0 <= value <= MAX_COUNT:
+        raise LogError(line, f"{field.capitalize()} must be between 0 and {MAX_COUNT}")
+    return value
+
+
+def parse_row(line, row):
+    """
+    Returns the (date, exercise name, sets, reps, intensity) of a log row.
+    """
+    missing = [field for field in FIELDS if row.get(field) in (None, "")]
+    if missing:
+        raise LogError(line, f"Missing {', '.join(missing)}")
+
+    try:
+        date = datetime.date.fromisoformat(str(row["date"]).strip())
+    except ValueError:
+        raise LogError(line, "Date must be given as YYYY-MM-DD")
+
+    name = str(row["exercise"]).strip()
+    if not name:
+        raise LogError(line, "Exercise name cannot be empty")
+    if len(name) > Exercise._meta.get_field("name").max_length:
+        raise LogError(line, "Exercise name is too long")
+
+    try:
+        intensity = Decimal(str(row["intensity"]).strip())
+    except InvalidOperation:
+        raise LogError(line, "Intensity must be a number")
+    # NaN can't be compared and infinities can't be quantized
+    if isinstance(row["intensity"], bool) or not intensity.is_finite():
+        raise LogError(line, "Intensity must be a number")
+    if not 0 <= intensity <= MAX_INTENSITY:
+        raise LogError(line, f"Intensity must be between 0 and {MAX_INTENSITY}")
+    intensity = intensity.quantize(CENTS)
+
+    return (
+        date,
+        name,
+        parse_count(line, row, "sets"),
+        parse_count(line, row, "reps"),
+        intensity
+    )
+
+
+class ExerciseMap:
+    """
+    The user's exercise IDs by lowercased name, which creates the exercises
+    missing from it on demand. New exercises are held back until the batch
+    of entries referencing them is written.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self.ids = {}
+        for id, name in Exercise.objects.filter(
+            trainee=user
+            ).order_by("name", "id").values_list("id", "name"):
+            self.ids.setdefault(name.lower(), id)
+        self.pending = []
+        self.created = 0
+
+    def resolve(self, name):
+        key = name.lower()
+        id = self.ids.get(key)
+        if id is None:
+            exercise = Exercise(trainee=self.user, name=name)
+            self.pending.append(exercise)
+            id = self.ids[key] = exercise.id
+        return id
+
+    def flush(self):
+        """
+        Inserts the pending exercises, returning them.
+        """
+        created, self.pending = self.pending, []
+        if created:
+            Exercise.objects.bulk_create(created)
+            ChangeLog.record(self.user.pk, Exercise, [exercise.id for exercise in created])
+            self.created += len(created)
+        return created
+
+
+def validate(lines, format):
+    """
+    Checks every entry of a log, returning the number of entries.
+    """
+    count = 0
+    for line, row in read_rows(lines, format):
+        parse_row(line, row)
+        count += 1
+    return count
+
+
+def import_entries(user, lines, format, batch_size=BATCH_SIZE):
+    """
+    Inserts the entries of an already validated log for the user, in batches
+    of `batch_size` entries, and returns the numbers of entries and exercises
+    created.
+
+    The caller is expected to bump the user's data version afterwards.
+    """
+    exercises = ExerciseMap(user)
+    batch = []
+    imported = 0
+
+    def write():
+        with transaction.atomic():
+            created = exercises.flush()
+            # the entry signals update the rollups, records and change log
+            Entry.objects.bulk_create(batch)
+            # bulk inserts skip the signals which move the catalog version on
+            if created:
+                User.bump_catalog_version([user.pk])
+
+    for line, row in read_rows(lines, format):
+        date, name, sets, reps, intensity = parse_row(line, row)
+        batch.append(Entry(
+            trainee=user,
+            exercise_id=exercises.resolve(name),
+            sets=sets,
+            reps=reps,
+            intensity=intensity,
+            timestamp=date
+        ))
+        if len(batch) >= batch_size:
+            write()
+            imported += len(batch)
+            batch = []
+
+    if batch:
+        write()
+        imported += len(batch)
+
+    return imported, exercises.created
@@ -0,0 +1,174 @@
+"""
+Compares the throughput of the read views when served through Django's WSGI
+handler (one thread per concurrent request) and its ASGI handler (one event
+loop).
+
+The handlers are called in-process, without a server in front of them, so the
+numbers only reflect the time spent in Django and the database.
+"""
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+from concurrent.futures import ThreadPoolExecutor
+from wsgiref.util import setup_testing_defaults
+
+import asyncio
+import itertools
+import time
+
+from journal.models import User
+
+
+DEFAULT_PATHS = (
+    "/entries/range/",
+    "/bodypart/count/range/",
+    "/entries/calendar/?year=2024&month=1",
+    "/search/exercises/?q=bench",
+    "/search/workoutandexercises/?q=day",
+    "/program/current/workouts",
+)
+
+
+def wsgi_request(app, path, host, cookie):
+    """
+    Runs a GET request through the WSGI handler and returns its status code.
+    """
+    path, _, query = path.partition("?")
+    environ = {
+        "REQUEST_METHOD": "GET",
+        "PATH_INFO": path,
+        "QUERY_STRING": query,
+        "HTTP_HOST": host,
+        "HTTP_COOKIE": cookie,
+    }
+    setup_testing_defaults(environ)
+
+    statuses = []
+    response = app(environ, lambda status, headers: statuses.append(status))
+    b"".join(response)
+    response.close()
+    return int(statuses[0].split()[0])
+
+
+async def asgi_request(app, path, host, cookie):
+    """
+    Runs a GET request through the ASGI handler and returns its status code.
+    """
+    path, _, query = path.partition("?")
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "root_path": "",
+        "query_string": query.encode(),
+        "headers": [(b"host", host.encode()), (b"cookie", cookie.encode())],
+        "server": (host, 80),
+        "client": ("127.0.0.1", 0),
+    }
+    requested = False
+    disconnected = asyncio.Event()
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # the client stays connected until the response is sent
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    statuses = []
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            statuses.append(message["status"])
+
+    await app(scope, receive, send)
+    return statuses[0]
+
+
+class Command(BaseCommand):
+    help = "Compares the concurrent request throughput of the views under WSGI and ASGI."
+
+    def add_arguments(self, parser):
+        parser.add_argument("username", help="user whose journal is requested")
+        parser.add_argument(
+            "--requests", type=int, default=300,
+            help="number of requests sent to each handler"
+        )
+        parser.add_argument(
+            "--concurrency", type=int, default=16,
+            help="number of requests in flight at a time"
+        )
+        parser.add_argument(
+            "--path", action="append", dest="paths",
+            help="path to request, may be repeated (default: the async read views)"
+        )
+        parser.add_argument("--host", default="localhost")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["username"])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['username']} does not exist")
+
+        count = options["requests"]
+        concurrency = options["concurrency"]
+        if count < 1 or concurrency < 1:
+            raise CommandError("--requests and --concurrency must be positive")
+
+        # log the user in through a real session, as a browser would be
+        client = Client()
+        client.force_login(user)
+        cookie = f"{client.cookies['sessionid'].key}={client.cookies['sessionid'].value}"
+
+        paths = list(itertools.islice(
+            itertools.cycle(options["paths"] or DEFAULT_PATHS), count
+        ))
+        host = options["host"]
+
+        try:
+            results = [
+                ("WSGI", *self.run_wsgi(paths, host, cookie, concurrency)),
+                ("ASGI", *self.run_asgi(paths, host, cookie, concurrency)),
+            ]
+        finally:
+            client.logout()
+
+        self.stdout.write(
+            f"{count} requests, {concurrency} concurrent, over {len(set(paths))} path(s)"
+        )
+        for name, seconds, statuses in results:
+            failed = sum(status != 200 for status in statuses)
+            self.stdout.write(
+                f"{name}: {seconds:.2f}s, {count / seconds:.1f} req/s, {failed} non-200"
+            )
+
+    def run_wsgi(self, paths, host, cookie, concurrency):
+        app = WSGIHandler()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            statuses = list(pool.map(
+                lambda path: wsgi_request(app, path, host, cookie), paths
+            ))
+        return time.perf_counter() - start, statuses
+
+    def run_asgi(self, paths, host, cookie, concurrency):
+        app = ASGIHandler()
+        slots = asyncio.Semaphore(concurrency)
+
+        async def limited(path):
+            async with slots:
+                return await asgi_request(app, path, host, cookie)
+
+        async def run():
+            return await asyncio.gather(*(limited(path) for path in paths))
+
+        start = time.perf_counter()
+        statuses = asyncio.run(run())
+        return time.perf_counter() - start, statuses
@@ -0,0 +1,48 @@
+"""
+Exports a user's whole journal as CSV or NDJSON (see journal/exporting.py for
+the format).
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from journal import exporting
+from journal.models import User
+
+
+class Command(BaseCommand):
+    help = "Exports a user's programs, workouts, exercises and entries as CSV or NDJSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument("username", help="user whose journal is exported")
+        parser.add_argument(
+            "--format", choices=exporting.FORMATS, default="ndjson",
+            help="format of the export (default: ndjson)"
+        )
+        parser.add_argument(
+            "--kind", action="append", dest="kinds", choices=exporting.KINDS,
+            help="kind of objects to export, may be repeated (default: all of them)"
+        )
+        parser.add_argument(
+            "--output", "-o",
+            help="file to write the export to (default: standard output)"
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["username"])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['username']} does not exist")
+
+        kinds = [kind for kind in exporting.KINDS if kind in (options["kinds"] or exporting.KINDS)]
+        chunks = exporting.export(user, options["format"], kinds)
+
+        if options["output"] is None:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending="")
+            return
+
+        try:
+            with open(options["output"], "w", encoding="utf-8", newline="") as output:
+                for chunk in chunks:
+                    output.write(chunk)
+        except OSError as exc:
+            raise CommandError(f"Cannot write {options['output']}: {exc.strerror}")
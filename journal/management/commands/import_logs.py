@@ -0,0 +1,63 @@
+"""
+Imports a user's historical training logs from a CSV or NDJSON file (see
+journal/importing.py for the format).
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+import time
+
+from journal import importing
+from journal.models import User
+
+
+class Command(BaseCommand):
+    help = "Imports a CSV or NDJSON training log into a user's journal."
+
+    def add_arguments(self, parser):
+        parser.add_argument("username", help="user whose journal the log is imported into")
+        parser.add_argument("path", help="log file to import")
+        parser.add_argument(
+            "--format", choices=importing.FORMATS,
+            help="format of the log (default: guessed from the file's extension)"
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=importing.BATCH_SIZE,
+            help="number of entries inserted per transaction"
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["username"])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['username']} does not exist")
+
+        path = options["path"]
+        format = options["format"] or importing.guess_format(path)
+        if format is None:
+            raise CommandError("Cannot tell the log's format, pass --format")
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be positive")
+
+        start = time.perf_counter()
+        try:
+            # a BOM is common in spreadsheet exports
+            with open(path, encoding="utf-8-sig", newline="") as lines:
+                rows = importing.validate(lines, format)
+            with open(path, encoding="utf-8-sig", newline="") as lines:
+                try:
+                    entries, exercises = importing.import_entries(
+                        user, lines, format, options["batch_size"]
+                    )
+                finally:
+                    # earlier batches are kept even if a later one fails
+                    user.bump_data_version()
+        except OSError as exc:
+            raise CommandError(f"Cannot read {path}: {exc.strerror}")
+        except (importing.LogError, UnicodeDecodeError) as exc:
+            raise CommandError(str(exc))
+        seconds = time.perf_counter() - start
+
+        self.stdout.write(
+            f"Imported {entries} entries and created {exercises} exercise(s) "
+            f"from {rows} rows in {seconds:.2f}s ({entries / max(seconds, 1e-9):.0f} rows/s)"
+        )
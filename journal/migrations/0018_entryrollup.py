@@ -0,0 +1,60 @@
+# Generated by Django 5.0.4 on 2026-10-18 09:27
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F, Sum
+
+
+def backfill_rollups(apps, schema_editor):
+    Entry = apps.get_model('journal', 'Entry')
+    EntryRollup = apps.get_model('journal', 'EntryRollup')
+
+    totals = Entry.objects.filter(exercise__isnull=False).values(
+        'trainee', 'exercise', 'timestamp'
+    ).annotate(
+        entry_count=Count('id'),
+        total_sets=Sum('sets'),
+        total_reps=Sum('reps'),
+        tonnage=Sum(F('sets') * F('reps') * F('intensity'))
+    )
+
+    EntryRollup.objects.bulk_create([
+        EntryRollup(
+            trainee_id=row['trainee'],
+            exercise_id=row['exercise'],
+            date=row['timestamp'],
+            entry_count=row['entry_count'],
+            total_sets=row['total_sets'],
+            total_reps=row['total_reps'],
+            tonnage=row['tonnage']
+        ) for row in totals
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('journal', '0017_remove_exercise_sub_body_part'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EntryRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('entry_count', models.IntegerField(default=0)),
+                ('total_sets', models.IntegerField(default=0)),
+                ('total_reps', models.IntegerField(default=0)),
+                ('tonnage', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('exercise', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='journal.exercise')),
+                ('trainee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='entryrollup',
+            constraint=models.UniqueConstraint(fields=('trainee', 'date', 'exercise'), name='unique_entry_rollup'),
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
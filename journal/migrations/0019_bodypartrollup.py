@@ -0,0 +1,49 @@
+# Generated by Django 5.0.4 on 2026-10-18 09:29
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_bodypart_rollups(apps, schema_editor):
+    Entry = apps.get_model('journal', 'Entry')
+    BodyPartRollup = apps.get_model('journal', 'BodyPartRollup')
+
+    counts = Entry.objects.filter(exercise__body_part__isnull=False).values(
+        'trainee', 'exercise__body_part', 'timestamp'
+    ).annotate(entry_count=Count('id'))
+
+    BodyPartRollup.objects.bulk_create([
+        BodyPartRollup(
+            trainee_id=row['trainee'],
+            body_part_id=row['exercise__body_part'],
+            date=row['timestamp'],
+            entry_count=row['entry_count']
+        ) for row in counts
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('journal', '0018_entryrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BodyPartRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('entry_count', models.IntegerField(default=0)),
+                ('body_part', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='journal.bodypart')),
+                ('trainee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='bodypartrollup',
+            constraint=models.UniqueConstraint(fields=('trainee', 'date', 'body_part'), name='unique_bodypart_rollup'),
+        ),
+        migrations.RunPython(backfill_bodypart_rollups, migrations.RunPython.noop),
+    ]
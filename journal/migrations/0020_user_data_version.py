@@ -0,0 +1,18 @@
+# Generated by Django 5.0.4 on 2026-10-18 09:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('journal', '0019_bodypartrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='data_version',
+            field=models.PositiveBigIntegerField(default=0, help_text="Bumped whenever any of the user's journal data changes"),
+        ),
+    ]
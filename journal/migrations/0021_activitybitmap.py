@@ -0,0 +1,45 @@
+# Generated by Django 5.0.4 on 2026-10-18 09:36
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_bitmaps(apps, schema_editor):
+    Entry = apps.get_model('journal', 'Entry')
+    ActivityBitmap = apps.get_model('journal', 'ActivityBitmap')
+
+    bitmaps = {}
+    for trainee_id, date in Entry.objects.values_list('trainee', 'timestamp').distinct():
+        days = bitmaps.setdefault((trainee_id, date.year), bytearray(46))
+        index = date.timetuple().tm_yday - 1
+        days[index // 8] |= 1 << (index % 8)
+
+    ActivityBitmap.objects.bulk_create([
+        ActivityBitmap(trainee_id=trainee_id, year=year, days=bytes(days))
+        for (trainee_id, year), days in bitmaps.items()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('journal', '0020_user_data_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityBitmap',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField()),
+                ('days', models.BinaryField(default=b'\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00', max_length=46)),
+                ('trainee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='activitybitmap',
+            constraint=models.UniqueConstraint(fields=('trainee', 'year'), name='unique_activity_bitmap'),
+        ),
+        migrations.RunPython(backfill_bitmaps, migrations.RunPython.noop),
+    ]
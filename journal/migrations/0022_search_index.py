@@ -0,0 +1,62 @@
+from django.db import migrations
+
+
+# frozen copies of the table's definition in journal/search.py as of this
+# migration, which must not change along with that module
+
+SEARCH_TABLE = "journal_search"
+
+CREATE_SEARCH_TABLE = (
+    "CREATE VIRTUAL TABLE journal_search USING fts5("
+    "name, kind UNINDEXED, object_id UNINDEXED, trainee_id UNINDEXED, "
+    "tokenize='trigram')"
+)
+
+FILL_SEARCH_TABLE = (
+    "INSERT INTO journal_search (name, kind, object_id, trainee_id) "
+    "SELECT name, 'exercise', id, trainee_id FROM journal_exercise "
+    "UNION ALL "
+    "SELECT name, 'workout', id, trainee_id FROM journal_workout"
+)
+
+
+def supported(connection):
+    """
+    Returns whether the database is an SQLite build with FTS5 and the trigram
+    tokenizer.
+    """
+    if connection.vendor != "sqlite" or connection.Database.sqlite_version_info < (3, 34, 0):
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA compile_options")
+        return ("ENABLE_FTS5",) in cursor.fetchall()
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if not supported(connection):
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute(CREATE_SEARCH_TABLE)
+        cursor.execute(FILL_SEARCH_TABLE)
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if not supported(connection):
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('journal', '0021_activitybitmap'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
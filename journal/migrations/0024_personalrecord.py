@@ -0,0 +1,90 @@
+# Generated by Django 5.0.4 on 2026-10-18 09:52
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+# frozen copy of PersonalRecord.set_metrics() and improve() as of this
+# migration, which must not change along with the model
+
+METRICS = ('max_intensity', 'epley_1rm', 'brzycki_1rm', 'best_set_volume')
+
+CENTS = Decimal('0.01')
+
+
+def set_metrics(reps, intensity):
+    if reps == 0:
+        return dict.fromkeys(METRICS)
+    if reps == 1:
+        epley = brzycki = intensity
+    else:
+        epley = intensity * (1 + Decimal(reps) / 30)
+        brzycki = intensity * 36 / (37 - reps) if reps < 37 else None
+    return {
+        'max_intensity': intensity.quantize(CENTS),
+        'epley_1rm': epley.quantize(CENTS),
+        'brzycki_1rm': brzycki.quantize(CENTS) if brzycki is not None else None,
+        'best_set_volume': (intensity * reps).quantize(CENTS)
+    }
+
+
+def improve(record, reps, intensity, date):
+    for metric, value in set_metrics(reps, intensity).items():
+        best = getattr(record, metric)
+        if value is None:
+            continue
+        if best is None or value > best or (
+            value == best and date < getattr(record, metric + '_date')):
+            setattr(record, metric, value)
+            setattr(record, metric + '_date', date)
+
+
+def backfill_records(apps, schema_editor):
+    Entry = apps.get_model('journal', 'Entry')
+    PersonalRecord = apps.get_model('journal', 'PersonalRecord')
+
+    records = {}
+    for trainee_id, exercise_id, reps, intensity, date in Entry.objects.filter(
+        exercise__isnull=False, reps__gt=0
+        ).values_list('trainee', 'exercise', 'reps', 'intensity', 'timestamp').iterator():
+        record = records.get(exercise_id)
+        if record is None:
+            record = records[exercise_id] = PersonalRecord(
+                trainee_id=trainee_id, exercise_id=exercise_id
+            )
+        improve(record, reps, intensity, date)
+
+    PersonalRecord.objects.bulk_create(records.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('journal', '0023_changelog'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PersonalRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('max_intensity', models.DecimalField(decimal_places=2, max_digits=6, null=True)),
+                ('max_intensity_date', models.DateField(null=True)),
+                ('epley_1rm', models.DecimalField(decimal_places=2, max_digits=12, null=True)),
+                ('epley_1rm_date', models.DateField(null=True)),
+                ('brzycki_1rm', models.DecimalField(decimal_places=2, max_digits=12, null=True)),
+                ('brzycki_1rm_date', models.DateField(null=True)),
+                ('best_set_volume', models.DecimalField(decimal_places=2, max_digits=12, null=True)),
+                ('best_set_volume_date', models.DateField(null=True)),
+                ('exercise', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='journal.exercise')),
+                ('trainee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='personalrecord',
+            constraint=models.UniqueConstraint(fields=('trainee', 'exercise'), name='unique_personal_record'),
+        ),
+        migrations.RunPython(backfill_records, migrations.RunPython.noop),
+    ]
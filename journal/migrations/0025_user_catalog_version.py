@@ -0,0 +1,18 @@
+# Generated by Django 5.0.4 on 2026-10-18 10:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('journal', '0024_personalrecord'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='catalog_version',
+            field=models.PositiveBigIntegerField(default=0, help_text="Bumped whenever any of the user's programs, workouts or exercises change"),
+        ),
+    ]
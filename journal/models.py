@@ -1,9 +1,20 @@
-from django.db import models
+from django.db import connections, models, router, transaction
+from django.db.models import Avg, Count, F, Max, Min, Q, Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
 from django.contrib.auth.models import AbstractUser
+from django.dispatch import Signal
 
+from decimal import Decimal
+
+import datetime
 import django.utils.timezone
 import uuid
 
+
+# Sent with the list of `instances` after entries are created through
+# `Entry.objects.bulk_create()`, which skips the post_save signal.
+entries_bulk_created = Signal()
+
 class User(AbstractUser):
     username = models.CharField(
         max_length=50,
@@ -20,12 +31,39 @@ class User(AbstractUser):
         on_delete=models.SET_NULL,
         related_name="currentProgram"
     )
+    data_version = models.PositiveBigIntegerField(
+        default=0,
+        help_text="Bumped whenever any of the user's journal data changes"
+    )
+    catalog_version = models.PositiveBigIntegerField(
+        default=0,
+        help_text="Bumped whenever any of the user's programs, workouts or exercises change"
+    )
 
     class Meta:
         indexes = [
             models.Index(fields=["username"])
         ]
 
+    def bump_data_version(self):
+        """
+        Marks all of the user's data as changed, invalidating the ETags handed
+        out for it.
+        """
+        User.objects.filter(pk=self.pk).update(data_version=F("data_version") + 1)
+
+    async def abump_data_version(self):
+        await User.objects.filter(pk=self.pk).aupdate(data_version=F("data_version") + 1)
+
+    @classmethod
+    def bump_catalog_version(cls, user_pks):
+        """
+        Marks the programs, workouts and exercises of the given users as changed,
+        so that nothing built from them before is used again, in any process.
+        Entries don't count towards the catalog, so logging them keeps it.
+        """
+        cls.objects.filter(pk__in=user_pks).update(catalog_version=F("catalog_version") + 1)
+
     def __str__(self):
         return f"{self.username}"    
     
@@ -58,6 +96,13 @@ class Program(models.Model):
             "isCurrent": self.trainee.current_program == self
         }
 
+    def sync_serialize(self):
+        return {
+            "id": self.id,
+            "name": self.name,
+            "description": self.description
+        }
+
     def __str__(self):
         return f"{self.name} workout program created by {self.trainee}"
 
@@ -89,10 +134,40 @@ class Workout(models.Model):
             "days": [day.serialize() for day in self.day.all()]
         }
 
+    def sync_serialize(self):
+        return {
+            "id": self.id,
+            "name": self.name,
+            "program": self.program_id,
+            "days": [day.day for day in self.day.all()]
+        }
+
     def __str__(self):
         return f"{self.trainee}'s {self.name} workout"
 
 
+class ExerciseQuerySet(models.QuerySet):
+    """
+    Query helpers for exercises.
+    """
+
+    def for_table(self):
+        """
+        Prefetches everything table_serialize reads, i.e. the workouts along
+        with their programs and the bodyparts, so that serializing any number
+        of exercises takes two extra queries.
+        """
+        return self.prefetch_related(
+            models.Prefetch(
+                "workout",
+                queryset=Workout.objects.select_related("program").only(
+                    "id", "name", "program__id", "program__name"
+                )
+            ),
+            "body_part"
+        )
+
+
 class Exercise(models.Model):
     id = models.UUIDField(
         primary_key=True,
@@ -114,6 +189,8 @@ class Exercise(models.Model):
         null=True
     )
 
+    objects = ExerciseQuerySet.as_manager()
+
     def serialize(self):
         return {
             "id": self.id,
@@ -148,10 +225,188 @@ class Exercise(models.Model):
             "description": self.description
         }
 
+    def sync_serialize(self):
+        return {
+            "id": self.id,
+            "name": self.name,
+            "description": self.description,
+            "workouts": [workout.id for workout in self.workout.all()],
+            "bodyparts": [part.id for part in self.body_part.all()]
+        }
+
     def __str__(self):
         return f"{self.name}"
 
 
+class EntryQuerySet(models.QuerySet):
+    """
+    QuerySet which builds the entry payloads straight from a joined projection
+    of the rows, instead of serializing (and lazily loading) model instances.
+    """
+    def bulk_create(self, objs, *args, **kwargs):
+        with transaction.atomic(using=self.db):
+            objs = super().bulk_create(objs, *args, **kwargs)
+            entries_bulk_created.send(sender=self.model, instances=objs)
+        return objs
+
+    SERIALIZE_FIELDS = (
+        "id", "exercise_id", "exercise__name", "sets", "reps", "intensity",
+        "timestamp"
+    )
+
+    @staticmethod
+    def serialize_row(row):
+        return {
+            "id": row["id"],
+            "exercise": {
+                "id": row["exercise_id"],
+                "name": row["exercise__name"]
+            },
+            "sets": row["sets"],
+            "reps": row["reps"],
+            "intensity": row["intensity"],
+            "date": row["timestamp"]
+        }
+
+    def serialize(self):
+        """
+        Returns the `Entry.serialize()` payload for every entry in the queryset
+        in a single query, along with each entry's timestamp under `date`.
+        """
+        return [
+            self.serialize_row(row) for row in self.values(*self.SERIALIZE_FIELDS)
+        ]
+
+    async def aserialize(self):
+        """
+        Async version of `serialize()`.
+        """
+        return [
+            self.serialize_row(row) async for row in self.values(*self.SERIALIZE_FIELDS)
+        ]
+
+    def graph_serialize(self):
+        """
+        Returns the `Entry.graph_serialize()` payload for every entry in the
+        queryset in a single query.
+        """
+        return list(self.iter_graph_serialize(chunk_size=None))
+
+    def bucket_serialize(self, bucket):
+        """
+        Returns the entries aggregated into day, week (starting on Monday), or
+        month long buckets. The intensity range, average, and the total volume
+        (sets x reps x intensity) of each bucket are computed by the database.
+        """
+        trunc = {
+            "day": TruncDay,
+            "week": TruncWeek,
+            "month": TruncMonth
+        }[bucket]
+
+        rows = self.order_by().annotate(
+            period=trunc("timestamp")
+        ).values("period").annotate(
+            entry_count=Count("id"),
+            total_sets=Sum("sets"),
+            total_reps=Sum("reps"),
+            min_intensity=Min("intensity"),
+            max_intensity=Max("intensity"),
+            avg_intensity=Avg("intensity"),
+            volume=Sum(F("sets") * F("reps") * F("intensity"))
+        ).order_by("period")
+
+        return [{
+            "date": row["period"],
+            "entryCount": row["entry_count"],
+            "sets": row["total_sets"],
+            "reps": row["total_reps"],
+            "minIntensity": row["min_intensity"],
+            "maxIntensity": row["max_intensity"],
+            "avgIntensity": row["avg_intensity"],
+            "volume": row["volume"]
+        } for row in rows]
+
+    def bodypart_volume_rows(self, bucket):
+        trunc = {
+            "week": TruncWeek,
+            "month": TruncMonth
+        }[bucket]
+
+        return self.order_by().annotate(
+            period=trunc("timestamp")
+        ).values("exercise__body_part", "period").annotate(
+            entry_count=Count("id"),
+            total_sets=Sum("sets"),
+            total_reps=Sum("reps"),
+            volume=Sum(F("sets") * F("reps") * F("intensity"))
+        ).order_by("exercise__body_part", "period")
+
+    @staticmethod
+    def bodypart_volume_row(row):
+        return {
+            "bodypart": row["exercise__body_part"],
+            "date": row["period"],
+            "entryCount": row["entry_count"],
+            "sets": row["total_sets"],
+            "reps": row["total_reps"],
+            "volume": row["volume"]
+        }
+
+    def bodypart_volume_serialize(self, bucket):
+        """
+        Returns the volume (sets x reps x intensity), sets, reps, and entry count
+        of the entries per ISO week (starting on Monday) or month long bucket and
+        bodypart, all summed up by the database in a single grouped query.
+
+        An entry counts towards each bodypart of its exercise. Entries without
+        any bodypart are grouped under a None bodypart.
+        """
+        return [
+            self.bodypart_volume_row(row) for row in self.bodypart_volume_rows(bucket)
+        ]
+
+    async def abodypart_volume_serialize(self, bucket):
+        """
+        Async version of `bodypart_volume_serialize()`.
+        """
+        return [
+            self.bodypart_volume_row(row) async for row in self.bodypart_volume_rows(bucket)
+        ]
+
+    GRAPH_FIELDS = ("id", "sets", "reps", "intensity", "timestamp")
+
+    @staticmethod
+    def graph_row(row):
+        return {
+            "id": row["id"],
+            "sets": row["sets"],
+            "reps": row["reps"],
+            "intensity": row["intensity"],
+            "date": row["timestamp"]
+        }
+
+    def iter_graph_serialize(self, chunk_size=2000):
+        """
+        Yields the `Entry.graph_serialize()` payload of each entry, reading the
+        rows in chunks of `chunk_size` through a server-side cursor so that only
+        one chunk is held in memory at a time.
+        """
+        rows = self.values(*self.GRAPH_FIELDS)
+        if chunk_size is not None:
+            rows = rows.iterator(chunk_size=chunk_size)
+
+        for row in rows:
+            yield self.graph_row(row)
+
+    async def aiter_graph_serialize(self, chunk_size=2000):
+        """
+        Async version of `iter_graph_serialize()`.
+        """
+        async for row in self.values(*self.GRAPH_FIELDS).aiterator(chunk_size=chunk_size):
+            yield self.graph_row(row)
+
+
 class Entry(models.Model):
     id = models.UUIDField(
         primary_key=True,
@@ -179,6 +434,8 @@ class Entry(models.Model):
         null=False
     )
 
+    objects = EntryQuerySet.as_manager()
+
     class Meta:
         indexes = [
             models.Index(fields=["trainee", "timestamp"])
@@ -205,10 +462,642 @@ class Entry(models.Model):
             "date": self.timestamp
         }
 
+    def sync_serialize(self):
+        return {
+            "id": self.id,
+            "exercise": self.exercise_id,
+            "sets": self.sets,
+            "reps": self.reps,
+            "intensity": self.intensity,
+            "date": self.timestamp
+        }
+
+    def save(self, *args, **kwargs):
+        # the signal handlers keeping the derived tables in sync run in the
+        # same transaction as the write, so that they can't fall out of step
+        with transaction.atomic(using=kwargs.get("using")):
+            super().save(*args, **kwargs)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # keep a snapshot of the stored row so that the rollup signal handlers
+        # can work out what changed without querying the database again
+        if len(values) == len(cls._meta.concrete_fields):
+            instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
     def __str__(self):
         return (f"{self.timestamp}: {self.exercise} for "  +
                f"{self.sets} sets and {self.reps} reps using {self.intensity}kg weight")
-    
+
+
+class Rollup(models.Model):
+    """
+    Abstract model for tables of running totals derived from the entries.
+
+    Each row is identified by the values of its `key_fields` and holds the
+    totals in its `value_fields`, the first of which counts the entries behind
+    the row. Rows are never written to directly by the views, they are kept in
+    sync by feeding the differences of every write into `apply_deltas()`.
+    """
+    key_fields = ()
+    value_fields = ()
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def apply_deltas(cls, deltas):
+        """
+        Applies a mapping of key tuples (ordered as `key_fields`) to lists of
+        differences (ordered as `value_fields`) onto the table.
+
+        Only positive entry counts may open up a new row, as removals can race
+        with the rows' trainee or exercise being deleted. Rows whose entry count
+        drops to zero are removed. Keys with a None part are not tracked.
+
+        The differences are added in the database rather than read, changed and
+        written back: keys gaining entries are upserted, so that concurrent
+        first writes of a key can't both try to open its row, and the others
+        are incremented in place. Runs at most three statements, however many
+        rows the deltas touch.
+        """
+        deltas = [
+            (key, delta) for key, delta in deltas.items()
+            if None not in key and any(delta)
+        ]
+        if not deltas:
+            return
+
+        connection = connections[router.db_for_write(cls)]
+        quote = connection.ops.quote_name
+        table = quote(cls._meta.db_table)
+        key_fields = [cls._meta.get_field(field) for field in cls.key_fields]
+        value_fields = [cls._meta.get_field(field) for field in cls.value_fields]
+        key_columns = [quote(field.column) for field in key_fields]
+        value_columns = [quote(field.column) for field in value_fields]
+
+        def params(fields, values):
+            return [
+                field.get_db_prep_save(value, connection)
+                for field, value in zip(fields, values)
+            ]
+
+        opened = [
+            params(key_fields, key) + params(value_fields, delta)
+            for key, delta in deltas if delta[0] > 0
+        ]
+        changed = [
+            params(value_fields, delta) + params(key_fields, key)
+            for key, delta in deltas if delta[0] <= 0
+        ]
+        emptied = [
+            params(key_fields, key) for key, delta in deltas if delta[0] < 0
+        ]
+        where = " AND ".join(f"{column} = %s" for column in key_columns)
+
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            if opened:
+                columns = key_columns + value_columns
+                cursor.executemany(
+                    f"INSERT INTO {table} ({', '.join(columns)}) "
+                    f"VALUES ({', '.join(['%s'] * len(columns))}) "
+                    f"ON CONFLICT ({', '.join(key_columns)}) DO UPDATE SET " +
+                    ", ".join(
+                        f"{column} = {table}.{column} + excluded.{column}"
+                        for column in value_columns
+                    ),
+                    opened
+                )
+            if changed:
+                cursor.executemany(
+                    f"UPDATE {table} SET " +
+                    ", ".join(f"{column} = {column} + %s" for column in value_columns) +
+                    f" WHERE {where}",
+                    changed
+                )
+            if emptied:
+                cursor.executemany(
+                    f"DELETE FROM {table} WHERE {where} AND {value_columns[0]} <= 0",
+                    emptied
+                )
+
+
+class EntryRollup(Rollup):
+    """
+    Model which holds the daily totals of a trainee's entries for one exercise.
+
+    Kept in sync with the Entry table by the signal handlers in signals.py,
+    which also cover the bulk entry paths.
+    """
+    trainee = models.ForeignKey(
+        'User',
+        on_delete=models.CASCADE
+    )
+    exercise = models.ForeignKey(
+        'Exercise',
+        on_delete=models.CASCADE
+    )
+    date = models.DateField()
+    entry_count = models.IntegerField(default=0)
+    total_sets = models.IntegerField(default=0)
+    total_reps = models.IntegerField(default=0)
+    tonnage = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0
+    )
+
+    key_fields = ("trainee", "exercise", "date")
+    value_fields = ("entry_count", "total_sets", "total_reps", "tonnage")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["trainee", "date", "exercise"],
+                name="unique_entry_rollup"
+            )
+        ]
+
+    @staticmethod
+    def entry_delta(trainee_id, exercise_id, date, sets, reps, intensity, sign=1):
+        """
+        Returns the (key, delta) pair that one entry contributes to the rollup.
+        A sign of -1 returns the pair needed to take the entry back out.
+        """
+        date = Entry._meta.get_field("timestamp").to_python(date)
+        intensity = Entry._meta.get_field("intensity").to_python(intensity)
+        sets, reps = int(sets), int(reps)
+        return (trainee_id, exercise_id, date), [
+            sign,
+            sign * sets,
+            sign * reps,
+            sign * sets * reps * intensity
+        ]
+
+    def serialize(self):
+        return {
+            "id": self.exercise.id,
+            "name": self.exercise.name,
+            "entryCount": self.entry_count,
+            "sets": self.total_sets,
+            "reps": self.total_reps,
+            "tonnage": self.tonnage
+        }
+
+    def __str__(self):
+        return f"{self.trainee}'s {self.exercise} totals on {self.date}"
+
+
+class BodyPartRollup(Rollup):
+    """
+    Model which holds the number of a trainee's entries that worked a bodypart
+    on a given day. An entry counts towards every bodypart of its exercise.
+
+    Kept in sync by the signal handlers in signals.py, both on entry writes and
+    whenever the bodyparts of an exercise change.
+    """
+    trainee = models.ForeignKey(
+        'User',
+        on_delete=models.CASCADE
+    )
+    body_part = models.ForeignKey(
+        'BodyPart',
+        on_delete=models.CASCADE
+    )
+    date = models.DateField()
+    entry_count = models.IntegerField(default=0)
+
+    key_fields = ("trainee", "body_part", "date")
+    value_fields = ("entry_count",)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["trainee", "date", "body_part"],
+                name="unique_bodypart_rollup"
+            )
+        ]
+
+    @classmethod
+    def apply_entry_deltas(cls, deltas):
+        """
+        Applies the same (trainee_id, exercise_id, date) deltas that are fed into
+        `EntryRollup.apply_deltas()` onto the bodyparts of each exercise.
+        """
+        exercise_ids = {
+            exercise_id for (_, exercise_id, _), delta in deltas.items()
+            if exercise_id is not None and delta[0]
+        }
+        if not exercise_ids:
+            return
+
+        body_parts = {}
+        for exercise_id, body_part_id in Exercise.body_part.through.objects.filter(
+            exercise_id__in=exercise_ids
+            ).values_list("exercise_id", "bodypart_id"):
+            body_parts.setdefault(exercise_id, []).append(body_part_id)
+
+        counts = {}
+        for (trainee_id, exercise_id, date), delta in deltas.items():
+            for body_part_id in body_parts.get(exercise_id, []):
+                key = (trainee_id, body_part_id, date)
+                counts[key] = [counts.get(key, [0])[0] + delta[0]]
+
+        cls.apply_deltas(counts)
+
+    @classmethod
+    def shift_exercise(cls, exercise_id, body_part_ids, sign):
+        """
+        Adds (sign = 1) or removes (sign = -1) all of an exercise's rolled up
+        entries to or from the given bodyparts.
+        """
+        if not body_part_ids:
+            return
+
+        counts = {}
+        for trainee_id, date, entry_count in EntryRollup.objects.filter(
+            exercise_id=exercise_id
+            ).values_list("trainee_id", "date", "entry_count"):
+            for body_part_id in body_part_ids:
+                counts[(trainee_id, body_part_id, date)] = [sign * entry_count]
+
+        cls.apply_deltas(counts)
+
+    def __str__(self):
+        return f"{self.trainee}'s {self.body_part} entries on {self.date}"
+
+
+class ActivityBitmap(models.Model):
+    """
+    Model which marks the days of a year on which a trainee has journal entries,
+    with one bit per day.
+
+    Bit `n` (counting from the least significant bit of the first byte) stands
+    for the (n + 1)th day of the year. Kept in sync with the entries by the
+    signal handlers in signals.py.
+    """
+    trainee = models.ForeignKey(
+        'User',
+        on_delete=models.CASCADE
+    )
+    year = models.PositiveSmallIntegerField()
+    days = models.BinaryField(max_length=46, default=bytes(46))
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["trainee", "year"],
+                name="unique_activity_bitmap"
+            )
+        ]
+
+    @staticmethod
+    def day_index(date):
+        return date.timetuple().tm_yday - 1
+
+    def active_dates(self, month=None):
+        """
+        Returns the marked dates in ascending order, optionally only those
+        within the given month.
+        """
+        days = bytes(self.days)
+        start = datetime.date(self.year, month or 1, 1)
+        if month is None or month == 12:
+            end = datetime.date(self.year + 1, 1, 1)
+        else:
+            end = datetime.date(self.year, month + 1, 1)
+
+        first = self.day_index(start)
+        dates = []
+        for offset in range((end - start).days):
+            index = first + offset
+            if days[index // 8] & (1 << (index % 8)):
+                dates.append(start + datetime.timedelta(days=offset))
+        return dates
+
+    @classmethod
+    def apply_entry_deltas(cls, deltas):
+        """
+        Marks the days gaining entries and unmarks those left without any, given
+        the same (trainee_id, exercise_id, date) deltas that are fed into
+        `EntryRollup.apply_deltas()`.
+        """
+        net = {}
+        for (trainee_id, _, date), delta in deltas.items():
+            net[(trainee_id, date)] = net.get((trainee_id, date), 0) + delta[0]
+
+        marked = {key for key, count in net.items() if count > 0}
+        emptied = {key for key, count in net.items() if count < 0}
+
+        if emptied:
+            lookup = Q()
+            for trainee_id, date in emptied:
+                lookup |= Q(trainee_id=trainee_id, timestamp=date)
+            emptied -= set(Entry.objects.filter(lookup).values_list(
+                "trainee_id", "timestamp"
+            ).distinct())
+
+        if not (marked or emptied):
+            return
+
+        # (trainee_id, year) -> [(day index, whether to mark it)]
+        changes = {}
+        for keys, mark in ((marked, True), (emptied, False)):
+            for trainee_id, date in keys:
+                changes.setdefault((trainee_id, date.year), []).append(
+                    (cls.day_index(date), mark)
+                )
+
+        with transaction.atomic():
+            # rows that don't exist yet can't be locked, so the years opened up
+            # by newly marked days are inserted first, leaving any row a
+            # concurrent write inserted in the meantime as it is
+            cls.objects.bulk_create([
+                cls(trainee_id=trainee_id, year=year)
+                for (trainee_id, year), indices in changes.items()
+                if any(mark for _, mark in indices)
+            ], ignore_conflicts=True)
+
+            lookup = Q()
+            for trainee_id, year in changes:
+                lookup |= Q(trainee_id=trainee_id, year=year)
+            bitmaps = cls.objects.select_for_update().filter(lookup)
+
+            changed_bitmaps = []
+            for bitmap in bitmaps:
+                indices = changes[(bitmap.trainee_id, bitmap.year)]
+                days = bytearray(bitmap.days)
+                for index, mark in indices:
+                    if mark:
+                        days[index // 8] |= 1 << (index % 8)
+                    else:
+                        days[index // 8] &= ~(1 << (index % 8)) & 0xFF
+                bitmap.days = bytes(days)
+                changed_bitmaps.append(bitmap)
+
+            cls.objects.bulk_update(changed_bitmaps, ["days"])
+
+    def __str__(self):
+        return f"{self.trainee}'s activity in {self.year}"
+
+
+class PersonalRecord(models.Model):
+    """
+    A user's best sets of an exercise, i.e., the heaviest intensity, the best
+    estimated one rep max by the Epley and Brzycki formulas, and the biggest
+    single set volume (reps times intensity), each with the date it was set.
+
+    Kept up to date by the signal handlers in signals.py. New entries can only
+    improve the records, so they're merged in as they come, while edited and
+    deleted entries have their exercise's records recomputed from scratch.
+    Ties go to the earliest date.
+    """
+    trainee = models.ForeignKey(
+        'User',
+        on_delete=models.CASCADE
+    )
+    exercise = models.ForeignKey(
+        'Exercise',
+        on_delete=models.CASCADE
+    )
+    max_intensity = models.DecimalField(max_digits=6, decimal_places=2, null=True)
+    max_intensity_date = models.DateField(null=True)
+    epley_1rm = models.DecimalField(max_digits=12, decimal_places=2, null=True)
+    epley_1rm_date = models.DateField(null=True)
+    brzycki_1rm = models.DecimalField(max_digits=12, decimal_places=2, null=True)
+    brzycki_1rm_date = models.DateField(null=True)
+    best_set_volume = models.DecimalField(max_digits=12, decimal_places=2, null=True)
+    best_set_volume_date = models.DateField(null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["trainee", "exercise"],
+                name="unique_personal_record"
+            )
+        ]
+
+    METRICS = ("max_intensity", "epley_1rm", "brzycki_1rm", "best_set_volume")
+
+    # the metrics along with their dates
+    FIELDS = tuple(field for metric in METRICS for field in (metric, metric + "_date"))
+
+    @staticmethod
+    def set_metrics(reps, intensity):
+        """
+        Returns the value of each record metric for a set of the given reps and
+        intensity, or None where the metric doesn't apply.
+        """
+        cents = Decimal("0.01")
+        intensity = Decimal(intensity)
+        if reps == 0:
+            # nothing was lifted
+            return dict.fromkeys(PersonalRecord.METRICS)
+        if reps == 1:
+            epley = brzycki = intensity
+        else:
+            epley = intensity * (1 + Decimal(reps) / 30)
+            # the Brzycki formula breaks down at 37 reps
+            brzycki = intensity * 36 / (37 - reps) if reps < 37 else None
+        return {
+            "max_intensity": intensity.quantize(cents),
+            "epley_1rm": epley.quantize(cents) if epley is not None else None,
+            "brzycki_1rm": brzycki.quantize(cents) if brzycki is not None else None,
+            "best_set_volume": (intensity * reps).quantize(cents)
+        }
+
+    @classmethod
+    def improve(cls, record, reps, intensity, date):
+        """
+        Merges a set into the given record, returning whether it set any new
+        records.
+        """
+        date = Entry._meta.get_field("timestamp").to_python(date)
+        intensity = Entry._meta.get_field("intensity").to_python(intensity)
+        reps = int(reps)
+
+        improved = False
+        for metric, value in cls.set_metrics(reps, intensity).items():
+            best = getattr(record, metric)
+            if value is None:
+                continue
+            if best is None or value > best or (
+                value == best and date < getattr(record, metric + "_date")):
+                setattr(record, metric, value)
+                setattr(record, metric + "_date", date)
+                improved = True
+        return improved
+
+    @classmethod
+    def locked_records(cls, owners):
+        """
+        Returns the records of the given exercises, given as {exercise_id:
+        trainee_id}, locked for the rest of the transaction. Empty records are
+        created for the exercises which have none yet.
+        """
+        # rows that don't exist yet can't be locked, so the missing records are
+        # inserted first, leaving any a concurrent write inserted in the
+        # meantime as it is
+        cls.objects.bulk_create([
+            cls(trainee_id=trainee_id, exercise_id=exercise_id)
+            for exercise_id, trainee_id in owners.items()
+        ], ignore_conflicts=True)
+        return {
+            record.exercise_id: record
+            for record in cls.objects.select_for_update().filter(exercise_id__in=owners)
+        }
+
+    @classmethod
+    def record_entries(cls, entries):
+        """
+        Merges newly created entries into their exercises' records.
+        """
+        # sets of zero reps never make a record
+        entries = [
+            entry for entry in entries
+            if entry.exercise_id is not None and int(entry.reps) > 0
+        ]
+        if not entries:
+            return
+
+        with transaction.atomic():
+            records = cls.locked_records({
+                entry.exercise_id: entry.trainee_id for entry in entries
+            })
+            improved = set()
+            for entry in entries:
+                record = records[entry.exercise_id]
+                if cls.improve(record, entry.reps, entry.intensity, entry.timestamp):
+                    improved.add(entry.exercise_id)
+
+            cls.objects.bulk_update([records[key] for key in improved], cls.FIELDS)
+
+    @classmethod
+    def recompute(cls, exercise_ids):
+        """
+        Rebuilds the records of the given exercises from all their entries.
+        """
+        exercise_ids = set(exercise_ids) - {None}
+        if not exercise_ids:
+            return
+
+        with transaction.atomic():
+            records = cls.locked_records(dict(Exercise.objects.filter(
+                id__in=exercise_ids
+            ).values_list("id", "trainee_id")))
+            for record in records.values():
+                for field in cls.FIELDS:
+                    setattr(record, field, None)
+
+            for exercise_id, reps, intensity, date in Entry.objects.filter(
+                exercise_id__in=records, reps__gt=0
+                ).values_list("exercise_id", "reps", "intensity", "timestamp"):
+                cls.improve(records[exercise_id], reps, intensity, date)
+
+            # any set with reps sets the max intensity, so the records without
+            # one have no sets left
+            kept = {key for key, record in records.items() if record.max_intensity is not None}
+            cls.objects.filter(exercise_id__in=exercise_ids - kept).delete()
+            cls.objects.bulk_update([records[key] for key in kept], cls.FIELDS)
+
+    def serialize(self):
+        return {
+            "exercise": {
+                "id": self.exercise.id,
+                "name": self.exercise.name
+            },
+            "maxIntensity": {
+                "value": self.max_intensity,
+                "date": self.max_intensity_date
+            },
+            "epley1RM": {
+                "value": self.epley_1rm,
+                "date": self.epley_1rm_date
+            },
+            "brzycki1RM": {
+                "value": self.brzycki_1rm,
+                "date": self.brzycki_1rm_date
+            },
+            "bestSetVolume": {
+                "value": self.best_set_volume,
+                "date": self.best_set_volume_date
+            }
+        }
+
+    def __str__(self):
+        return f"{self.trainee}'s {self.exercise} records"
+
+
+class ChangeLog(models.Model):
+    """
+    Append-only log of the changes to each user's programs, workouts, exercises
+    and entries, from which clients sync their local copies. The ids of the
+    log double as the sync tokens handed out to the clients.
+
+    Changes to an object's links (e.g. an exercise's workouts) are logged as a
+    change to the object itself.
+    """
+    id = models.BigAutoField(primary_key=True)
+    trainee = models.ForeignKey(
+        'User',
+        on_delete=models.CASCADE
+    )
+    model = models.CharField(max_length=16)
+    object_id = models.UUIDField()
+    deleted = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["trainee", "id"])
+        ]
+
+    # models whose changes are logged, by their log name
+    MODELS = {}
+
+    @classmethod
+    def record(cls, trainee_id, model, object_ids, deleted=False):
+        """
+        Logs a change to each of the given objects of one of the user's models.
+        """
+        cls.objects.bulk_create([
+            cls(
+                trainee_id=trainee_id,
+                model=model._meta.model_name,
+                object_id=object_id,
+                deleted=deleted
+            ) for object_id in object_ids
+        ])
+
+    @classmethod
+    def latest_token(cls, trainee):
+        return cls.objects.filter(trainee=trainee).aggregate(token=Max("id"))["token"] or 0
+
+    @classmethod
+    def changes(cls, trainee, since, until):
+        """
+        Returns the objects of each logged model which were changed and which
+        were deleted between the two tokens, as
+        {model name: (changed ids, deleted ids)}.
+        """
+        latest = {}
+        for model, object_id, deleted in cls.objects.filter(
+            trainee=trainee, id__gt=since, id__lte=until
+            ).order_by("id").values_list("model", "object_id", "deleted"):
+            latest[(model, object_id)] = deleted
+
+        changes = {model: (set(), set()) for model in cls.MODELS}
+        for (model, object_id), deleted in latest.items():
+            changed, removed = changes[model]
+            (removed if deleted else changed).add(object_id)
+        return changes
+
+
+ChangeLog.MODELS.update({
+    model._meta.model_name: model for model in (Program, Workout, Exercise, Entry)
+})
+
 
 class BodyPart(models.Model):
     """
@@ -0,0 +1,80 @@
+"""
+Process-wide registry of the fixed reference data, i.e., the BodyPart and Day
+rows loaded from the initial_data.json fixture.
+
+The rows are read once, on first use, and kept in memory until either table
+changes. The signal handlers connected in `JournalConfig.ready()` drop them
+again whenever a row is saved or deleted, or the database is migrated.
+"""
+import threading
+import uuid
+
+from asgiref.sync import sync_to_async
+
+from .models import BodyPart, Day
+
+
+class ReferenceRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._body_parts = None
+        self._days = None
+
+    def _load(self):
+        """
+        Returns the bodyparts and days, reading them first if they aren't
+        loaded. Both are taken under the lock, so a concurrent `invalidate()`
+        can't leave the caller with a dropped table.
+        """
+        with self._lock:
+            if self._body_parts is None or self._days is None:
+                self._body_parts = {part.id: part for part in BodyPart.objects.all()}
+                self._days = {day.day: day for day in Day.objects.all()}
+            return self._body_parts, self._days
+
+    def body_parts(self):
+        """
+        Returns all bodyparts, in the database's order.
+        """
+        body_parts, _ = self._load()
+        return list(body_parts.values())
+
+    async def abody_parts(self):
+        """
+        Async version of `body_parts()`, which loads the rows off the event loop.
+        """
+        with self._lock:
+            body_parts = self._body_parts
+        if body_parts is None:
+            body_parts, _ = await sync_to_async(self._load)()
+        return list(body_parts.values())
+
+    def body_part(self, id):
+        """
+        Returns the bodypart with the given UUID (or UUID string). Raises
+        BodyPart.DoesNotExist for unknown or malformed IDs.
+        """
+        body_parts, _ = self._load()
+        try:
+            return body_parts[uuid.UUID(str(id))]
+        except (KeyError, ValueError):
+            raise BodyPart.DoesNotExist
+
+    def day(self, dayNum):
+        """
+        Returns the Day with the given day number. Raises Day.DoesNotExist for
+        numbers outside the 0-6 range.
+        """
+        _, days = self._load()
+        try:
+            return days[dayNum]
+        except KeyError:
+            raise Day.DoesNotExist
+
+    def invalidate(self, **kwargs):
+        with self._lock:
+            self._body_parts = None
+            self._days = None
+
+
+registry = ReferenceRegistry()
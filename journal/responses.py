@@ -0,0 +1,79 @@
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+import itertools
+import json
+
+
+def is_asgi(request):
+    """
+    Returns whether the request is served through the ASGI handler, which only
+    streams responses built from async iterators without buffering them.
+    """
+    return isinstance(request, ASGIRequest)
+
+
+class StreamingJsonResponse(StreamingHttpResponse):
+    """
+    A streaming response which writes out a JSON object with one array member
+    whose items are encoded incrementally from an iterable.
+
+    The other members of the object are given in `data` and written first. The
+    resulting document is the same as a `JsonResponse` for
+    `{**data, stream_key: list(items)}`, but only `chunk_size` items are
+    encoded (and held in memory) at a time.
+
+    The items may also be an async iterable, which is streamed as such when the
+    response is served through ASGI.
+    """
+    def __init__(
+        self,
+        data,
+        stream_key,
+        items,
+        encoder=DjangoJSONEncoder,
+        chunk_size=500,
+        **kwargs
+    ):
+        kwargs.setdefault("content_type", "application/json")
+        encode = self._aencode if hasattr(items, "__aiter__") else self._encode
+        super().__init__(
+            streaming_content=encode(data, stream_key, items, encoder, chunk_size),
+            **kwargs
+        )
+
+    @staticmethod
+    def _head(data, stream_key, encoder):
+        head = json.dumps({**data, stream_key: []}, cls=encoder)
+        # everything up to the closing "]}" of the empty streamed array
+        return head[:-2]
+
+    @staticmethod
+    def _encode(data, stream_key, items, encoder, chunk_size):
+        yield StreamingJsonResponse._head(data, stream_key, encoder)
+
+        items = iter(items)
+        separator = ""
+        while chunk := list(itertools.islice(items, chunk_size)):
+            yield separator + ", ".join(json.dumps(item, cls=encoder) for item in chunk)
+            separator = ", "
+
+        yield "]}"
+
+    @staticmethod
+    async def _aencode(data, stream_key, items, encoder, chunk_size):
+        yield StreamingJsonResponse._head(data, stream_key, encoder)
+
+        chunk = []
+        separator = ""
+        async for item in items:
+            chunk.append(item)
+            if len(chunk) == chunk_size:
+                yield separator + ", ".join(json.dumps(item, cls=encoder) for item in chunk)
+                separator = ", "
+                chunk = []
+        if chunk:
+            yield separator + ", ".join(json.dumps(item, cls=encoder) for item in chunk)
+
+        yield "]}"
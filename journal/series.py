@@ -0,0 +1,93 @@
+"""
+Helpers for shaping entry time series before they're sent to the graphs.
+"""
+from decimal import Decimal
+
+
+def lttb(points, threshold, x, y):
+    """
+    Downsamples a sequence of points to at most `threshold` points using the
+    Largest-Triangle-Three-Buckets algorithm, which keeps the visual shape of
+    the series (its peaks and troughs) intact.
+
+    The points must be ordered by their x value. `x` and `y` are callables which
+    return the numeric coordinates of a point. The first and last points are
+    always kept. If the series already fits within the threshold (or the
+    threshold is less than 3), all the points are returned.
+    """
+    n = len(points)
+    if threshold >= n or threshold < 3:
+        return list(points)
+
+    sampled = [points[0]]
+    # the points between the first and last are split into (threshold - 2)
+    # equally sized buckets, one point is picked from each bucket
+    every = (n - 2) / (threshold - 2)
+    anchor = 0
+
+    for i in range(threshold - 2):
+        # average point of the next bucket
+        start = int((i + 1) * every) + 1
+        end = min(int((i + 2) * every) + 1, n)
+        avg_x = sum(x(point) for point in points[start:end]) / (end - start)
+        avg_y = sum(y(point) for point in points[start:end]) / (end - start)
+
+        # pick the point of the current bucket which forms the largest triangle
+        # with the previously picked point and the next bucket's average
+        anchor_x, anchor_y = x(points[anchor]), y(points[anchor])
+        max_area = -1
+        for j in range(int(i * every) + 1, start):
+            area = abs(
+                (anchor_x - avg_x) * (y(points[j]) - anchor_y) -
+                (anchor_x - x(points[j])) * (avg_y - anchor_y)
+            )
+            if area > max_area:
+                max_area = area
+                picked = j
+
+        sampled.append(points[picked])
+        anchor = picked
+
+    sampled.append(points[-1])
+    return sampled
+
+
+def to_columns(rows, dictionary=()):
+    """
+    Transposes a list of payload dicts sharing the same keys into a dict of
+    parallel arrays, one per key.
+
+    Dates are delta encoded: the `date` column holds the number of days since
+    the previous row's date, with the first row's date given as `startDate`.
+    Decimal values are sent as plain numbers. The values of the keys named in
+    `dictionary` are dictionary encoded, i.e., their column holds indices into
+    a list of the distinct values under `dictionaries`.
+
+    An empty list of rows gives no columns and a `startDate` of None.
+    """
+    columns = {key: [row[key] for row in rows] for key in (rows[0] if rows else ())}
+
+    for key, values in columns.items():
+        if values and isinstance(values[0], Decimal):
+            columns[key] = [float(value) for value in values]
+
+    dates = columns.get("date")
+    columns["startDate"] = dates[0] if dates else None
+    if dates:
+        columns["date"] = [0] + [
+            (date - previous).days for previous, date in zip(dates, dates[1:])
+        ]
+
+    columns["dictionaries"] = {}
+    for key in dictionary:
+        values, indices = [], {}
+        for i, value in enumerate(columns.get(key, [])):
+            # nested payloads are told apart by their id
+            lookup = value["id"] if isinstance(value, dict) else value
+            if lookup not in indices:
+                indices[lookup] = len(values)
+                values.append(value)
+            columns[key][i] = indices[lookup]
+        columns["dictionaries"][key] = values
+
+    return columns
@@ -0,0 +1,353 @@
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_save, pre_delete, pre_save
+)
+from django.db.models import QuerySet
+from django.dispatch import receiver
+
+from .models import (
+    ActivityBitmap, BodyPartRollup, ChangeLog, Entry, EntryRollup, Exercise,
+    PersonalRecord, Program, User, Workout, entries_bulk_created
+)
+
+
+ENTRY_FIELDS = ("trainee_id", "exercise_id", "timestamp", "sets", "reps", "intensity")
+
+
+def entry_values(entry):
+    """
+    Returns the rollup relevant field values of an entry instance.
+    """
+    return {field: getattr(entry, field) for field in ENTRY_FIELDS}
+
+
+def loaded_entry_delta(entry):
+    """
+    Returns the rollup (key, delta) pair which takes the stored version of the
+    given entry back out of the rollup table.
+    """
+    values = getattr(entry, "_loaded_values", None) or entry_values(entry)
+    return EntryRollup.entry_delta(
+        *(values[field] for field in ENTRY_FIELDS),
+        sign=-1
+    )
+
+
+def merge_deltas(*pairs):
+    """
+    Folds a number of rollup (key, delta) pairs into one deltas mapping.
+    """
+    deltas = {}
+    for pair in pairs:
+        if pair is None:
+            continue
+        key, delta = pair
+        total = deltas.setdefault(key, [0, 0, 0, 0])
+        for i, value in enumerate(delta):
+            total[i] += value
+    return deltas
+
+
+def apply_entry_deltas(deltas):
+    """
+    Applies a mapping of entry rollup deltas onto every table derived from the
+    entries.
+    """
+    EntryRollup.apply_deltas(deltas)
+    BodyPartRollup.apply_entry_deltas(deltas)
+    ActivityBitmap.apply_entry_deltas(deltas)
+
+
+@receiver(pre_save, sender=Entry)
+def snapshot_entry(sender, instance, raw, **kwargs):
+    """
+    Reads the stored values of an existing entry which wasn't loaded through
+    the ORM, so that its edit can be rolled up correctly.
+    """
+    if raw or instance._state.adding or hasattr(instance, "_loaded_values"):
+        return
+
+    instance._loaded_values = Entry.objects.filter(
+        pk=instance.pk
+    ).values(*ENTRY_FIELDS).first()
+
+
+@receiver(post_save, sender=Entry)
+def rollup_saved_entry(sender, instance, created, raw, **kwargs):
+    """
+    Adds a new entry to the rollup table, or moves an edited entry's previous
+    values out of it and the new ones in.
+    """
+    if raw:
+        return
+
+    previous = None
+    if not created and getattr(instance, "_loaded_values", None) is not None:
+        previous = loaded_entry_delta(instance)
+    current = EntryRollup.entry_delta(*entry_values(instance).values())
+
+    apply_entry_deltas(merge_deltas(previous, current))
+    instance._loaded_values = entry_values(instance)
+
+
+@receiver(entries_bulk_created, sender=Entry)
+def rollup_created_entries(sender, instances, **kwargs):
+    """
+    Adds a batch of bulk created entries to the rollup tables in one go.
+    """
+    apply_entry_deltas(merge_deltas(*(
+        EntryRollup.entry_delta(*entry_values(entry).values())
+        for entry in instances
+    )))
+
+
+@receiver(post_delete, sender=Entry)
+def rollup_deleted_entry(sender, instance, **kwargs):
+    """
+    Takes a deleted entry out of the rollup table.
+    """
+    apply_entry_deltas(merge_deltas(loaded_entry_delta(instance)))
+
+
+@receiver(pre_delete, sender=Exercise)
+def unroll_deleted_exercise(sender, instance, **kwargs):
+    """
+    Takes a deleted exercise's entries out of the bodypart counters. Its entry
+    rollups are removed along with it by the cascade.
+    """
+    BodyPartRollup.shift_exercise(
+        instance.id,
+        list(instance.body_part.values_list("id", flat=True)),
+        -1
+    )
+
+
+@receiver(m2m_changed, sender=Exercise.body_part.through)
+def reroll_exercise_bodyparts(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Moves an exercise's entries between the bodypart counters whenever
+    bodyparts are added to or removed from it.
+    """
+    if action in ("pre_remove", "pre_clear"):
+        # remember which links actually exist before they're removed
+        if reverse:
+            links = sender.objects.filter(bodypart_id=instance.pk)
+        else:
+            links = sender.objects.filter(exercise_id=instance.pk)
+        if pk_set is not None:
+            field = "exercise_id__in" if reverse else "bodypart_id__in"
+            links = links.filter(**{field: pk_set})
+        instance._removed_body_parts = list(
+            links.values_list("exercise_id", "bodypart_id")
+        )
+        return
+
+    if action == "post_add":
+        if reverse:
+            links = [(exercise_id, instance.pk) for exercise_id in pk_set]
+        else:
+            links = [(instance.pk, body_part_id) for body_part_id in pk_set]
+        sign = 1
+    elif action in ("post_remove", "post_clear"):
+        links = getattr(instance, "_removed_body_parts", [])
+        del instance._removed_body_parts
+        sign = -1
+    else:
+        return
+
+    body_parts = {}
+    for exercise_id, body_part_id in links:
+        body_parts.setdefault(exercise_id, []).append(body_part_id)
+
+    for exercise_id, body_part_ids in body_parts.items():
+        BodyPartRollup.shift_exercise(exercise_id, body_part_ids, sign)
+
+
+#==============================================================================#
+#                              CATALOG VERSION
+#==============================================================================#
+
+@receiver(post_save, sender=Program)
+@receiver(post_save, sender=Workout)
+@receiver(post_save, sender=Exercise)
+@receiver(post_delete, sender=Program)
+@receiver(post_delete, sender=Workout)
+@receiver(post_delete, sender=Exercise)
+def bump_changed_catalog(sender, instance, raw=False, **kwargs):
+    """
+    Moves the catalog version on past a saved or deleted program, workout or
+    exercise, which retires the cached trees and typeahead indexes built from
+    it.
+    """
+    if not raw:
+        User.bump_catalog_version([instance.trainee_id])
+
+
+@receiver(m2m_changed, sender=Workout.day.through)
+@receiver(m2m_changed, sender=Exercise.workout.through)
+@receiver(m2m_changed, sender=Exercise.body_part.through)
+def bump_relinked_catalog(sender, instance, action, model, pk_set, **kwargs):
+    """
+    Moves the catalog version on for the owners of the workouts and exercises
+    whose days, workouts or bodyparts change.
+    """
+    if not action.startswith("post_"):
+        return
+
+    if hasattr(instance, "trainee_id"):
+        # an exercise or workout, whose links all belong to the same user
+        User.bump_catalog_version([instance.trainee_id])
+        return
+
+    if pk_set is None:
+        # a day or bodypart was cleared, whose former links are already gone
+        # but were remembered by `log_relinked_objects()` on pre_clear
+        pk_set = getattr(instance, "_cleared_sync_links", [])
+    User.bump_catalog_version(
+        model.objects.filter(pk__in=pk_set).values("trainee_id")
+    )
+
+
+#==============================================================================#
+#                                 CHANGE LOG
+#==============================================================================#
+
+# the owning model and through table columns of the links logged as changes
+# to their owner
+SYNC_LINKS = {
+    Exercise.workout.through: (Exercise, "exercise_id", "workout_id"),
+    Exercise.body_part.through: (Exercise, "exercise_id", "bodypart_id"),
+    Workout.day.through: (Workout, "workout_id", "day_id"),
+}
+
+
+def log_changes(model, rows, deleted=False):
+    """
+    Logs a change to each of the objects given as (id, trainee id) pairs.
+    """
+    object_ids = {}
+    for object_id, trainee_id in rows:
+        object_ids.setdefault(trainee_id, []).append(object_id)
+    for trainee_id, ids in object_ids.items():
+        ChangeLog.record(trainee_id, model, ids, deleted)
+
+
+def deleted_with_trainee(origin):
+    """
+    Returns whether a delete cascades from deleting a user, or a queryset of
+    users, whose data isn't worth logging or recomputing as it goes.
+    """
+    return isinstance(origin, User) or (
+        isinstance(origin, QuerySet) and issubclass(origin.model, User)
+    )
+
+
+@receiver(post_save, sender=Program)
+@receiver(post_save, sender=Workout)
+@receiver(post_save, sender=Exercise)
+@receiver(post_save, sender=Entry)
+def log_saved_object(sender, instance, raw, **kwargs):
+    if not raw:
+        log_changes(sender, [(instance.pk, instance.trainee_id)])
+
+
+@receiver(post_delete, sender=Program)
+@receiver(post_delete, sender=Workout)
+@receiver(post_delete, sender=Exercise)
+@receiver(post_delete, sender=Entry)
+def log_deleted_object(sender, instance, origin=None, **kwargs):
+    if not deleted_with_trainee(origin):
+        log_changes(sender, [(instance.pk, instance.trainee_id)], deleted=True)
+
+
+@receiver(entries_bulk_created, sender=Entry)
+def log_created_entries(sender, instances, **kwargs):
+    log_changes(Entry, [(entry.pk, entry.trainee_id) for entry in instances])
+
+
+@receiver(pre_delete, sender=Workout)
+def log_unlinked_exercises(sender, instance, origin=None, **kwargs):
+    """
+    Logs the exercises which lose a deleted workout, as its links are removed
+    along with it.
+    """
+    if not deleted_with_trainee(origin):
+        log_changes(Exercise, Exercise.objects.filter(
+            workout=instance
+        ).values_list("id", "trainee_id"))
+
+
+@receiver(pre_delete, sender=Exercise)
+def log_orphaned_entries(sender, instance, origin=None, **kwargs):
+    """
+    Logs the entries of a deleted exercise, which are kept without one.
+    """
+    if not deleted_with_trainee(origin):
+        log_changes(Entry, Entry.objects.filter(
+            exercise=instance
+        ).values_list("id", "trainee_id"))
+
+
+@receiver(m2m_changed, sender=Exercise.workout.through)
+@receiver(m2m_changed, sender=Exercise.body_part.through)
+@receiver(m2m_changed, sender=Workout.day.through)
+def log_relinked_objects(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Logs the exercises and workouts whose workouts, bodyparts or days change.
+    """
+    if not reverse:
+        if action.startswith("post_"):
+            log_changes(type(instance), [(instance.pk, instance.trainee_id)])
+        return
+
+    owner, owner_column, column = SYNC_LINKS[sender]
+    if action == "pre_clear":
+        # remember which objects are about to lose their link
+        instance._cleared_sync_links = list(sender.objects.filter(
+            **{column: instance.pk}
+        ).values_list(owner_column, flat=True))
+        return
+    if action == "post_clear":
+        pk_set = getattr(instance, "_cleared_sync_links", [])
+    elif action not in ("post_add", "post_remove"):
+        return
+
+    log_changes(owner, owner.objects.filter(pk__in=pk_set).values_list("id", "trainee_id"))
+
+
+#==============================================================================#
+#                              PERSONAL RECORDS
+#==============================================================================#
+
+@receiver(pre_save, sender=Entry)
+def remember_record_exercise(sender, instance, raw, **kwargs):
+    """
+    Remembers which exercise an edited entry belonged to, so that its records
+    are recomputed even if the entry moves to another exercise.
+    """
+    if raw or instance._state.adding:
+        return
+    loaded = getattr(instance, "_loaded_values", None)
+    instance._record_exercise_id = loaded["exercise_id"] if loaded else None
+
+
+@receiver(post_save, sender=Entry)
+def update_entry_records(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    if created:
+        PersonalRecord.record_entries([instance])
+    else:
+        PersonalRecord.recompute({
+            instance.exercise_id, getattr(instance, "_record_exercise_id", None)
+        })
+
+
+@receiver(entries_bulk_created, sender=Entry)
+def record_created_entries(sender, instances, **kwargs):
+    PersonalRecord.record_entries(instances)
+
+
+@receiver(post_delete, sender=Entry)
+def recompute_deleted_entry_records(sender, instance, origin=None, **kwargs):
+    if not deleted_with_trainee(origin):
+        PersonalRecord.recompute({instance.exercise_id})
@@ -61,8 +61,8 @@ async function loadEntriesView() {
 }
 
 async function en_loadDefaults() {
-    // fetch this week's entries
-    const apiResponse = await fetch(`entries/range/`)
+    // fetch this week's dashboard, i.e. its entries and bodypart distribution
+    const apiResponse = await fetch(`dashboard/week/`)
     const data = await apiResponse.json();
 
     // bail if an error occurs
@@ -76,9 +76,7 @@ async function en_loadDefaults() {
         en_populateEntriesHeader("No entries this week.");
     } else {
         en_populateEntriesHeader("This week's entries:");
-        const apiResponse2 = await fetch("bodypart/count/range/");
-        const data2 = await apiResponse2.json();
-        en_displayEntryChart(data2["data"], "Body Part distribution for this week:");
+        en_displayEntryChart(data["bodyparts"], "Body Part distribution for this week:");
         en_populateEntries(data);
     }
 }
@@ -401,9 +399,13 @@ async function en_submitEntriesRangeForm() {
     const startDate = document.querySelector('#entriesStartDate').value;
     const endDate = document.querySelector('#entriesEndDate').value;
 
-    // Fetch the entries
-    const apiResponse = await fetch(`entries/range/?startDate=${startDate}&endDate=${endDate}`);
-    const data = await apiResponse.json();
+    // Fetch the entries and their bodypart distribution
+    const range = {startDate: startDate, endDate: endDate};
+    const [entries, bodyparts] = await util_batch([
+        {path: "entries/range/", params: range},
+        {path: "bodypart/count/range/", params: range}
+    ]);
+    const data = entries.body;
 
     // bail if an error occurs
     if (data.error) {
@@ -414,9 +416,7 @@ async function en_submitEntriesRangeForm() {
     // Populate container with entries
     emptyEntriesView();
 
-    const apiResponse2 = await fetch(`bodypart/count/range/?startDate=${startDate}&endDate=${endDate}`);
-    const data2 = await apiResponse2.json();
-    en_displayEntryChart(data2["data"], `Body part distribution from ${startDate} to ${endDate}`);
+    en_displayEntryChart(bodyparts.body["data"], `Body part distribution from ${startDate} to ${endDate}`);
     
     en_populateEntriesHeader(`Entries from ${startDate} to ${endDate}`);
     en_populateEntries(data);
@@ -489,8 +489,9 @@ async function en_loadCalendar(anchorDate) {
     // Extra days from next month
     const afterPadding = 6 - new Date(year, month, days).getDay();
 
-    // Fetch current month's entry dates
-    const apiResponse = await fetch(`entries/calendar/?year=${year}&month=${month + 1}`)
+    // Fetch the current year's entry days (month flips within the year are
+    // then answered with a 304 until the entries change)
+    const apiResponse = await fetch(`entries/calendar/year/?year=${year}`)
     const data = await apiResponse.json();
     
     // bail if an error occurs
@@ -499,7 +500,7 @@ async function en_loadCalendar(anchorDate) {
         return;
     }
 
-    dates = data["dates"];  // Sorted list of days which have a journal entry
+    dates = en_activeDaysInMonth(data["days"], year, month);  // Sorted list of days which have a journal entry
     datesIndex = 0;         // Index pointer to index into the array
 
     // Select calendar date container and empty it
@@ -584,6 +585,31 @@ async function en_loadCalendar(anchorDate) {
 }
 
 
+/**
+ * Picks out the days of a month which have a journal entry from a year's
+ * activity bitset, as returned by the `entries/calendar/year/` endpoint.
+ * 
+ * @param {string} bitset base64 encoded bitset with one bit per day of the year
+ * @param {number} year the bitset's year
+ * @param {number} month zero-based month to pick the days of
+ * @returns {number[]} sorted list of the month's days which have an entry
+ */
+function en_activeDaysInMonth(bitset, year, month) {
+    const bytes = atob(bitset);
+    const firstIndex = Math.round((Date.UTC(year, month, 1) - Date.UTC(year, 0, 1)) / 86400000);
+    const days = new Date(year, month + 1, 0).getDate();
+
+    const dates = [];
+    for (let day = 1; day <= days; day++) {
+        const index = firstIndex + day - 1;
+        if (bytes.charCodeAt(index >> 3) & (1 << (index & 7))) {
+            dates.push(day);
+        }
+    }
+    return dates;
+}
+
+
 /**
  * Loads all the entries on the given date.
  * 
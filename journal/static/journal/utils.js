@@ -505,6 +505,32 @@ async function util_submitEntries(entries, date) {
     }
 }
 
+/**
+ * Sends several API requests to the server in a single round trip through the
+ * batch endpoint.
+ * 
+ * Each request is an object with a `path` and, optionally, a `method`, the query
+ * `params` and a JSON `body`. The results come back in the same order, each with
+ * its own `status` and decoded `body`.
+ * 
+ * @param {Object[]} requests  the requests to send
+ * @returns {Object[]}         the result of each request
+ */
+async function util_batch(requests) {
+    const apiResponse = await fetch('batch/', {
+        method: 'POST',
+        headers: {
+            "X-CSRFToken": CSRF_TOKEN
+        },
+        credentials: 'same-origin',
+        body: JSON.stringify({
+            requests: requests
+        })
+    });
+    const data = await apiResponse.json();
+    return data["results"];
+}
+
 /**
  * Returns an autocomplete search bar where the user can lookup all their exercises
  * and workouts.
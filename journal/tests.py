@@ -1,3 +1,1830 @@
+from asgiref.sync import sync_to_async
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, connection, transaction
+from django.db.models.signals import post_delete
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 
-# Create your tests here.
+from decimal import Decimal
+from unittest import mock
+
+import base64
+import datetime
+import json
+import uuid
+import warnings
+
+from . import analytics, importing
+from .models import *
+from .registry import registry
+from .series import lttb
+from .typeahead import typeahead
+
+
+class QueryCountTestCase(TestCase):
+    """
+    Pins the number of queries the read endpoints run, so that they stay
+    constant no matter how many rows a payload is built from.
+    """
+    fixtures = ["initial_data.json"]
+
+    # session and user lookups done by the auth middleware on every request
+    SESSION_QUERIES = 2
+
+    def setUp(self):
+        self.user = User.objects.create_user("lifter", "lifter@example.com", "pass")
+        self.client.force_login(self.user)
+
+        self.exercises = [
+            Exercise.objects.create(trainee=self.user, name=f"Exercise {i}")
+            for i in range(3)
+        ]
+        self.date = datetime.date(2024, 5, 6)
+
+    def add_entries(self, count):
+        for i in range(count):
+            Entry.objects.create(
+                trainee=self.user,
+                exercise=self.exercises[i % len(self.exercises)],
+                sets=3,
+                reps=5,
+                intensity=100,
+                timestamp=self.date + datetime.timedelta(days=i % 7)
+            )
+
+    def assertQueries(self, count, url):
+        """
+        Requests the given url and checks the number of queries it ran, returning
+        the decoded JSON payload.
+        """
+        with self.assertNumQueries(self.SESSION_QUERIES + count):
+            response = self.client.get(url)
+            # streamed responses only hit the database while being consumed
+            if response.streaming:
+                content = b"".join(response.streaming_content)
+            else:
+                content = response.content
+        self.assertEqual(response.status_code, 200)
+        if response["Content-Type"] != "application/json":
+            return content.decode()
+        return json.loads(content)
+
+    def test_entries_in_range(self):
+        url = reverse("entriesInRange") + "?startDate=2024-05-06&endDate=2024-05-12"
+
+        self.add_entries(1)
+        self.assertQueries(1, url)
+
+        self.add_entries(30)
+        payload = self.assertQueries(1, url)["payload"]
+        self.assertEqual(sum(len(day["entries"]) for day in payload), 31)
+        self.assertEqual(
+            payload[0]["entries"][0]["exercise"]["name"],
+            Entry.objects.get(id=payload[0]["entries"][0]["id"]).exercise.name
+        )
+
+    def test_dashboard_week(self):
+        url = reverse("dashboardWeek") + "?startDate=2024-05-06&endDate=2024-05-12"
+        for exercise in self.exercises:
+            exercise.body_part.add(*BodyPart.objects.all())
+        # the bodyparts themselves are read once per process
+        registry.body_parts()
+
+        # the entries and their exercises' bodyparts
+        self.add_entries(1)
+        self.assertQueries(2, url)
+
+        self.add_entries(30)
+        dashboard = self.assertQueries(2, url)
+        self.assertEqual(dashboard["totals"]["entryCount"], 31)
+        self.assertEqual(len(dashboard["activeDays"]), 7)
+        self.assertEqual(
+            [part["count"] for part in dashboard["bodyparts"]],
+            [31] * BodyPart.objects.count()
+        )
+
+    def test_bodypart_volume(self):
+        url = reverse("bodypartVolume") + "?startDate=2024-01-01&endDate=2024-12-31"
+        self.exercises[0].body_part.add(*BodyPart.objects.all())
+        registry.body_parts()
+
+        self.add_entries(1)
+        self.assertQueries(1, url)
+
+        self.add_entries(30)
+        series = self.assertQueries(1, url)["series"]
+        self.assertEqual(len(series), BodyPart.objects.count() + 1)
+        self.assertEqual(
+            sum(point["entryCount"] for point in series[0]["points"]),
+            Entry.objects.exclude(exercise=self.exercises[0]).count()
+        )
+
+    def test_exercise_entries(self):
+        exercise = self.exercises[0]
+        url = reverse("exerciseEntries", args=[exercise.id])
+
+        self.add_entries(1)
+        self.assertQueries(2, url)
+
+        self.add_entries(30)
+        payload = self.assertQueries(2, url)
+
+        self.assertEqual(
+            len(payload["entries"]),
+            Entry.objects.filter(exercise=exercise).count()
+        )
+
+    def test_exercise_analytics(self):
+        exercise = self.exercises[0]
+        url = reverse("exerciseAnalytics", args=[exercise.id])
+
+        self.add_entries(1)
+        self.assertQueries(2, url)
+
+        self.add_entries(30)
+        payload = self.assertQueries(2, url + "?trend=robust")
+
+        self.assertEqual(
+            payload["entryCount"],
+            Entry.objects.filter(exercise=exercise).count()
+        )
+
+    def test_export_journal(self):
+        url = reverse("exportJournal")
+
+        # programs, workouts, exercises with their workouts and bodyparts, entries
+        self.assertQueries(6, url)
+
+        self.link_exercises(4)
+        self.add_entries(30)
+        lines = self.assertQueries(6, url + "?format=csv").splitlines()
+        self.assertEqual(len(lines), 1 + 2 + 4 + 3 + 30)
+
+    def link_exercises(self, workouts):
+        """
+        Puts every exercise into the given number of new workouts, spread over
+        two programs, and tags it with every bodypart.
+        """
+        programs = [
+            Program.objects.create(trainee=self.user, name=f"Program {i}")
+            for i in range(2)
+        ]
+        for i in range(workouts):
+            workout = Workout.objects.create(
+                trainee=self.user, program=programs[i % 2], name=f"Workout {i}"
+            )
+            workout.exercise_set.add(*self.exercises)
+        for exercise in self.exercises:
+            exercise.body_part.add(*BodyPart.objects.all())
+
+    def test_filter_exercises(self):
+        url = reverse("filterExercises")
+
+        # the page count, the page itself, and the workout and bodypart prefetches
+        self.assertQueries(4, url + "?pageNum=1")
+        self.assertQueries(3, url + "?cursor=")
+
+        self.exercises += [
+            Exercise.objects.create(trainee=self.user, name=f"Exercise {i}")
+            for i in range(3, 10)
+        ]
+        self.link_exercises(5)
+        self.assertQueries(4, url + "?pageNum=1")
+        exercises = self.assertQueries(3, url + "?cursor=")["exercises"]
+
+        self.assertEqual(len(exercises), 10)
+        self.assertEqual(len(exercises[0]["workouts"]), 5)
+        self.assertEqual(
+            {program["name"] for program in exercises[0]["programs"]},
+            {"Program 0", "Program 1"}
+        )
+        self.assertEqual(len(exercises[0]["bodyparts"]), BodyPart.objects.count())
+
+    def test_exercise(self):
+        url = reverse("exercise") + f"?id={self.exercises[0].id}"
+
+        self.assertQueries(3, url)
+
+        self.link_exercises(8)
+        exercise = self.assertQueries(3, url)["exercise"]
+        self.assertEqual(len(exercise["workouts"]), 8)
+        self.assertEqual(len(exercise["programs"]), 8)
+
+
+class RollupTestCase(TestCase):
+    """
+    Checks that the tables derived from the entries always hold what they'd
+    hold if they were computed from the entries from scratch.
+    """
+    fixtures = ["initial_data.json"]
+
+    def setUp(self):
+        self.user = User.objects.create_user("lifter", "lifter@example.com", "pass")
+        self.client.force_login(self.user)
+
+        parts = list(BodyPart.objects.all())
+        self.bench = Exercise.objects.create(trainee=self.user, name="Bench")
+        self.bench.body_part.add(parts[0], parts[1])
+        self.squat = Exercise.objects.create(trainee=self.user, name="Squat")
+        self.squat.body_part.add(parts[1], parts[2])
+        self.date = datetime.date(2024, 5, 6)
+
+    def add_entry(self, exercise, days=0, sets=3, reps=5, intensity=100):
+        return Entry.objects.create(
+            trainee=self.user,
+            exercise=exercise,
+            sets=sets,
+            reps=reps,
+            intensity=intensity,
+            timestamp=self.date + datetime.timedelta(days=days)
+        )
+
+    def assertRollups(self):
+        """
+        Checks the entry and bodypart rollups against the entries.
+        """
+        entries, body_parts = {}, {}
+        for entry in Entry.objects.exclude(exercise=None):
+            totals = entries.setdefault(
+                (entry.trainee_id, entry.exercise_id, entry.timestamp), [0, 0, 0, 0]
+            )
+            for i, value in enumerate((
+                1, entry.sets, entry.reps, entry.sets * entry.reps * entry.intensity
+            )):
+                totals[i] += value
+            for part in entry.exercise.body_part.all():
+                key = (entry.trainee_id, part.id, entry.timestamp)
+                body_parts[key] = body_parts.get(key, 0) + 1
+
+        self.assertEqual({
+            (row.trainee_id, row.exercise_id, row.date): [
+                row.entry_count, row.total_sets, row.total_reps, row.tonnage
+            ] for row in EntryRollup.objects.all()
+        }, entries)
+        self.assertEqual({
+            (row.trainee_id, row.body_part_id, row.date): row.entry_count
+            for row in BodyPartRollup.objects.all()
+        }, body_parts)
+
+    def assertActivity(self):
+        """
+        Checks the activity bitmaps against the entries' dates.
+        """
+        marked = set()
+        for bitmap in ActivityBitmap.objects.all():
+            marked.update((bitmap.trainee_id, date) for date in bitmap.active_dates())
+        self.assertEqual(marked, set(Entry.objects.values_list("trainee_id", "timestamp")))
+
+    def assertRecords(self):
+        """
+        Checks the personal records against the best sets of the entries, ties
+        going to the earliest date.
+        """
+        records = {}
+        for entry in Entry.objects.exclude(exercise=None).order_by("timestamp"):
+            for metric, value in PersonalRecord.set_metrics(entry.reps, entry.intensity).items():
+                best = records.setdefault(entry.exercise_id, {}).get(metric)
+                if value is not None and (best is None or value > best[0]):
+                    records[entry.exercise_id][metric] = (value, entry.timestamp)
+
+        self.assertEqual({
+            record.exercise_id: {
+                metric: (getattr(record, metric), getattr(record, metric + "_date"))
+                for metric in PersonalRecord.METRICS
+                if getattr(record, metric) is not None
+            } for record in PersonalRecord.objects.all()
+        }, {key: metrics for key, metrics in records.items() if metrics})
+
+    def test_add(self):
+        self.add_entry(self.bench)
+        self.add_entry(self.bench, intensity=Decimal("102.5"))
+        self.add_entry(self.squat, days=1)
+        self.assertRollups()
+
+        Entry.objects.bulk_create([
+            Entry(trainee=self.user, exercise=exercise, sets=4, reps=8,
+                  intensity=60, timestamp=self.date + datetime.timedelta(days=i % 3))
+            for i, exercise in enumerate([self.bench, self.squat] * 5)
+        ])
+        self.assertRollups()
+
+    def test_add_view(self):
+        response = self.client.post(reverse("entries"), {
+            "date": "2024-05-06",
+            "exercises": [
+                {"id": str(self.bench.id), "sets": 3, "reps": 5, "intensity": 100},
+                {"id": str(self.bench.id), "sets": 2, "reps": 3, "intensity": 110},
+                {"id": str(self.squat.id), "sets": 5, "reps": 5, "intensity": 140}
+            ]
+        }, content_type="application/json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Entry.objects.count(), 3)
+        self.assertRollups()
+
+    def test_edit(self):
+        entry = self.add_entry(self.bench)
+        self.add_entry(self.bench)
+
+        entry.sets, entry.reps, entry.intensity = 5, 3, Decimal("120.25")
+        entry.save()
+        self.assertRollups()
+
+        # through a fresh instance, whose stored values weren't loaded with it
+        entry = Entry.objects.only("id").get(id=entry.id)
+        entry.sets = 1
+        entry.save(update_fields=["sets"])
+        self.assertRollups()
+
+    def test_move(self):
+        entry = self.add_entry(self.bench)
+        self.add_entry(self.squat, days=1)
+
+        entry.exercise = self.squat
+        entry.save()
+        self.assertRollups()
+
+        entry.timestamp += datetime.timedelta(days=1)
+        entry.save()
+        self.assertRollups()
+        self.assertFalse(EntryRollup.objects.filter(exercise=self.bench).exists())
+
+    def test_delete(self):
+        first = self.add_entry(self.bench)
+        self.add_entry(self.bench)
+        self.add_entry(self.squat, days=2)
+
+        first.delete()
+        self.assertRollups()
+
+        Entry.objects.filter(exercise=self.squat).delete()
+        self.assertRollups()
+        self.assertEqual(EntryRollup.objects.get().entry_count, 1)
+
+    def test_delete_exercise(self):
+        self.add_entry(self.bench)
+        self.add_entry(self.squat)
+        self.add_entry(self.squat, days=3)
+
+        self.squat.delete()
+        self.assertRollups()
+        self.assertTrue(Entry.objects.filter(exercise=None).exists())
+
+    def test_relink_bodyparts(self):
+        parts = list(BodyPart.objects.all())
+        self.add_entry(self.bench)
+        self.add_entry(self.bench, days=1)
+        self.add_entry(self.squat)
+
+        self.bench.body_part.add(parts[3])
+        self.assertRollups()
+        self.bench.body_part.remove(parts[0])
+        self.assertRollups()
+        self.squat.body_part.clear()
+        self.assertRollups()
+
+        # from the bodypart's side of the relation
+        parts[4].exercise_set.add(self.bench, self.squat)
+        self.assertRollups()
+        parts[1].exercise_set.remove(self.bench)
+        self.assertRollups()
+        parts[4].exercise_set.clear()
+        self.assertRollups()
+
+    def test_bodypart_count_view(self):
+        parts = list(BodyPart.objects.all())
+        other = User.objects.create_user("other", "other@example.com", "pass")
+        rival = Exercise.objects.create(trainee=other, name="Bench")
+        rival.body_part.add(parts[0])
+        Entry.objects.create(
+            trainee=other, exercise=rival, sets=1, reps=1, intensity=1,
+            timestamp=self.date
+        )
+
+        self.add_entry(self.bench)
+        self.add_entry(self.bench, days=6)
+        self.add_entry(self.squat, days=2)
+        # outside of the week
+        self.add_entry(self.squat, days=7)
+        self.bench.body_part.add(parts[5])
+
+        response = self.client.get(
+            reverse("bodypartInRange") + "?startDate=2024-05-06&endDate=2024-05-12"
+        )
+        counts = {part["id"]: part["count"] for part in response.json()["data"]}
+        self.assertEqual(counts, {
+            str(parts[0].id): 2, str(parts[1].id): 3, str(parts[2].id): 1,
+            str(parts[3].id): 0, str(parts[4].id): 0, str(parts[5].id): 2
+        })
+        # most worked bodyparts first
+        self.assertEqual(response.json()["data"][0]["id"], str(parts[1].id))
+
+    def test_activity(self):
+        first = self.add_entry(self.bench)
+        self.add_entry(self.squat)
+        new_year = self.add_entry(self.bench, days=-127)
+        self.add_entry(self.squat, days=-128)
+        self.assertEqual(ActivityBitmap.objects.count(), 2)
+        self.assertActivity()
+
+        # the day stays marked while it has any entries left
+        first.delete()
+        self.assertActivity()
+        new_year.timestamp = self.date + datetime.timedelta(days=1)
+        new_year.save()
+        self.assertActivity()
+        Entry.objects.filter(exercise=self.squat).delete()
+        self.assertActivity()
+
+    def test_activity_views(self):
+        self.add_entry(self.bench)
+        self.add_entry(self.squat, days=2)
+        self.add_entry(self.squat, days=30)
+
+        response = self.client.get(reverse("entriesCalendar"), {"year": 2024, "month": 5})
+        self.assertEqual(response.json(), {"dates": [6, 8]})
+
+        response = self.client.get(reverse("entriesCalendarYear"), {"year": 2024})
+        days = base64.b64decode(response.json()["days"])
+        marked = [index for index in range(len(days) * 8) if days[index // 8] & (1 << (index % 8))]
+        self.assertEqual(marked, [
+            ActivityBitmap.day_index(datetime.date(2024, 5, day)) for day in (6, 8)
+        ] + [ActivityBitmap.day_index(datetime.date(2024, 6, 5))])
+
+        response = self.client.get(reverse("entriesCalendarYear"), {"year": 2023})
+        self.assertEqual(base64.b64decode(response.json()["days"]), bytes(46))
+
+    def test_open_existing_bitmap(self):
+        # a year opened up in between reading and writing it is marked onto
+        ActivityBitmap.objects.create(trainee=self.user, year=2024)
+        ActivityBitmap.apply_entry_deltas({(self.user.pk, self.bench.id, self.date): [1]})
+        self.assertEqual(ActivityBitmap.objects.get().active_dates(), [self.date])
+
+    def test_records(self):
+        self.add_entry(self.bench, reps=5, intensity=100)
+        self.add_entry(self.bench, days=1, reps=1, intensity=110)
+        # ties go to the earliest date
+        self.add_entry(self.bench, days=2, reps=5, intensity=100)
+        self.add_entry(self.bench, days=-1, reps=5, intensity=100)
+        # nothing lifted
+        self.add_entry(self.squat, reps=0, intensity=200)
+        self.assertRecords()
+        self.assertFalse(PersonalRecord.objects.filter(exercise=self.squat).exists())
+
+        Entry.objects.bulk_create([
+            Entry(trainee=self.user, exercise=exercise, sets=1, reps=reps,
+                  intensity=intensity, timestamp=self.date + datetime.timedelta(days=reps))
+            for exercise, reps, intensity in (
+                (self.bench, 40, 50), (self.squat, 3, 150), (self.squat, 8, 120)
+            )
+        ])
+        self.assertRecords()
+
+    def test_records_changed(self):
+        best = self.add_entry(self.bench, reps=3, intensity=120)
+        self.add_entry(self.bench, days=1, reps=5, intensity=100)
+        self.add_entry(self.squat, reps=5, intensity=140)
+
+        best.intensity = 90
+        best.save()
+        self.assertRecords()
+
+        best.exercise = self.squat
+        best.intensity = 200
+        best.save()
+        self.assertRecords()
+
+        best.delete()
+        self.assertRecords()
+        Entry.objects.filter(exercise=self.squat).delete()
+        self.assertRecords()
+        self.assertEqual(PersonalRecord.objects.get().exercise, self.bench)
+
+    def test_records_view(self):
+        self.add_entry(self.squat, reps=5, intensity=140)
+        self.add_entry(self.bench, reps=1, intensity=110)
+
+        records = self.client.get(reverse("records")).json()["records"]
+        self.assertEqual([record["exercise"]["name"] for record in records], ["Bench", "Squat"])
+        self.assertEqual(records[0]["epley1RM"], {"value": "110.00", "date": "2024-05-06"})
+        self.assertEqual(records[1]["bestSetVolume"], {"value": "700.00", "date": "2024-05-06"})
+
+    def test_open_existing_record(self):
+        # a record created in between reading and writing it is merged into
+        PersonalRecord.objects.create(trainee=self.user, exercise=self.bench)
+        self.add_entry(self.bench)
+        self.assertRecords()
+
+    def test_open_existing_row(self):
+        # a row opened in between reading and writing it is added onto
+        key = (self.user.pk, self.bench.id, self.date)
+        EntryRollup.apply_deltas({key: [1, 3, 5, Decimal("1500")]})
+        EntryRollup.apply_deltas({key: [1, 2, 4, Decimal("800")]})
+
+        row = EntryRollup.objects.get()
+        self.assertEqual(
+            [row.entry_count, row.total_sets, row.total_reps, row.tonnage],
+            [2, 5, 9, Decimal("2300")]
+        )
+
+    def test_failed_rollup_rolls_back_entry(self):
+        self.add_entry(self.bench)
+
+        with mock.patch.object(EntryRollup, "apply_deltas", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.add_entry(self.bench, days=1)
+            with self.assertRaises(RuntimeError):
+                Entry.objects.bulk_create([Entry(
+                    trainee=self.user, exercise=self.squat, sets=1, reps=1,
+                    intensity=1, timestamp=self.date
+                )])
+
+        self.assertEqual(Entry.objects.count(), 1)
+        self.assertRollups()
+
+
+class StreamingTestCase(TestCase):
+    """
+    Checks that the streamed responses are streamed the way the handler serving
+    them consumes them, instead of being buffered whole.
+    """
+    fixtures = ["initial_data.json"]
+
+    def setUp(self):
+        self.user = User.objects.create_user("lifter", "lifter@example.com", "pass")
+        self.client.force_login(self.user)
+        self.async_client.force_login(self.user)
+
+        self.exercise = Exercise.objects.create(trainee=self.user, name="Bench")
+        Entry.objects.bulk_create([
+            Entry(trainee=self.user, exercise=self.exercise, sets=3, reps=5,
+                  intensity=100 + i, timestamp=datetime.date(2024, 1, 1) + datetime.timedelta(days=i))
+            for i in range(50)
+        ])
+
+    async def aget_streamed(self, url):
+        """
+        Requests the url through ASGI, failing if the response is consumed
+        synchronously, and returns it along with its content.
+        """
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            response = await self.async_client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.is_async)
+            content = b"".join([chunk async for chunk in response.streaming_content])
+        return response, content
+
+    async def test_exercise_entries(self):
+        url = reverse("exerciseEntries", args=[self.exercise.id])
+
+        response, content = await self.aget_streamed(url)
+        payload = json.loads(content)
+        self.assertEqual(len(payload["entries"]), 50)
+        self.assertEqual(payload["entries"][0]["intensity"], "100.00")
+
+        # the other formats are returned whole
+        response = await self.async_client.get(url + "?format=columnar")
+        self.assertFalse(response.streaming)
+
+    async def test_export(self):
+        program = await Program.objects.acreate(trainee=self.user, name="Program")
+        for i, days in enumerate(((0, 3), (), (1,))):
+            workout = await Workout.objects.acreate(
+                trainee=self.user, program=program, name=f"Workout {i}"
+            )
+            await workout.day.aset([day async for day in Day.objects.filter(day__in=days)])
+            await self.exercise.workout.aadd(workout)
+        await self.exercise.body_part.aadd(*[part async for part in BodyPart.objects.all()[:2]])
+
+        exports = {}
+        for format in ("ndjson", "csv"):
+            url = reverse("exportJournal") + f"?format={format}"
+            response, exports[format] = await self.aget_streamed(url)
+            # the same export as the synchronous one
+            expected = await sync_to_async(lambda : self.client.get(url).getvalue())()
+            self.assertEqual(exports[format], expected)
+
+        records = [json.loads(line) for line in exports["ndjson"].splitlines()]
+        self.assertEqual(
+            [record["type"] for record in records],
+            ["program"] + ["workout"] * 3 + ["exercise"] + ["entry"] * 50
+        )
+        self.assertEqual(
+            sorted(len(record["days"]) for record in records if record["type"] == "workout"),
+            [0, 1, 2]
+        )
+
+    def test_exercise_entries_wsgi(self):
+        response = self.client.get(reverse("exerciseEntries", args=[self.exercise.id]))
+        self.assertFalse(response.is_async)
+        self.assertEqual(len(json.loads(response.getvalue())["entries"]), 50)
+
+
+class ETagTestCase(TestCase):
+    """
+    Checks that the read views answer with 304 until the user's data changes.
+    """
+    fixtures = ["initial_data.json"]
+
+    def setUp(self):
+        self.user = User.objects.create_user("lifter", "lifter@example.com", "pass")
+        self.client.force_login(self.user)
+        self.exercise = Exercise.objects.create(trainee=self.user, name="Bench")
+        self.url = reverse("entriesInRange") + "?startDate=2024-05-06&endDate=2024-05-12"
+
+    def add_entries(self):
+        return self.client.post(reverse("entries"), {
+            "date": "2024-05-07",
+            "exercises": [{"id": str(self.exercise.id), "sets": 3, "reps": 5, "intensity": 100}]
+        }, content_type="application/json")
+
+    def test_not_modified_until_write(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+        self.assertIn("no-cache", response["Cache-Control"])
+
+        response = self.client.get(self.url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+
+        self.assertEqual(self.add_entries().status_code, 201)
+
+        response = self.client.get(self.url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(
+            sum(len(day["entries"]) for day in response.json()["payload"]), 1
+        )
+
+        response = self.client.get(self.url, headers={"If-None-Match": response["ETag"]})
+        self.assertEqual(response.status_code, 304)
+
+    def test_failed_write_keeps_etag(self):
+        etag = self.client.get(self.url)["ETag"]
+
+        response = self.client.post(reverse("entries"), {
+            "date": "not a date", "exercises": []
+        }, content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.get(self.url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_per_user(self):
+        etag = self.client.get(self.url)["ETag"]
+
+        other = User.objects.create_user("other", "other@example.com", "pass")
+        self.client.force_login(other)
+        response = self.client.get(self.url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+
+
+class TreeCacheTestCase(TestCase):
+    """
+    Checks that the cached program and workout trees are rebuilt whenever
+    anything in them changes, and only then.
+    """
+    fixtures = ["initial_data.json"]
+
+    # session and user lookups done by the auth middleware on every request
+    SESSION_QUERIES = 2
+
+    def setUp(self):
+        caches["journal"].clear()
+        self.user = User.objects.create_user("lifter", "lifter@example.com", "pass")
+        self.client.force_login(self.user)
+
+        self.program = Program.objects.create(trainee=self.user, name="Program")
+        self.workout = Workout.objects.create(
+            trainee=self.user, program=self.program, name="Push"
+        )
+        self.exercise = Exercise.objects.create(trainee=self.user, name="Bench")
+        self.exercise.workout.add(self.workout)
+
+    def program_tree(self):
+        return self.client.get(reverse("programWorkouts", args=[self.program.id])).json()
+
+    def workout_tree(self):
+        return self.client.get(reverse("workoutExercises", args=[self.workout.id])).json()
+
+    def test_cached(self):
+        self.program_tree()
+        self.workout_tree()
+
+        # logging entries leaves the trees be
+        Entry.objects.create(
+            trainee=self.user, exercise=self.exercise, sets=1, reps=1, intensity=1
+        )
+        with self.assertNumQueries(self.SESSION_QUERIES):
+            self.program_tree()
+        with self.assertNumQueries(self.SESSION_QUERIES):
+            self.workout_tree()
+
+    def test_workout_changes(self):
+        self.program_tree()
+
+        self.workout.name = "Push Day"
+        self.workout.save()
+        self.assertEqual(self.program_tree()["workouts"][0]["name"], "Push Day")
+
+        self.workout.day.add(Day.objects.get(day=0))
+        self.assertEqual(len(self.program_tree()["workouts"][0]["days"]), 1)
+        Day.objects.get(day=0).workout_set.remove(self.workout)
+        self.assertEqual(self.program_tree()["workouts"][0]["days"], [])
+
+        Workout.objects.create(trainee=self.user, program=self.program, name="Legs")
+        self.assertEqual(len(self.program_tree()["workouts"]), 2)
+        self.workout.delete()
+        self.assertEqual(
+            [workout["name"] for workout in self.program_tree()["workouts"]], ["Legs"]
+        )
+
+    def test_exercise_changes(self):
+        self.workout_tree()
+        part = BodyPart.objects.first()
+
+        self.exercise.name = "Bench Press"
+        self.exercise.save()
+        self.assertEqual(self.workout_tree()["exercises"][0]["name"], "Bench Press")
+
+        self.exercise.body_part.add(part)
+        self.assertEqual(len(self.workout_tree()["exercises"][0]["bodypart"]), 1)
+        part.exercise_set.clear()
+        self.assertEqual(self.workout_tree()["exercises"][0]["bodypart"], [])
+
+        squat = Exercise.objects.create(trainee=self.user, name="Squat")
+        self.workout.exercise_set.add(squat)
+        self.assertEqual(len(self.workout_tree()["exercises"]), 2)
+        self.exercise.workout.clear()
+        squat.delete()
+        self.assertEqual(self.workout_tree()["exercises"], [])
+
+    def test_changed_by_another_process(self):
+        self.workout_tree()
+
+        # written without signals, as if by a worker with a cache of its own
+        Exercise.objects.filter(id=self.exercise.id).update(name="Bench Press")
+        User.bump_catalog_version([self.user.pk])
+
+        self.assertEqual(self.workout_tree()["exercises"][0]["name"], "Bench Press")
+
+    def test_other_users_unaffected(self):
+        self.workout_tree()
+
+        other = User.objects.create_user("other", "other@example.com", "pass")
+        Exercise.objects.create(trainee=other, name="Squat")
+        with self.assertNumQueries(self.SESSION_QUERIES):
+            self.workout_tree()
+
+    def test_cleared_links(self):
+        part, day = BodyPart.objects.first(), Day.objects.get(day=0)
+        other = User.objects.create_user("other", "other@example.com", "pass")
+        squat = Exercise.objects.create(trainee=other, name="Squat")
+        squat.body_part.add(part)
+        Workout.objects.create(
+            trainee=other,
+            program=Program.objects.create(trainee=other, name="Program"),
+            name="Legs"
+        ).day.add(day)
+        self.workout_tree()
+        version = User.objects.get(pk=other.pk).catalog_version
+
+        # only the owners of the cleared links move on
+        part.exercise_set.clear()
+        day.workout_set.clear()
+        with self.assertNumQueries(self.SESSION_QUERIES):
+            self.workout_tree()
+        self.assertEqual(User.objects.get(pk=other.pk).catalog_version, version + 2)
+
+
+class CursorPagingTestCase(TestCase):
+    """
+    Checks that paging through the exercises by cursor visits every exercise
+    exactly once, in order, in both directions.
+    """
+    fixtures = ["initial_data.json"]
+
+    def setUp(self):
+        self.user = User.objects.create_user("lifter", "lifter@example.com", "pass")
+        self.client.force_login(self.user)
+
+        self.part = BodyPart.objects.first()
+        # repeated names are told apart by their IDs
+        self.exercises = [
+            Exercise.objects.create(trainee=self.user, name=f"Exercise {i % 9}")
+            for i in range(25)
+        ]
+        for exercise in self.exercises[::2]:
+            exercise.body_part.add(self.part)
+
+        other = User.objects.create_user("other", "other@example.com", "pass")
+        Exercise.objects.create(trainee=other, name="Exercise 0")
+
+    def page(self, cursor, **filters):
+        response = self.client.get(reverse("filterExercises"), {"cursor": cursor, **filters})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def walk(self, **filters):
+        """
+        Pages forwards to the end and back again, returning the IDs of the
+        exercises seen each way.
+        """
+        pages = [self.page("", **filters)]
+        self.assertFalse(pages[0]["hasPrevious"])
+        while pages[-1]["hasNext"]:
+            pages.append(self.page(pages[-1]["nextCursor"], **filters))
+        self.assertIsNone(pages[-1]["nextCursor"])
+        forwards = [exercise["id"] for page in pages for exercise in page["exercises"]]
+
+        backwards = [exercise["id"] for exercise in pages[-1]["exercises"]]
+        page = pages[-1]
+        while page["hasPrevious"]:
+            page = self.page(page["prevCursor"], **filters)
+            self.assertTrue(page["hasNext"])
+            backwards = [exercise["id"] for exercise in page["exercises"]] + backwards
+        self.assertIsNone(page["prevCursor"])
+
+        return forwards, backwards
+
+    def expected(self, exercises):
+        return [
+            str(exercise.id)
+            for exercise in sorted(exercises, key=lambda exercise : (exercise.name, exercise.id.hex))
+        ]
+
+    def test_walk(self):
+        forwards, backwards = self.walk()
+        self.assertEqual(forwards, self.expected(self.exercises))
+        self.assertEqual(backwards, forwards)
+
+    def test_walk_filtered(self):
+        forwards, backwards = self.walk(bodypart=self.part.id)
+        self.assertEqual(forwards, self.expected(self.exercises[::2]))
+        self.assertEqual(backwards, forwards)
+
+    def test_invalid_cursor(self):
+        for cursor in ("nonsense", base64.urlsafe_b64encode(b'["a", "b", "next"]').decode()):
+            response = self.client.get(reverse("filterExercises"), {"cursor": cursor})
+            self.assertEqual(response.status_code, 400)
+
+
+class SearchTestCase(TestCase):
+    """
+    Checks the name search against the names themselves, and that no user
+    ever finds another's exercises or workouts.
+    """
+    fixtures = ["initial_data.json"]
+
+    # session and user lookups done by the auth middleware on every request
+    SESSION_QUERIES = 2
+
+    def setUp(self):
+        typeahead.clear()
+        self.user = User.objects.create_user("lifter", "lifter@example.com", "pass")
+        self.client.force_login(self.user)
+
+        self.exercises = {
+            name: Exercise.objects.create(trainee=self.user, name=name)
+            for name in ("Bench Press", "Incline Bench Press", "Squat", "Front Squat")
+        }
+        self.workout = Workout.objects.create(
+            trainee=self.user,
+            program=Program.objects.create(trainee=self.user, name="Program"),
+            name="Bench Day"
+        )
+
+        self.other = User.objects.create_user("other", "other@example.com", "pass")
+        Exercise.objects.create(trainee=self.other, name="Bench Press")
+        Workout.objects.create(
+            trainee=self.other,
+            program=Program.objects.create(trainee=self.other, name="Program"),
+            name="Bench Day"
+        )
+
+    def match(self, query, kind="exercises"):
+        response = self.client.get(reverse("searchWorkoutAndExercises"), {"q": query})
+        return sorted(obj["name"] for obj in response.json()[kind])
+
+    def test_match(self):
+        # substrings in the middle of words are found too, ignoring case
+        self.assertEqual(self.match("ENCH"), ["Bench Press", "Incline Bench Press"])
+        self.assertEqual(self.match("quat"), ["Front Squat", "Squat"])
+        self.assertEqual(self.match("sq"), ["Front Squat", "Squat"])
+        self.assertEqual(self.match("deadlift"), [])
+        self.assertEqual(self.match("bench", "workouts"), ["Bench Day"])
+
+    def test_match_other_user(self):
+        self.match("bench")
+        self.client.force_login(self.other)
+        response = self.client.get(reverse("searchWorkoutAndExercises"), {"q": "bench"})
+        self.assertEqual(
+            [workout["id"] for workout in response.json()["workouts"]],
+            [str(Workout.objects.get(trainee=self.other).id)]
+        )
+        self.assertEqual(
+            [exercise["id"] for exercise in response.json()["exercises"]],
+            [str(Exercise.objects.get(trainee=self.other).id)]
+        )
+
+    def test_changes(self):
+        self.match("squat")
+        squat = self.exercises["Squat"]
+        squat.name = "Back Squat"
+        squat.save()
+        self.exercises["Bench Press"].delete()
+        self.workout.delete()
+
+        self.assertEqual(self.match("back"), ["Back Squat"])
+        self.assertEqual(self.match("squat"), ["Back Squat", "Front Squat"])
+        self.assertEqual(self.match("bench"), ["Incline Bench Press"])
+        self.assertEqual(self.match("bench", "workouts"), [])
+
+    def test_views(self):
+        response = self.client.get(reverse("suggestExercises"), {"q": "bench"})
+        self.assertEqual(
+            [exercise["name"] for exercise in response.json()["results"]],
+            ["Bench Press", "Incline Bench Press"]
+        )
+        self.assertEqual(
+            {exercise["id"] for exercise in response.json()["results"]},
+            {str(self.exercises[name].id) for name in ("Bench Press", "Incline Bench Press")}
+        )
+
+        response = self.client.get(reverse("searchWorkoutAndExercises"), {"q": "ben"})
+        self.assertEqual(
+            [workout["id"] for workout in response.json()["workouts"]], [str(self.workout.id)]
+        )
+        self.assertEqual(len(response.json()["exercises"]), 2)
+
+
+    def typeahead(self, query):
+        response = self.client.get(reverse("suggestExercises"), {"q": query})
+        return [exercise["name"] for exercise in response.json()["results"]]
+
+    def test_typeahead_order(self):
+        # names starting with the query, then words starting with it, then the rest
+        self.assertEqual(self.typeahead("squat"), ["Squat", "Front Squat"])
+        self.assertEqual(self.typeahead("quat"), ["Front Squat", "Squat"])
+        self.assertEqual(self.typeahead("ench"), ["Bench Press", "Incline Bench Press"])
+        self.assertEqual(self.typeahead("lift"), [])
+
+    def test_typeahead_from_memory(self):
+        self.typeahead("b")
+        Entry.objects.create(
+            trainee=self.user, exercise=self.exercises["Squat"], sets=1, reps=1, intensity=1
+        )
+
+        # every keystroke costs the session and user lookups only, whether it
+        # matches the start of a word or not
+        for query in ("be", "ben", "benc", "bench", "ench", "nch pr", "x"):
+            with self.assertNumQueries(self.SESSION_QUERIES):
+                self.typeahead(query)
+
+    def test_typeahead_changes(self):
+        self.typeahead("squat")
+        squat = self.exercises["Squat"]
+        squat.name = "Back Squat"
+        squat.save()
+        self.assertEqual(self.typeahead("squat"), ["Back Squat", "Front Squat"])
+
+        # as if changed by another process, without signals
+        Exercise.objects.filter(id=squat.id).update(name="Goblet Squat")
+        User.bump_catalog_version([self.user.pk])
+        self.assertEqual(self.typeahead("squat"), ["Front Squat", "Goblet Squat"])
+
+    def test_typeahead_other_user(self):
+        self.typeahead("bench")
+        self.client.force_login(self.other)
+        response = self.client.get(reverse("suggestExercises"), {"q": "bench"})
+        self.assertEqual(
+            [exercise["id"] for exercise in response.json()["results"]],
+            [str(Exercise.objects.get(trainee=self.other).id)]
+        )
+
+
+class BatchTestCase(TestCase):
+    """
+    Checks that batched sub-requests behave as if sent one by one, and that
+    only the JSON API can be batched.
+    """
+    fixtures = ["initial_data.json"]
+
+    def setUp(self):
+        self.user = User.objects.create_user("lifter", "lifter@example.com", "pass")
+        self.client.force_login(self.user)
+
+    def batch(self, *requests):
+        response = self.client.post(
+            reverse("batch"), {"requests": list(requests)}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()["results"]
+
+    def test_batch(self):
+        results = self.batch(
+            {"path": reverse("allPrograms")},
+            {
+                "path": reverse("program"),
+                "method": "POST",
+                "body": {"name": "Program", "description": ""}
+            },
+            {"path": reverse("allPrograms")},
+            {"path": "/nowhere"}
+        )
+        self.assertEqual([result["status"] for result in results], [200, 201, 200, 404])
+        self.assertEqual(results[0]["body"], {"programs": []})
+        self.assertEqual(
+            [program["name"] for program in results[2]["body"]["programs"]], ["Program"]
+        )
+
+    def test_rejects_other_routes(self):
+        paths = [
+            reverse("logout"), reverse("login"), reverse("register"), reverse("index"),
+            reverse("isLogged"), "/admin/", "/admin/logout/", reverse("batch"),
+            reverse("exportJournal"), reverse("importEntries")
+        ]
+        results = self.batch(*(
+            {"path": path, "method": method} for path in paths for method in ("GET", "POST")
+        ))
+        self.assertEqual({result["status"] for result in results}, {400})
+
+        # the batch's session survived
+        self.assertEqual(self.client.get(reverse("allPrograms")).status_code, 200)
+        self.assertEqual(self.client.session["_auth_user_id"], str(self.user.pk))
+
+    def test_failing_sub_request(self):
+        with self.assertLogs("django.request", "ERROR"):
+            results = self.batch(
+                {"path": reverse("program"), "method": "POST", "body": {}},
+                {
+                    "path": reverse("program"),
+                    "method": "POST",
+                    "body": {"name": "Program", "description": ""}
+                }
+            )
+        self.assertEqual(results[0], {"status": 500, "body": {"error": "Sub-request failed!"}})
+        self.assertEqual(results[1]["status"], 201)
+
+
+class SyncTestCase(TestCase):
+    """
+    Checks that a local copy kept up to date from the sync deltas always ends
+    up holding what a full sync would.
+    """
+    fixtures = ["initial_data.json"]
+
+    KEYS = ("programs", "workouts", "exercises", "entries")
+
+    def setUp(self):
+        self.user = User.objects.create_user("lifter", "lifter@example.com", "pass")
+        self.client.force_login(self.user)
+
+        self.program = Program.objects.create(trainee=self.user, name="Program")
+        self.workout = Workout.objects.create(
+            trainee=self.user, program=self.program, name="Push"
+        )
+        self.exercise = Exercise.objects.create(trainee=self.user, name="Bench")
+        self.entry = Entry.objects.create(
+            trainee=self.user, exercise=self.exercise, sets=3, reps=5, intensity=100
+        )
+
+        self.local = {key: {} for key in self.KEYS}
+        self.token = None
+        self.pull()
+
+    def sync(self, since=None):
+        response = self.client.get(reverse("sync"), {} if since is None else {"since": since})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def pull(self):
+        """
+        Applies the changes since the last sync to the local copy, returning
+        the response.
+        """
+        payload = self.sync(self.token)
+        if payload["reset"]:
+            self.local = {key: {} for key in self.KEYS}
+        for key in self.KEYS:
+            for obj in payload[key]["saved"]:
+                self.local[key][obj["id"]] = obj
+            for id in payload[key]["deleted"]:
+                self.local[key].pop(id, None)
+        self.token = payload["token"]
+        return payload
+
+    def assertSynced(self):
+        payload = self.sync()
+        self.assertTrue(payload["reset"])
+        self.assertEqual(self.local, {
+            key: {obj["id"]: obj for obj in payload[key]["saved"]} for key in self.KEYS
+        })
+
+    def test_changes(self):
+        self.assertSynced()
+
+        squat = Exercise.objects.create(trainee=self.user, name="Squat")
+        self.exercise.name = "Bench Press"
+        self.exercise.save()
+        self.exercise.workout.add(self.workout)
+        self.workout.day.add(Day.objects.get(day=0))
+        Entry.objects.create(trainee=self.user, exercise=squat, sets=5, reps=5, intensity=140)
+        payload = self.pull()
+        self.assertFalse(payload["reset"])
+        self.assertEqual(len(payload["exercises"]["saved"]), 2)
+        self.assertSynced()
+
+        # nothing changed in between
+        payload = self.pull()
+        self.assertEqual(
+            [payload[key] for key in self.KEYS], [{"saved": [], "deleted": []}] * 4
+        )
+
+    def test_deletions(self):
+        entry_id = str(self.entry.id)
+        self.entry.delete()
+        payload = self.pull()
+        self.assertEqual(payload["entries"]["deleted"], [entry_id])
+        self.assertSynced()
+
+        # deleting the program cascades to its workouts, unlinking the exercise
+        self.exercise.workout.add(self.workout)
+        self.pull()
+        program_id, workout_id = str(self.program.id), str(self.workout.id)
+        self.program.delete()
+        payload = self.pull()
+        self.assertEqual(payload["programs"]["deleted"], [program_id])
+        self.assertEqual(payload["workouts"]["deleted"], [workout_id])
+        self.assertSynced()
+
+        # created and deleted in between, so only its deletion is sent
+        squat = Exercise.objects.create(trainee=self.user, name="Squat")
+        exercise_ids = sorted([str(squat.id), str(self.exercise.id)])
+        squat.delete()
+        self.exercise.delete()
+        payload = self.pull()
+        self.assertEqual(payload["exercises"]["saved"], [])
+        self.assertEqual(sorted(payload["exercises"]["deleted"]), exercise_ids)
+        self.assertSynced()
+
+    def test_failed_user_delete(self):
+        other = User.objects.create_user("other", "other@example.com", "pass")
+        Program.objects.create(trainee=other, name="Program")
+
+        def fail(**kwargs):
+            raise RuntimeError
+        post_delete.connect(fail, sender=Program)
+        try:
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                self.user.delete()
+        finally:
+            post_delete.disconnect(fail, sender=Program)
+
+        # the user is kept, and so is the logging of their changes
+        entry_id = str(self.entry.id)
+        self.entry.delete()
+        payload = self.pull()
+        self.assertEqual(payload["entries"]["deleted"], [entry_id])
+        self.assertSynced()
+
+        other.delete()
+        self.assertFalse(ChangeLog.objects.filter(trainee_id=other.pk).exists())
+
+    def test_other_user(self):
+        other = User.objects.create_user("other", "other@example.com", "pass")
+        Exercise.objects.create(trainee=other, name="Squat")
+
+        payload = self.pull()
+        self.assertEqual(payload["exercises"], {"saved": [], "deleted": []})
+        self.assertSynced()
+
+    def test_tokens(self):
+        self.assertEqual(self.client.get(reverse("sync"), {"since": "-1"}).status_code, 400)
+        # a token this server never handed out starts over
+        self.assertTrue(self.sync(int(self.token) + 100)["reset"])
+
+
+class ImportTestCase(TestCase):
+    """
+    Checks that logs are imported whole, and that a single bad row rejects the
+    whole log, naming its line.
+    """
+    fixtures = ["initial_data.json"]
+
+    def setUp(self):
+        self.user = User.objects.create_user("lifter", "lifter@example.com", "pass")
+        self.client.force_login(self.user)
+        self.bench = Exercise.objects.create(trainee=self.user, name="Bench Press")
+
+    def upload(self, name, content):
+        return self.client.post(reverse("importEntries"), {
+            "file": SimpleUploadedFile(name, content.encode("utf-8-sig"))
+        })
+
+    def ndjson(self, *rows):
+        return "".join(
+            row if isinstance(row, str) else json.dumps(row) + "\n" for row in rows
+        )
+
+    def row(self, **fields):
+        return {
+            "date": "2024-05-06", "exercise": "Bench Press", "sets": 3, "reps": 5,
+            "intensity": 100, **fields
+        }
+
+    def assertRejected(self, line, content, name="log.ndjson"):
+        response = self.upload(name, content)
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(response.json()["error"].startswith(f"Line {line}:"), response.json())
+        self.assertFalse(Entry.objects.exists())
+
+    def test_import(self):
+        response = self.upload("log.csv", (
+            "date,exercise,sets,reps,intensity\n"
+            "2024-05-06,bench press,3,5,100\n"
+            "2024-05-06,Squat,5,5,140.5\n"
+            "2024-05-07,SQUAT,1,1,160\n"
+        ))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.json()["entries"], response.json()["exercises"]), (3, 1))
+
+        squat = Exercise.objects.get(trainee=self.user, name="Squat")
+        self.assertEqual(
+            sorted(Entry.objects.values_list("exercise_id", "timestamp", "sets", "reps", "intensity")),
+            sorted([
+                (self.bench.id, datetime.date(2024, 5, 6), 3, 5, Decimal("100")),
+                (squat.id, datetime.date(2024, 5, 6), 5, 5, Decimal("140.5")),
+                (squat.id, datetime.date(2024, 5, 7), 1, 1, Decimal("160"))
+            ])
+        )
+        self.assertEqual(PersonalRecord.objects.get(exercise=squat).max_intensity, 160)
+
+    def test_integral_numbers(self):
+        response = self.upload("log.ndjson", self.ndjson(
+            self.row(sets=3.0, reps="5", intensity="102.5"),
+            self.row(intensity=1e2)
+        ))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Entry.objects.count(), 2)
+
+    def test_invalid_counts(self):
+        for value in (True, False, 3.7, "3.7", -1, importing.MAX_COUNT + 1, [3], float("nan")):
+            with self.subTest(value=value):
+                self.assertRejected(2, self.ndjson(self.row(), self.row(reps=value)))
+
+    def test_invalid_intensities(self):
+        for value in (
+            "NaN", "nan", "sNaN", "Infinity", "-inf", float("nan"), float("inf"),
+            True, "heavy", -1, "9999.995", "1e30"
+            ):
+            with self.subTest(value=value):
+                self.assertRejected(2, self.ndjson(self.row(), self.row(intensity=value)))
+
+    def test_invalid_rows(self):
+        self.assertRejected(3, self.ndjson(self.row(), "\n", self.row(date="06/05/2024")))
+        self.assertRejected(1, self.ndjson(self.row(exercise=" ")))
+        self.assertRejected(1, self.ndjson(self.row(exercise="x" * 1000)))
+        self.assertRejected(2, self.ndjson(self.row(), "{not json}\n"))
+        self.assertRejected(1, self.ndjson("[1, 2]\n"))
+        self.assertRejected(1, "date,exercise,sets\n2024-05-06,Bench Press,3\n", "log.csv")
+        self.assertRejected(3, (
+            "date,exercise,sets,reps,intensity\n"
+            "2024-05-06,Bench Press,3,5,100\n"
+            "2024-05-06,Bench Press,3,,100\n"
+        ), "log.csv")
+
+    def test_reimport_export(self):
+        program = Program.objects.create(trainee=self.user, name="Program")
+        workout = Workout.objects.create(trainee=self.user, program=program, name="Push")
+        workout.day.add(Day.objects.get(day=0))
+        self.bench.workout.add(workout)
+        self.bench.body_part.add(BodyPart.objects.first())
+        squat = Exercise.objects.create(trainee=self.user, name="Squat")
+        Entry.objects.create(
+            trainee=self.user, exercise=self.bench, sets=3, reps=5, intensity=Decimal("100.5"),
+            timestamp=datetime.date(2024, 5, 6)
+        )
+        Entry.objects.create(
+            trainee=self.user, exercise=squat, sets=5, reps=5, intensity=140,
+            timestamp=datetime.date(2024, 5, 7)
+        )
+        fields = ("exercise__name", "timestamp", "sets", "reps", "intensity")
+        expected = sorted(Entry.objects.values_list(*fields))
+
+        for format in ("ndjson", "csv"):
+            with self.subTest(format=format):
+                export = self.client.get(reverse("exportJournal"), {"format": format})
+                content = export.getvalue().decode()
+                Entry.objects.all().delete()
+                squat.delete()
+
+                # the programs, workouts and exercises are skipped
+                response = self.upload(f"journal.{format}", content)
+                self.assertEqual(response.status_code, 201)
+                self.assertEqual((response.json()["entries"], response.json()["exercises"]), (2, 1))
+                self.assertEqual(sorted(Entry.objects.values_list(*fields)), expected)
+                self.assertEqual(Program.objects.count(), 1)
+                squat = Exercise.objects.get(trainee=self.user, name="Squat")
+
+    def test_failed_batch(self):
+        version = User.objects.get(pk=self.user.pk).data_version
+        import_entries, bulk_create = importing.import_entries, Entry.objects.bulk_create
+
+        def import_in_pairs(user, lines, format):
+            return import_entries(user, lines, format, batch_size=2)
+
+        def fail_second_batch(batch, *args, **kwargs):
+            if Entry.objects.exists():
+                raise RuntimeError
+            return bulk_create(batch, *args, **kwargs)
+
+        with mock.patch.object(importing, "import_entries", import_in_pairs), \
+                mock.patch.object(Entry.objects, "bulk_create", fail_second_batch):
+            with self.assertRaises(RuntimeError):
+                self.upload("log.ndjson", self.ndjson(*[self.row(reps=reps) for reps in range(1, 6)]))
+
+        # the first batch is kept, and ETags handed out before it are retired
+        self.assertEqual(sorted(Entry.objects.values_list("reps", flat=True)), [1, 2])
+        self.assertEqual(User.objects.get(pk=self.user.pk).data_version, version + 1)
+
+
+class SeriesTestCase(TestCase):
+    """
+    Checks the bucketed, downsampled and columnar shapes of an exercise's
+    entries against the entries themselves.
+    """
+    fixtures = ["initial_data.json"]
+
+    def setUp(self):
+        self.user = User.objects.create_user("lifter", "lifter@example.com", "pass")
+        self.client.force_login(self.user)
+        self.exercise = Exercise.objects.create(trainee=self.user, name="Bench")
+
+        # every other day from Monday the 1st of January, two sets on Fridays
+        self.entries = []
+        for i in range(30):
+            date = datetime.date(2024, 1, 1) + datetime.timedelta(days=2 * i)
+            for extra in range(2 if date.weekday() == 4 else 1):
+                self.entries.append(Entry.objects.create(
+                    trainee=self.user, exercise=self.exercise, sets=3 + extra, reps=5 + i % 3,
+                    intensity=Decimal("100.5") + i, timestamp=date
+                ))
+        self.url = reverse("exerciseEntries", args=[self.exercise.id])
+
+    def get(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        # the plain rows are streamed
+        return json.loads(response.getvalue())["entries"]
+
+    def assertBuckets(self, bucket, start):
+        """
+        Checks the buckets against the entries grouped by `start(date)`.
+        """
+        expected = {}
+        for entry in self.entries:
+            totals = expected.setdefault(start(entry.timestamp).isoformat(), {
+                "entryCount": 0, "sets": 0, "reps": 0, "volume": 0, "intensities": []
+            })
+            totals["entryCount"] += 1
+            totals["sets"] += entry.sets
+            totals["reps"] += entry.reps
+            totals["volume"] += entry.sets * entry.reps * entry.intensity
+            totals["intensities"].append(entry.intensity)
+
+        buckets = self.get(bucket=bucket)
+        self.assertEqual([row["date"] for row in buckets], sorted(expected))
+        for row in buckets:
+            totals = expected[row["date"]]
+            intensities = totals.pop("intensities")
+            self.assertEqual(
+                {key: row[key] for key in ("entryCount", "sets", "reps")},
+                {key: totals[key] for key in ("entryCount", "sets", "reps")}
+            )
+            self.assertEqual(Decimal(row["volume"]), totals["volume"])
+            self.assertEqual(Decimal(row["minIntensity"]), min(intensities))
+            self.assertEqual(Decimal(row["maxIntensity"]), max(intensities))
+            self.assertAlmostEqual(
+                float(row["avgIntensity"]), float(sum(intensities) / len(intensities))
+            )
+
+    def test_week_buckets(self):
+        self.assertBuckets(
+            "week", lambda date : date - datetime.timedelta(days=date.weekday())
+        )
+
+    def test_month_buckets(self):
+        self.assertBuckets("month", lambda date : date.replace(day=1))
+
+    def test_lttb(self):
+        points = [(x, 10 if x == 37 else x % 3) for x in range(100)]
+        coordinates = {"x": lambda point : point[0], "y": lambda point : point[1]}
+        sampled = lttb(points, 10, **coordinates)
+        self.assertEqual(len(sampled), 10)
+        self.assertEqual((sampled[0], sampled[-1]), (points[0], points[-1]))
+        # the peak shapes the series, so it's kept
+        self.assertIn((37, 10), sampled)
+        self.assertEqual(sampled, sorted(sampled))
+
+        # series within the budget, and budgets too small to pick from, are kept whole
+        for threshold in (100, 150, 2):
+            self.assertEqual(lttb(points, threshold, **coordinates), points)
+
+    def test_points(self):
+        rows = self.get()
+        for points in (3, 10, 20):
+            sampled = self.get(points=points)
+            self.assertEqual(len(sampled), points)
+            self.assertEqual((sampled[0], sampled[-1]), (rows[0], rows[-1]))
+
+        # downsampling the buckets keeps their first and last ones too
+        buckets = self.get(bucket="week")
+        sampled = self.get(bucket="week", points=4)
+        self.assertEqual(len(sampled), 4)
+        self.assertEqual((sampled[0], sampled[-1]), (buckets[0], buckets[-1]))
+
+    def decode(self, columns):
+        """
+        Rebuilds the rows of a columnar payload, with the dates as ISO strings.
+        """
+        dictionaries = columns.pop("dictionaries")
+        start = columns.pop("startDate")
+        if start is not None:
+            date = datetime.date.fromisoformat(start)
+            for i, delta in enumerate(columns["date"]):
+                date += datetime.timedelta(days=delta)
+                columns["date"][i] = date.isoformat()
+        for key, values in dictionaries.items():
+            columns[key] = [values[index] for index in columns[key]]
+        return [dict(zip(columns, row)) for row in zip(*columns.values())]
+
+    def normalize(self, rows):
+        """
+        Turns the decimal strings of row payloads into the floats sent in
+        columns.
+        """
+        return [{
+            key: float(value) if isinstance(value, str) and key not in ("id", "date") else value
+            for key, value in row.items()
+        } for row in rows]
+
+    def test_columnar(self):
+        for params in ({}, {"bucket": "week"}, {"bucket": "day", "points": 8}, {"points": 5}):
+            with self.subTest(**params):
+                rows = self.get(**params)
+                columns = self.get(format="columnar", **params)
+                self.assertEqual(self.decode(columns), self.normalize(rows))
+
+    def test_columnar_range(self):
+        squat = Exercise.objects.create(trainee=self.user, name="Squat")
+        for i in range(3):
+            Entry.objects.create(
+                trainee=self.user, exercise=squat, sets=5, reps=5, intensity=140,
+                timestamp=datetime.date(2024, 1, 3 + i)
+            )
+        dates = {"startDate": "2024-01-01", "endDate": "2024-01-14"}
+
+        response = self.client.get(reverse("entriesInRange"), dates)
+        rows = [
+            {**entry, "date": day["date"]}
+            for day in response.json()["payload"] for entry in day["entries"]
+        ]
+        response = self.client.get(reverse("entriesInRange"), {**dates, "format": "columnar"})
+        columns = response.json()["entries"]
+        # every exercise is sent once
+        self.assertEqual(len(columns["dictionaries"]["exercise"]), 2)
+        self.assertEqual(self.decode(columns), self.normalize(rows))
+
+        response = self.client.get(reverse("entriesInRange"), {
+            "startDate": "2023-01-01", "endDate": "2023-01-07", "format": "columnar"
+        })
+        self.assertEqual(
+            response.json()["entries"], {"startDate": None, "dictionaries": {"exercise": []}}
+        )
+
+    def test_invalid_parameters(self):
+        for params, error in (
+            ({"bucket": "year"}, "Bucket must be one of day, week, or month!"),
+            ({"points": "many"}, "Points must be an integer!"),
+            ({"points": "2"}, "Points must be at least 3!")
+            ):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json(), {"error": error})
+
+
+class AddEntriesTestCase(TestCase):
+    """
+    Checks that a group of entries is only ever added whole, and only for the
+    user's own exercises.
+    """
+    fixtures = ["initial_data.json"]
+
+    def setUp(self):
+        self.user = User.objects.create_user("lifter", "lifter@example.com", "pass")
+        self.client.force_login(self.user)
+        self.bench = Exercise.objects.create(trainee=self.user, name="Bench")
+
+        other = User.objects.create_user("other", "other@example.com", "pass")
+        self.others = Exercise.objects.create(trainee=other, name="Bench")
+
+    def add(self, *exercises):
+        return self.client.post(reverse("entries"), {
+            "date": "2024-05-06",
+            "exercises": [
+                {"id": str(exercise), "sets": 3, "reps": 5, "intensity": 100, **fields}
+                for exercise, fields in exercises
+            ]
+        }, content_type="application/json")
+
+    def test_add(self):
+        response = self.add((self.bench.id, {}), (self.bench.id, {"reps": 3}))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            sorted(Entry.objects.filter(trainee=self.user).values_list("reps", flat=True)), [3, 5]
+        )
+
+    def test_other_users_exercise(self):
+        for exercises in (
+            [(self.others.id, {})],
+            [(self.bench.id, {}), (self.others.id, {}), (self.bench.id, {})]
+            ):
+            response = self.add(*exercises)
+            self.assertEqual(response.status_code, 404)
+            self.assertEqual(
+                response.json(), {"error": f"Exercise with id {self.others.id} does not exist"}
+            )
+        self.assertFalse(Entry.objects.exists())
+        self.assertFalse(EntryRollup.objects.exists())
+
+    def test_bad_row(self):
+        for bad in ("not-an-id", uuid.uuid4()):
+            response = self.add((self.bench.id, {}), (bad, {}))
+            self.assertEqual(response.status_code, 404)
+        self.assertFalse(Entry.objects.exists())
+
+    def test_failed_insert(self):
+        # the database rejects the negative reps only once the batch is inserted
+        with self.assertRaises(IntegrityError):
+            self.add((self.bench.id, {}), (self.bench.id, {"reps": -1}))
+        self.assertFalse(Entry.objects.exists())
+        self.assertFalse(EntryRollup.objects.exists())
+        self.assertFalse(PersonalRecord.objects.exists())
+
+
+class AddExercisesTestCase(TestCase):
+    """
+    Checks that exercises added in bulk get their links, change log entries
+    and catalog version bump even though the bulk inserts skip the signals,
+    and that they're only ever added whole.
+    """
+    fixtures = ["initial_data.json"]
+
+    def setUp(self):
+        typeahead.clear()
+        self.user = User.objects.create_user("lifter", "lifter@example.com", "pass")
+        self.client.force_login(self.user)
+        self.workout = Workout.objects.create(
+            trainee=self.user,
+            program=Program.objects.create(trainee=self.user, name="Program"),
+            name="Push"
+        )
+        self.parts = list(BodyPart.objects.all()[:3])
+
+    def add(self, *exercises):
+        return self.client.post(reverse("addExercises"), {
+            "workoutId": str(self.workout.id),
+            "exercises": [
+                {"name": name, "description": "", "bodyparts": [str(part) for part in parts]}
+                for name, parts in exercises
+            ]
+        }, content_type="application/json")
+
+    def test_links(self):
+        response = self.add(
+            ("Bench", [self.parts[0].id, self.parts[1].id]),
+            ("Dips", [self.parts[2].id]),
+            ("Plank", [])
+        )
+        self.assertEqual(response.status_code, 201)
+
+        exercises = Exercise.objects.filter(trainee=self.user).prefetch_related("workout", "body_part")
+        self.assertEqual({
+            exercise.name: (
+                [workout.id for workout in exercise.workout.all()],
+                {part.id for part in exercise.body_part.all()}
+            ) for exercise in exercises
+        }, {
+            "Bench": ([self.workout.id], {self.parts[0].id, self.parts[1].id}),
+            "Dips": ([self.workout.id], {self.parts[2].id}),
+            "Plank": ([self.workout.id], set())
+        })
+
+    def test_bulk_inserts(self):
+        # loads the bodypart registry
+        self.add(("Squat", [self.parts[0].id]))
+
+        # as many queries for a single exercise as for a handful
+        with CaptureQueriesContext(connection) as single:
+            self.add(("Bench", [self.parts[0].id]))
+        with CaptureQueriesContext(connection) as several:
+            self.add(*((f"Exercise {i}", [part.id for part in self.parts]) for i in range(5)))
+        self.assertEqual(len(several), len(single))
+        self.assertEqual(Exercise.body_part.through.objects.count(), 2 + 5 * 3)
+
+    def test_change_log_and_catalog(self):
+        token = ChangeLog.latest_token(self.user)
+        version = User.objects.get(pk=self.user.pk).catalog_version
+        self.client.get(reverse("workoutExercises", args=[self.workout.id]))
+        self.client.get(reverse("suggestExercises"), {"q": "ben"})
+
+        self.add(("Bench", [self.parts[0].id]), ("Incline Bench", []))
+
+        self.assertGreater(User.objects.get(pk=self.user.pk).catalog_version, version)
+        response = self.client.get(reverse("sync"), {"since": token})
+        self.assertEqual(
+            sorted(exercise["name"] for exercise in response.json()["exercises"]["saved"]),
+            ["Bench", "Incline Bench"]
+        )
+        # the cached tree and typeahead index are rebuilt
+        response = self.client.get(reverse("workoutExercises", args=[self.workout.id]))
+        self.assertEqual(len(response.json()["exercises"]), 2)
+        response = self.client.get(reverse("suggestExercises"), {"q": "ben"})
+        self.assertEqual(len(response.json()["results"]), 2)
+
+    def test_invalid_bodypart(self):
+        response = self.add(("Bench", [self.parts[0].id]), ("Dips", [self.parts[0].id, 9999]))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json(), {"error": "Could not add Dips. Bodypart does not exist!"})
+        self.assertFalse(Exercise.objects.exists())
+
+    def test_failed_insert(self):
+        version = User.objects.get(pk=self.user.pk).catalog_version
+        with mock.patch.object(ChangeLog, "record", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.add(("Bench", [self.parts[0].id]), ("Dips", []))
+
+        self.assertFalse(Exercise.objects.exists())
+        self.assertFalse(Exercise.workout.through.objects.exists())
+        self.assertFalse(Exercise.body_part.through.objects.exists())
+        self.assertEqual(User.objects.get(pk=self.user.pk).catalog_version, version)
+
+
+class RegistryTestCase(TestCase):
+    """
+    Checks that the registry of bodyparts and days drops its rows whenever
+    either table is written, so the next read sees the change.
+    """
+    fixtures = ["initial_data.json"]
+
+    def tearDown(self):
+        # the test's writes are rolled back without any signals
+        registry.invalidate()
+
+    def test_body_parts(self):
+        part = registry.body_parts()[0]
+        BodyPart.objects.filter(id=part.id).update(name="Stale")
+        self.assertEqual(registry.body_part(part.id).name, part.name)
+
+        part.name = "Forearms"
+        part.save()
+        self.assertEqual(registry.body_part(part.id).name, "Forearms")
+
+        added = BodyPart.objects.create(name="Neck")
+        added_id = added.id
+        self.assertIn("Neck", [part.name for part in registry.body_parts()])
+        self.assertEqual(registry.body_part(added_id), added)
+
+        added.delete()
+        self.assertNotIn("Neck", [part.name for part in registry.body_parts()])
+        with self.assertRaises(BodyPart.DoesNotExist):
+            registry.body_part(added_id)
+
+    def test_days(self):
+        monday = registry.day(Day.DayChoices.MONDAY)
+        monday.delete()
+        with self.assertRaises(Day.DoesNotExist):
+            registry.day(Day.DayChoices.MONDAY)
+
+        added = Day.objects.create(day=Day.DayChoices.MONDAY)
+        self.assertEqual(registry.day(Day.DayChoices.MONDAY).pk, added.pk)
+
+
+class AnalyticsTestCase(TestCase):
+    """
+    Checks the progression analytics of an exercise against values worked
+    out by hand on short fixed histories.
+    """
+    fixtures = ["initial_data.json"]
+
+    def setUp(self):
+        self.user = User.objects.create_user("lifter", "lifter@example.com", "pass")
+        self.client.force_login(self.user)
+        self.exercise = Exercise.objects.create(trainee=self.user, name="Bench")
+
+    def log(self, *entries):
+        Entry.objects.bulk_create([
+            Entry(
+                trainee=self.user, exercise=self.exercise,
+                timestamp=datetime.date.fromisoformat(date),
+                sets=sets, reps=reps, intensity=intensity
+            ) for date, sets, reps, intensity in entries
+        ])
+
+    def analyze(self, **params):
+        response = self.client.get(
+            reverse("exerciseAnalytics", args=[self.exercise.id]), params
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_progression(self):
+        self.log(
+            ("2024-01-01", 1, 5, 90),
+            ("2024-01-08", 3, 1, 110),
+            # no reps, so nothing lifted
+            ("2024-01-08", 2, 0, 200),
+            ("2024-01-15", 1, 10, 90),
+            # past the Brzycki formula's range
+            ("2024-01-22", 1, 40, 30),
+        )
+        payload = self.analyze(window=2, plateau=1)
+
+        self.assertEqual(payload["entryCount"], 5)
+        self.assertEqual(payload["sessionCount"], 4)
+        self.assertEqual(payload["sessions"], {
+            "date": ["2024-01-01", "2024-01-08", "2024-01-15", "2024-01-22"],
+            "entries": [1, 2, 1, 1],
+            "maxIntensity": [90.0, 110.0, 90.0, 30.0],
+            "epley1rm": [105.0, 110.0, 120.0, 70.0],
+            "brzycki1rm": [101.25, 110.0, 120.0, None],
+            "volume": [450.0, 330.0, 900.0, 1200.0],
+            "movingAverage": [105.0, 107.5, 115.0, 95.0]
+        })
+        # least squares through (0, 105), (7, 110), (14, 120), (21, 70)
+        self.assertEqual(payload["trend"], {
+            "method": "linear",
+            "slopePerWeek": -9.5,
+            "start": 115.5,
+            "end": 87.0,
+            "changePercent": -24.68
+        })
+        # no new best after the 120 of the third session
+        self.assertEqual(payload["plateaus"], [
+            {"start": "2024-01-15", "end": "2024-01-22", "sessions": 1, "best": 120.0}
+        ])
+        self.assertTrue(payload["plateaued"])
+
+        payload = self.analyze()
+        self.assertEqual(payload["plateaus"], [])
+        self.assertFalse(payload["plateaued"])
+
+    def test_robust_trend(self):
+        # five pounds a week, apart from a mislogged sixth session
+        weights = (100, 105, 110, 115, 120, 60, 130)
+        start = datetime.date(2024, 1, 1)
+        self.log(*[
+            ((start + datetime.timedelta(weeks=week)).isoformat(), 1, 1, weight)
+            for week, weight in enumerate(weights)
+        ])
+
+        linear = self.analyze()["trend"]
+        self.assertEqual(linear["slopePerWeek"], 0.36)
+        self.assertEqual(self.analyze(trend="robust")["trend"], {
+            "method": "robust",
+            "slopePerWeek": 5.0,
+            "start": 100.0,
+            "end": 130.0,
+            "changePercent": 30.0
+        })
+
+    def test_single_session(self):
+        self.log(("2024-01-01", 3, 5, 90))
+        payload = self.analyze(plateau=1)
+
+        self.assertEqual(payload["sessions"]["epley1rm"], [105.0])
+        self.assertEqual(payload["sessions"]["movingAverage"], [105.0])
+        self.assertIsNone(payload["trend"])
+        self.assertEqual(payload["plateaus"], [])
+        self.assertFalse(payload["plateaued"])
+
+    def test_flat(self):
+        self.log(*[(f"2024-01-{day:02}", 1, 1, 100) for day in (1, 8, 15, 22)])
+
+        for trend in analytics.TRENDS:
+            payload = self.analyze(trend=trend, plateau=3)
+            self.assertEqual(payload["sessions"]["movingAverage"], [100.0] * 4)
+            self.assertEqual(payload["trend"], {
+                "method": trend,
+                "slopePerWeek": 0.0,
+                "start": 100.0,
+                "end": 100.0,
+                "changePercent": 0.0
+            })
+            self.assertEqual(payload["plateaus"], [
+                {"start": "2024-01-01", "end": "2024-01-22", "sessions": 3, "best": 100.0}
+            ])
+            self.assertTrue(payload["plateaued"])
@@ -0,0 +1,193 @@
+"""
+Process-wide, per-user typeahead index answering the `searchExercises` and
+`searchWorkoutAndExercises` views from memory.
+
+A user's index is built on their first search from a single read of their
+exercises and workouts. It keeps every object's serialized payload, its
+lowercased name and a prefix trie over the start of every word of its name,
+so that every keystroke is answered without touching the database. Recent
+query results are kept in a small LRU, so that retyping or backspacing doesn't
+even walk the trie.
+
+An index is keyed on the user's catalog version, which the signal handlers in
+signals.py move on whenever one of the user's exercises or workouts changes,
+so an index is rebuilt after changes made by any process. Logging entries
+keeps the version, and with it the index.
+"""
+from collections import OrderedDict
+import heapq
+import re
+import threading
+
+from asgiref.sync import sync_to_async
+
+from .models import Exercise, Workout
+
+
+# number of users whose indexes are kept in memory
+MAX_INDEXES = 256
+
+# number of recent query results kept per user
+MAX_RESULTS = 128
+
+WORD_START = re.compile(r"(?<!\w)\w")
+
+
+class NameTrie:
+    """
+    Prefix trie over the words of a set of names. Every node holds the keys of
+    the names having a word starting with that node's prefix.
+    """
+
+    def __init__(self):
+        self._root = ({}, set())
+
+    def add(self, name, key):
+        name = name.lower()
+        for start in WORD_START.finditer(name):
+            node = self._root
+            for char in name[start.start():]:
+                node = node[0].setdefault(char, ({}, set()))
+                node[1].add(key)
+
+    def lookup(self, prefix):
+        node = self._root
+        for char in prefix.lower():
+            node = node[0].get(char)
+            if node is None:
+                return set()
+        return node[1]
+
+
+class UserIndex:
+    """
+    One user's exercises and workouts, their name tries, and recent results.
+    """
+
+    def __init__(self, user_pk, version):
+        self.user_pk = user_pk
+        self.version = version
+        # lowercased names by key, for each kind
+        self.names = {}
+        self.payloads = {}
+        self.tries = {}
+        self.results = OrderedDict()
+        self._lock = threading.Lock()
+
+        querysets = {
+            "exercise": Exercise.objects.prefetch_related("body_part"),
+            "workout": Workout.objects.prefetch_related("day"),
+        }
+        for kind, queryset in querysets.items():
+            trie = self.tries[kind] = NameTrie()
+            names = self.names[kind] = {}
+            for obj in queryset.filter(trainee_id=user_pk):
+                key = obj.pk.hex
+                names[key] = obj.name.lower()
+                self.payloads[key] = obj.serialize()
+                trie.add(obj.name, key)
+
+    def cached(self, kind, query, limit):
+        """
+        Returns the recent results of the query, or None if there aren't any.
+        """
+        cache_key = (kind, query.lower(), limit)
+        with self._lock:
+            if cache_key in self.results:
+                self.results.move_to_end(cache_key)
+                return self.results[cache_key]
+        return None
+
+    def search(self, kind, query, limit):
+        """
+        Returns the payloads of up to `limit` objects of the given kind matching
+        the query. Names starting with the query come first, then names with a
+        later word starting with it, then names containing it anywhere else,
+        each alphabetically.
+        """
+        results = self.cached(kind, query, limit)
+        if results is not None:
+            return results
+
+        prefix = query.lower()
+        names = self.names[kind]
+        keys = heapq.nsmallest(
+            limit,
+            self.tries[kind].lookup(prefix),
+            key=lambda key: (not names[key].startswith(prefix), names[key], key)
+        )
+        if len(keys) < limit:
+            # topped up with the names containing the query within a word
+            found = set(keys)
+            keys += heapq.nsmallest(
+                limit - len(keys),
+                (key for key, name in names.items() if prefix in name and key not in found),
+                key=lambda key: (names[key], key)
+            )
+
+        results = [self.payloads[key] for key in keys]
+        with self._lock:
+            self.results[(kind, prefix, limit)] = results
+            if len(self.results) > MAX_RESULTS:
+                self.results.popitem(last=False)
+        return results
+
+
+class Typeahead:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._indexes = OrderedDict()
+
+    def _current(self, user):
+        """
+        Returns the user's index if it's up to date, otherwise None.
+        """
+        with self._lock:
+            index = self._indexes.get(user.pk)
+            if index is not None and index.version == user.catalog_version:
+                self._indexes.move_to_end(user.pk)
+                return index
+        return None
+
+    def _index(self, user):
+        index = self._current(user)
+        if index is not None:
+            return index
+
+        index = UserIndex(user.pk, user.catalog_version)
+        with self._lock:
+            # a request which read the user earlier mustn't replace a newer index
+            kept = self._indexes.get(user.pk)
+            if kept is None or kept.version < index.version:
+                self._indexes[user.pk] = index
+            self._indexes.move_to_end(user.pk)
+            if len(self._indexes) > MAX_INDEXES:
+                self._indexes.popitem(last=False)
+        return index
+
+    def search(self, user, kind, query, limit):
+        """
+        Returns the serialized payloads of up to `limit` of the user's exercises
+        or workouts (`kind`) matching the query, best matches first.
+        """
+        return self._index(user).search(kind, query, limit)
+
+    async def asearch(self, user, kind, query, limit):
+        """
+        Async version of `search()`. An up to date index is searched straight
+        away, only building one is done off the event loop.
+        """
+        index = self._current(user)
+        if index is not None:
+            return index.search(kind, query, limit)
+        return await sync_to_async(self.search)(user, kind, query, limit)
+
+    def clear(self):
+        """
+        Drops every user's index.
+        """
+        with self._lock:
+            self._indexes.clear()
+
+
+typeahead = Typeahead()
@@ -25,6 +25,7 @@ urlpatterns = [
     # Bodyparts
     path("bodypart/all", views.allBodyparts, name="allBodyparts"),
     path("bodypart/count/range/", views.bodypartInRange, name="bodypartInRange"),
+    path("bodypart/volume/", views.bodypartVolume, name="bodypartVolume"),
 
     # For a singular entry
     path("entry/", views.entry, name="entry"),
@@ -33,14 +34,29 @@ urlpatterns = [
     # For bulk handling of entries
     path("entries/range/", views.entriesInRange, name="entriesInRange"),
     path("entries/calendar/", views.entries_calendar, name="entriesCalendar"),
+    path("entries/calendar/year/", views.entries_calendar_year, name="entriesCalendarYear"),
+    path("entries/summary/", views.entriesSummary, name="entriesSummary"),
+    path("dashboard/week/", views.dashboardWeek, name="dashboardWeek"),
     path("entries/add", views.addEntries, name="entries"),
+    path("entries/import", views.importEntries, name="importEntries"),
 
     # For bulk handling of exercises
     path("exercise/", views.exercise, name="exercise"),
     path("exercises/add/", views.addExercises, name="addExercises"),
     path("exercises/filter/", views.filterExercises, name="filterExercises"),
+    path("exercise/<str:exerciseId>/analytics", views.exerciseAnalytics, name="exerciseAnalytics"),
+    path("records/", views.records, name="records"),
 
     # Search Routes
     path("search/exercises/", views.searchExercises, name="suggestExercises"),
-    path("search/workoutandexercises/", views.searchWorkoutAndExercises, name="searchWorkoutAndExercises")
+    path("search/workoutandexercises/", views.searchWorkoutAndExercises, name="searchWorkoutAndExercises"),
+
+    # Sync Routes
+    path("sync/", views.sync, name="sync"),
+
+    # Export Routes
+    path("export/", views.exportJournal, name="exportJournal"),
+
+    # Batch Routes
+    path("batch/", views.batch, name="batch")
 ]
\ No newline at end of file
@@ -1,18 +1,36 @@
+from asgiref.sync import async_to_sync, iscoroutinefunction
 from django.shortcuts import render
-from django.http import JsonResponse
+from django.http import HttpRequest, JsonResponse, QueryDict, StreamingHttpResponse
 from django.contrib.auth import authenticate, login, logout
-from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
-from django.db import IntegrityError
+from django.db import IntegrityError, transaction
 from django.shortcuts import HttpResponseRedirect, render
-from django.urls import reverse
-from django.db.models import Q, Count
+from django.urls import Resolver404, resolve, reverse
+from django.utils.http import urlencode
+from django.db.models import Q, Prefetch, Sum
 
+import io
 import json
+import logging
+import base64
 import datetime
 import itertools
+import uuid
 
+from . import analytics, caching, exporting, importing
+from .decorators import bumps_data_version, etag_data_version, login_required
 from .models import *
+from .registry import registry
+from .responses import StreamingJsonResponse, is_asgi
+from .series import lttb, to_columns
+from .typeahead import typeahead
+
+
+logger = logging.getLogger("django.request")
+
+
+# number of rows read from the database at a time when streaming responses
+ENTRY_CHUNK_SIZE = 2000
 
 
 def index(request):
@@ -117,6 +135,8 @@ def register(request):
 #==============================================================================#
 
 @login_required
+@bumps_data_version
+@etag_data_version
 def program(request):
     """
     Handles CRUD operations related to Programs.
@@ -193,7 +213,7 @@ def program(request):
         
         if (request.user.current_program == program):
             request.user.current_program = None
-            request.user.save()
+            request.user.save(update_fields=["current_program"])
 
         program.delete()
 
@@ -203,35 +223,67 @@ def program(request):
 
 
 @login_required
-def programWorkouts(request, programId):
+@etag_data_version
+async def programWorkouts(request, programId):
     """
     Returns the requested program and all its workouts.
 
     If the supplied program string is `current`, returns the current program and
     its workouts instead.
+
+    The program tree is served from the cache whenever it's unchanged since it
+    was last built.
     """
     if (programId == 'current'):    
-        program = request.user.current_program
-        if (program is None):
+        programId = request.user.current_program_id
+        if (programId is None):
             return JsonResponse({
                 "program": []
             }, status=200)
-    else:
+
+    try:
+        programId = uuid.UUID(str(programId))
+    except ValueError:
+        return JsonResponse({
+            "error": "No such program with the given ID"
+        }, status=404)
+
+    tree = await caching.aget_tree("program", request.user, programId)
+
+    if tree is None:
         try:
-            program = Program.objects.get(id=programId)
+            program = await Program.objects.aget(id=programId)
         except Program.DoesNotExist:
             return JsonResponse({
                 "error": "No such program with the given ID"
             }, status=404)
-    
-    workouts = Workout.objects.filter(trainee=request.user, program=program).order_by('name')
+        
+        workouts = Workout.objects.filter(
+            trainee=request.user,
+            program=program
+            ).prefetch_related('day').order_by('name')
+
+        tree = {
+            "program": {
+                "id": program.id,
+                "name": program.name,
+                "description": program.description
+            },
+            "workouts": [workout.serialize() async for workout in workouts]
+        }
+        await caching.aset_tree("program", request.user, programId, tree)
 
     return JsonResponse({
-        "program": program.serialize(),
-        "workouts": [workout.serialize() for workout in workouts]
+        "program": {
+            **tree["program"],
+            "isCurrent": request.user.current_program_id == programId
+        },
+        "workouts": tree["workouts"]
         }, safe=False)
 
 @login_required
+@bumps_data_version
+@etag_data_version
 def currentProgram(request):
     """
     Handles retrieval, update, and removal of the current program for the user.
@@ -264,7 +316,7 @@ def currentProgram(request):
             }, status=404)
         
         request.user.current_program = program
-        request.user.save()
+        request.user.save(update_fields=["current_program"])
 
         return JsonResponse({
             "message": f"Successfully added {program.name} as current program!"
@@ -275,7 +327,7 @@ def currentProgram(request):
         if (request.user.current_program != None):
             name = request.user.current_program.name
             request.user.current_program = None
-            request.user.save()
+            request.user.save(update_fields=["current_program"])
             return JsonResponse({
                 "messge": f"Successfully removed {name} as current program!"
             }, status=201)
@@ -287,6 +339,7 @@ def currentProgram(request):
 
 
 @login_required
+@etag_data_version
 def allPrograms(request):
     """
     Returns a list of all the user's programs.
@@ -303,6 +356,7 @@ def allPrograms(request):
 #==============================================================================#
 
 @login_required
+@bumps_data_version
 def workout(request):
     """
     Handles creating, updating, and deleting Workout objects.
@@ -327,7 +381,7 @@ def workout(request):
             }, status=400)
 
         try:
-            day = Day.objects.get(day=dayNum)
+            day = registry.day(dayNum)
         except Day.DoesNotExist:
             return JsonResponse({
                 "error": "Given day is outside the 0-6 range"
@@ -397,6 +451,7 @@ def workout(request):
 
 
 @login_required
+@bumps_data_version
 def workoutDay(request, workoutId):
     """
     Handles addition or removal of a day from a workout.
@@ -429,7 +484,7 @@ def workoutDay(request, workoutId):
         }, status=400)
 
     try:
-        day = Day.objects.get(day=dayNum)
+        day = registry.day(dayNum)
     except Day.DoesNotExist:
         return JsonResponse({
             "error": "Given day is outside the 0-6 range"
@@ -450,26 +505,46 @@ def workoutDay(request, workoutId):
 
 
 @login_required
+@etag_data_version
 def workoutExercises(request, workoutId):
     """
     Returns a workouts and all of its exercises.
+
+    The workout tree is served from the cache whenever it's unchanged since it
+    was last built.
     """
     try:
-        workout = Workout.objects.get(id=workoutId, trainee=request.user)
-    except Workout.DoesNotExist:
+        workoutId = uuid.UUID(str(workoutId))
+    except ValueError:
         return JsonResponse({
             "error": "Workout does not exist"
         }, status=404)
+
+    tree = caching.get_tree("workout", request.user, workoutId)
+
+    if tree is None:
+        try:
+            workout = Workout.objects.get(id=workoutId, trainee=request.user)
+        except Workout.DoesNotExist:
+            return JsonResponse({
+                "error": "Workout does not exist"
+            }, status=404)
+        
+        exercises = Exercise.objects.filter(
+            workout=workout
+            ).prefetch_related('body_part').order_by('name')
+
+        tree = {
+            "workout": workout.serialize(),
+            "exercises": [exercise.serialize() for exercise in exercises]
+        }
+        caching.set_tree("workout", request.user, workoutId, tree)
     
-    exercises = Exercise.objects.filter(workout=workout).order_by('name')
-    
-    return JsonResponse({
-        "workout": workout.serialize(),
-        "exercises": [exercise.serialize() for exercise in exercises]
-        }, safe=False)
+    return JsonResponse(tree, safe=False)
 
 
 @login_required
+@bumps_data_version
 def addExerciseToWorkout(request):
     """
     Handles addition or deletion of an exercise from a workout.
@@ -517,11 +592,12 @@ def addExerciseToWorkout(request):
 #==============================================================================#
 
 @login_required
+@etag_data_version
 def allBodyparts(request):
     """
     Returns a list of all bodyparts.
     """
-    bodyparts = BodyPart.objects.all()
+    bodyparts = registry.body_parts()
     payload = [part.serialize() for part in bodyparts]
 
     return JsonResponse({
@@ -534,6 +610,7 @@ def allBodyparts(request):
 #==============================================================================#
 
 @login_required
+@bumps_data_version
 def entry(request):
     """
     Handles editing and deletion of Entries.
@@ -578,9 +655,13 @@ def entry(request):
 
 
 @login_required
+@bumps_data_version
 def addEntries(request):
     """
     Adds the given group of entries to the database. Does not do partial updates.
+
+    All the referenced exercises are looked up in one query and the entries are
+    inserted in one batch inside a single transaction.
     """
     # Adding entries must be done via POST
     if request.method != 'POST':
@@ -597,20 +678,33 @@ def addEntries(request):
             "error": "Given date is invalid!"
         }, status=400)
 
+    submitted = data.get("exercises")
+
+    # fetch all the referenced exercises of the user at once
+    exerciseIds = set()
+    for entry in submitted:
+        try:
+            exerciseIds.add(uuid.UUID(str(entry["id"])))
+        except ValueError:
+            return JsonResponse(
+                {"error": f"Exercise with id {entry['id']} does not exist"},
+                status=404)
+
+    exercises = Exercise.objects.filter(trainee=request.user).in_bulk(exerciseIds)
+
     # list to pool all entries into
     valid_entries = []
 
-    for entry in data.get("exercises"):
+    for entry in submitted:
         exerciseId = entry["id"]
         sets = entry["sets"]
         reps = entry["reps"]
         intensity = entry["intensity"]
 
-        try:
-            exercise = Exercise.objects.get(id=exerciseId)
-        except Exercise.DoesNotExist:
+        exercise = exercises.get(uuid.UUID(str(exerciseId)))
+        if exercise is None:
             return JsonResponse(
-                {"error": "Exercise with id" + exerciseId + "does not exist"},
+                {"error": f"Exercise with id {exerciseId} does not exist"},
                 status=404)
 
         newEntry = Entry(
@@ -623,32 +717,79 @@ def addEntries(request):
         )
         valid_entries.append(newEntry)
 
-    for entry in valid_entries:
-        entry.save()
+    with transaction.atomic():
+        Entry.objects.bulk_create(valid_entries)
 
     return JsonResponse({"message": "Entries added successfully"}, status=201)
 
 
 @login_required
-def entries_calendar(request):
+def importEntries(request):
+    """
+    Imports an uploaded CSV or NDJSON training log (see importing.py), creating
+    the exercises it names which don't exist yet.
+
+    The format is taken from the `format` parameter, or else the file's
+    extension. Every row is validated before anything is inserted, and the
+    entries are then inserted in batches as the file is read. The user's data
+    version is bumped once inserting starts, even if a later batch fails.
+    """
+    if request.method != 'POST':
+        return JsonResponse({
+            "error": "POST request required"
+        }, status=400)
+
+    upload = request.FILES.get("file")
+    if upload is None:
+        return JsonResponse({
+            "error": "A log file is required!"
+        }, status=400)
+
+    format = request.POST.get("format") or importing.guess_format(upload.name)
+    if format not in importing.FORMATS:
+        return JsonResponse({
+            "error": "Format must be either csv or ndjson!"
+        }, status=400)
+
+    lines = io.TextIOWrapper(upload.file, encoding="utf-8-sig", newline="")
+    try:
+        importing.validate(lines, format)
+        lines.seek(0)
+        try:
+            entries, exercises = importing.import_entries(request.user, lines, format)
+        finally:
+            # earlier batches are kept even if a later one fails
+            request.user.bump_data_version()
+    except (importing.LogError, UnicodeDecodeError) as exc:
+        return JsonResponse({
+            "error": str(exc)
+        }, status=400)
+
+    return JsonResponse({
+        "message": "Log imported successfully",
+        "entries": entries,
+        "exercises": exercises
+    }, status=201)
+
+
+@login_required
+@etag_data_version
+async def entries_calendar(request):
     """
     Returns a list of all the dates which have a journal entry for a given month.
     """
     try:
         year = int(request.GET.get("year"))
         month = int(request.GET.get("month"))
+        datetime.date(year, month, 1)
     except:
         return JsonResponse({
             "error": "Invalid year/month value"
         }, status=400)
 
-    dates = Entry.objects.filter(
-        trainee=request.user, 
-        timestamp__year=year, 
-        timestamp__month=month
-        ).dates('timestamp', 'day')     # get only the date column values
+    bitmap = await ActivityBitmap.objects.filter(trainee=request.user, year=year).afirst()
     
-    payload = [entry.day for entry in dates]
+    payload = [date.day for date in bitmap.active_dates(month)] if bitmap else []
 
     return JsonResponse({
         "dates": payload
@@ -656,11 +797,42 @@ def entries_calendar(request):
 
 
 @login_required
-def entriesInRange(request):
+@etag_data_version
+def entries_calendar_year(request):
+    """
+    Returns the days of a given year which have a journal entry as a bitset.
+
+    The bitset is base64 encoded, with bit `n` (counting from the least
+    significant bit of the first byte) set if the (n + 1)th day of the year has
+    an entry.
+    """
+    try:
+        year = int(request.GET.get("year"))
+        datetime.date(year, 1, 1)
+    except:
+        return JsonResponse({
+            "error": "Invalid year value"
+        }, status=400)
+
+    bitmap = ActivityBitmap.objects.filter(trainee=request.user, year=year).first()
+    days = bytes(bitmap.days) if bitmap else bytes(46)
+
+    return JsonResponse({
+        "year": year,
+        "days": base64.b64encode(days).decode()
+    }, status=200)
+
+
+@login_required
+@etag_data_version
+async def entriesInRange(request):
     """
     Returns all journal entries within a given date range.
 
     If no range is provided, return the current week' (starting at Monday) entries.
+
+    With the `format` set to `columnar`, the entries are returned as parallel
+    arrays (see `series.to_columns()`) instead of being grouped by date.
     """
     try:
         end_date = returnDate(request.GET.get("endDate"), datetime.date.today())
@@ -670,23 +842,163 @@ def entriesInRange(request):
             "error": "Invalid arguments to start or end date"
         }, status=400)
 
-    entries = Entry.objects.filter(
+    columnar = request.GET.get("format") == "columnar"
+
+    entries = await Entry.objects.filter(
         trainee=request.user,
         timestamp__range=((start_date, end_date))
-        ).order_by("-timestamp")
+        ).order_by("-timestamp").aserialize()
+
+    if columnar:
+        return JsonResponse({
+            "format": "columnar",
+            "entries": to_columns(entries, dictionary=("exercise",))
+        }, status=200)
     
-    # sort entries according to timestamp
-    iter = itertools.groupby(entries, lambda entry : entry.timestamp)
+    # group entries according to timestamp, dropping it from each entry's payload
+    iter = itertools.groupby(entries, lambda entry : entry.pop("date"))
 
     payload = [{
         "date": day.strftime('%Y-%m-%d'),
-        "entries": list(e.serialize() for e in entries)
+        "entries": list(entries)
         } for day, entries in iter]
 
     return JsonResponse(({
             "payload": payload
         }), status=200)
 
+
+@login_required
+@etag_data_version
+def entriesSummary(request):
+    """
+    Returns the daily per-exercise totals (entry count, sets, reps, and tonnage)
+    of the user's entries within a given date range, along with the totals for
+    the whole range.
+
+    If no range is provided, returns the current week's (starting at Monday)
+    totals, or the current month's if the `period` is set to `month`.
+    """
+    period = request.GET.get("period", "week")
+    if period not in ("week", "month"):
+        return JsonResponse({
+            "error": "Period must be either week or month"
+        }, status=400)
+
+    try:
+        end_date = returnDate(request.GET.get("endDate"), datetime.date.today())
+        if period == "month":
+            default_start = end_date.replace(day=1)
+        else:
+            default_start = end_date - datetime.timedelta(days = end_date.weekday())
+        start_date = returnDate(request.GET.get("startDate"), default_start)
+    except ValueError:
+        return JsonResponse({
+            "error": "Invalid arguments to start or end date"
+        }, status=400)
+
+    rollups = EntryRollup.objects.filter(
+        trainee=request.user,
+        date__range=(start_date, end_date)
+        ).select_related("exercise").order_by("-date", "exercise__name")
+
+    totals = {"entryCount": 0, "sets": 0, "reps": 0, "tonnage": 0}
+    payload = []
+
+    for day, rows in itertools.groupby(rollups, lambda rollup : rollup.date):
+        exercises = [rollup.serialize() for rollup in rows]
+        daily = {
+            key: sum(exercise[key] for exercise in exercises) for key in totals
+        }
+        for key in totals:
+            totals[key] += daily[key]
+
+        payload.append({
+            "date": day.strftime('%Y-%m-%d'),
+            **daily,
+            "exercises": exercises
+        })
+
+    return JsonResponse({
+        "payload": payload,
+        "totals": totals
+    }, status=200)
+
+
+@login_required
+@etag_data_version
+async def dashboardWeek(request):
+    """
+    Returns everything the weekly entries dashboard shows for a given date range,
+    i.e., the entries grouped by date, the bodypart distribution, the days with
+    entries, and the range's totals, all tallied in a single pass over the
+    range's entries.
+
+    If no range is provided, uses the current week (starting at Monday).
+    """
+    try:
+        end_date = returnDate(request.GET.get("endDate"), datetime.date.today())
+        start_date = returnDate(
+            request.GET.get("startDate"),
+            end_date - datetime.timedelta(days = end_date.weekday())
+            )
+    except ValueError:
+        return JsonResponse({
+            "error": "Invalid arguments to start or end date"
+        }, status=400)
+
+    entries = await Entry.objects.filter(
+        trainee=request.user,
+        timestamp__range=(start_date, end_date)
+        ).order_by("-timestamp").aserialize()
+
+    totals = {"entryCount": 0, "sets": 0, "reps": 0, "tonnage": 0}
+    exerciseCounts = {}
+    payload = []
+
+    for entry in entries:
+        day = entry.pop("date")
+        if not payload or payload[-1]["date"] != day:
+            payload.append({"date": day, "entries": []})
+        payload[-1]["entries"].append(entry)
+
+        exerciseId = entry["exercise"]["id"]
+        exerciseCounts[exerciseId] = exerciseCounts.get(exerciseId, 0) + 1
+        totals["entryCount"] += 1
+        totals["sets"] += entry["sets"]
+        totals["reps"] += entry["reps"]
+        totals["tonnage"] += entry["sets"] * entry["reps"] * entry["intensity"]
+
+    # spread the per exercise counts over the exercises' bodyparts
+    counts = {}
+    async for exerciseId, partId in Exercise.body_part.through.objects.filter(
+        exercise_id__in=exerciseCounts
+        ).values_list("exercise_id", "bodypart_id"):
+        counts[partId] = counts.get(partId, 0) + exerciseCounts[exerciseId]
+
+    bodyparts = sorted(
+        await registry.abody_parts(),
+        key=lambda part : counts.get(part.id, 0),
+        reverse=True
+    )
+
+    for day in payload:
+        day["date"] = day["date"].strftime('%Y-%m-%d')
+
+    return JsonResponse({
+        "startDate": start_date.strftime('%Y-%m-%d'),
+        "endDate": end_date.strftime('%Y-%m-%d'),
+        "payload": payload,
+        "bodyparts": [{
+            "id": part.id,
+            "name": part.name,
+            "count": counts.get(part.id, 0)
+            } for part in bodyparts],
+        "activeDays": [day["date"] for day in reversed(payload)],
+        "totals": totals
+    }, status=200)
+
+
 def returnDate(dateJson, default):
     """
     Return a datetime object or a given date json in the 'YYYY-MM-DD' format
@@ -711,6 +1023,8 @@ def returnDate(dateJson, default):
 #==============================================================================#
 
 @login_required
+@bumps_data_version
+@etag_data_version
 def exercise(request):
     """
     Handles retrieval, update, and deletion of Exercises.
@@ -727,7 +1041,7 @@ def exercise(request):
             }, status=400)
         
         try:
-            exercise = Exercise.objects.get(id=id, trainee=request.user)
+            exercise = Exercise.objects.for_table().get(id=id, trainee=request.user)
         except Exercise.DoesNotExist:
             return JsonResponse({
                 "error": "Exercise with given ID does not exist!"
@@ -757,10 +1071,6 @@ def exercise(request):
                 "error": "Exercise Name cannot be empty!"
             }, status=400)
 
-        exercise.name = name
-        exercise.description = description
-        exercise.body_part.clear()
-
         parts = data["bodyparts"]
 
         if len(parts) <= 0:
@@ -768,14 +1078,19 @@ def exercise(request):
                 "error": "Exercise must have one or more bodyparts selected!"
             }, status=400)
 
+        bodyparts = []
         for partId in parts:
             try:
-                bodypart = BodyPart.objects.get(id=partId)
+                bodyparts.append(registry.body_part(partId))
             except BodyPart.DoesNotExist:
                 return JsonResponse({
                     "error": "Bodypart with given ID does not exist!"
                 }, status=404)
-            exercise.body_part.add(bodypart)
+
+        exercise.name = name
+        exercise.description = description
+        exercise.body_part.clear()
+        exercise.body_part.add(*bodyparts)
 
         exercise.save()
         return JsonResponse({
@@ -803,7 +1118,35 @@ def exercise(request):
         }, status=201)
 
     
+def encodeCursor(exercise, direction):
+    """
+    Returns an opaque page cursor pointing just past the given exercise in the
+    given direction, either 'next' or 'prev'.
+    """
+    data = json.dumps([exercise.name, exercise.id.hex, direction])
+    return base64.urlsafe_b64encode(data.encode()).decode()
+
+
+def decodeCursor(cursor):
+    """
+    Returns the (name, id, direction) triple stored in a page cursor. Raises
+    ValueError if the cursor wasn't issued by encodeCursor.
+    """
+    try:
+        name, id, direction = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        id = uuid.UUID(id)
+    except (TypeError, ValueError):
+        raise ValueError
+    if not isinstance(name, str) or direction not in ("next", "prev"):
+        raise ValueError
+    return name, id, direction
+
+
+EXERCISES_PER_PAGE = 10
+
+
 @login_required
+@etag_data_version
 def filterExercises(request):
     """
     Returns a list of exercises filtered according to provided Bodypart, Workout,
@@ -811,19 +1154,26 @@ def filterExercises(request):
 
     Also accepts a page number and returns the contents accordingly. The filters
     can be stacked on top of each other creating an AND effect.
+
+    Passing a 'cursor' parameter instead of a page number (empty for the first
+    page) pages through the exercises by their (name, id) keys and returns the
+    nextCursor / prevCursor to follow. It never counts the exercises, so every
+    page costs the same as the first.
     """
     if request.method != 'GET':
         return JsonResponse({
             "error": "GET request only!"
         }, status=400)
 
-    exercises = Exercise.objects.filter(trainee=request.user).order_by('name')
+    exercises = Exercise.objects.for_table().filter(
+        trainee=request.user
+    ).order_by('name', 'id')
     
     # filter bodyparts
     partID = request.GET.get("bodypart")
     if partID:
         try:
-            bodypart = BodyPart.objects.get(id=partID)
+            bodypart = registry.body_part(partID)
         except BodyPart.DoesNotExist:
             return JsonResponse({
                 "error": "Body part with given ID does not exist!"
@@ -851,6 +1201,9 @@ def filterExercises(request):
                 "error": "Program with given ID does not exist!"
             }, status=404)
         exercises = exercises.filter(workout__program=program)
+
+    if "cursor" in request.GET:
+        return exercisesPage(exercises, request.GET["cursor"])
     
     pageNum = request.GET.get("pageNum")
     try:
@@ -860,8 +1213,7 @@ def filterExercises(request):
             "error": "Page number must be an integer!"
         }, status=400)
                  
-    ITEMS_PER_PAGE = 10
-    paginator = Paginator(exercises, ITEMS_PER_PAGE)
+    paginator = Paginator(exercises, EXERCISES_PER_PAGE)
     
     try:
         page = paginator.page(pageNum)
@@ -879,10 +1231,61 @@ def filterExercises(request):
     }, status=200)
 
 
+def exercisesPage(exercises, cursor):
+    """
+    Returns the page of the (name, id) ordered exercises which follows or
+    precedes the given cursor. An empty cursor returns the first page.
+    """
+    direction = "next"
+    if cursor:
+        try:
+            name, id, direction = decodeCursor(cursor)
+        except ValueError:
+            return JsonResponse({
+                "error": "Invalid page cursor!"
+            }, status=400)
+
+        if direction == "next":
+            exercises = exercises.filter(Q(name__gt=name) | Q(name=name, id__gt=id))
+        else:
+            exercises = exercises.filter(
+                Q(name__lt=name) | Q(name=name, id__lt=id)
+            ).order_by('-name', '-id')
+
+    # one extra row tells whether there's anything beyond this page
+    page = list(exercises[:EXERCISES_PER_PAGE + 1])
+    hasMore = len(page) > EXERCISES_PER_PAGE
+    page = page[:EXERCISES_PER_PAGE]
+
+    if direction == "next":
+        hasNext, hasPrevious = hasMore, bool(cursor)
+    else:
+        page.reverse()
+        hasNext, hasPrevious = True, hasMore
+
+    return JsonResponse({
+        "exercises": [exercise.table_serialize() for exercise in page],
+        "hasNext": hasNext and bool(page),
+        "hasPrevious": hasPrevious and bool(page),
+        "nextCursor": encodeCursor(page[-1], "next") if hasNext and page else None,
+        "prevCursor": encodeCursor(page[0], "prev") if hasPrevious and page else None
+    }, status=200)
+
+
 @login_required
+@etag_data_version
 def exerciseEntries(request, exerciseId):
     """
     Returns all associated entries for a given exercise.
+
+    The entries are streamed out in chunks so that long histories don't have to
+    be loaded into memory all at once.
+
+    Optionally accepts a `bucket` (day, week, or month) to aggregate the entries
+    over, and a `points` budget to downsample the series to, in which case the
+    (possibly bucketed) series is returned whole. With the `format` set to
+    `columnar`, the series is returned as parallel arrays (see
+    `series.to_columns()`).
     """
     try:
         exercise = Exercise.objects.get(id=exerciseId, trainee=request.user)
@@ -891,19 +1294,117 @@ def exerciseEntries(request, exerciseId):
             "error": "Exercise with ID does not exist!"
         }, status=404)
     
+    bucket = request.GET.get("bucket")
+    if bucket and bucket not in ("day", "week", "month"):
+        return JsonResponse({
+            "error": "Bucket must be one of day, week, or month!"
+        }, status=400)
+
+    points = request.GET.get("points")
+    if points:
+        try:
+            points = int(points)
+        except ValueError:
+            return JsonResponse({
+                "error": "Points must be an integer!"
+            }, status=400)
+
+        if points < 3:
+            return JsonResponse({
+                "error": "Points must be at least 3!"
+            }, status=400)
+
+    columnar = request.GET.get("format") == "columnar"
+
     entries = Entry.objects.filter(trainee=request.user, exercise=exercise).order_by("timestamp")
 
+    if not (bucket or points or columnar):
+        # the ASGI handler would buffer a synchronously streamed response
+        if is_asgi(request):
+            items = entries.aiter_graph_serialize(chunk_size=ENTRY_CHUNK_SIZE)
+        else:
+            items = entries.iter_graph_serialize(chunk_size=ENTRY_CHUNK_SIZE)
+        return StreamingJsonResponse({"exercise": exercise.name}, "entries", items)
+
+    if bucket:
+        series = entries.bucket_serialize(bucket)
+        intensity = "avgIntensity"
+    else:
+        series = entries.graph_serialize()
+        intensity = "intensity"
+
+    if points:
+        series = lttb(
+            series,
+            points,
+            x=lambda entry : entry["date"].toordinal(),
+            y=lambda entry : float(entry[intensity])
+        )
+
     return JsonResponse({
         "exercise": exercise.name,
-        "entries": [entry.graph_serialize() for entry in entries]
-    }, safe=False)
+        "bucket": bucket,
+        "format": "columnar" if columnar else "rows",
+        "entries": to_columns(series) if columnar else series
+    }, status=200)
 
 
 @login_required
+@etag_data_version
+def exerciseAnalytics(request, exerciseId):
+    """
+    Returns the progression analytics of a given exercise: its history as one
+    point per session with the best estimated one rep maxes, their moving
+    average over `window` sessions, their `trend` (linear or robust), and the
+    plateaus of at least `plateau` sessions without a new best (see
+    `analytics.analyze()`).
+    """
+    try:
+        exercise = Exercise.objects.get(id=uuid.UUID(str(exerciseId)), trainee=request.user)
+    except (ValueError, Exercise.DoesNotExist):
+        return JsonResponse({
+            "error": "Exercise with ID does not exist!"
+        }, status=404)
+
+    trend = request.GET.get("trend", "linear")
+    if trend not in analytics.TRENDS:
+        return JsonResponse({
+            "error": "Trend must be either linear or robust!"
+        }, status=400)
+
+    try:
+        window = int(request.GET.get("window", analytics.MOVING_AVERAGE_WINDOW))
+        plateau = int(request.GET.get("plateau", analytics.PLATEAU_SESSIONS))
+    except ValueError:
+        return JsonResponse({
+            "error": "Window and plateau must be integers!"
+        }, status=400)
+
+    if window < 1 or plateau < 1:
+        return JsonResponse({
+            "error": "Window and plateau must be at least 1!"
+        }, status=400)
+
+    history = analytics.load_history(
+        Entry.objects.filter(trainee=request.user, exercise=exercise)
+    )
+
+    return JsonResponse({
+        "exercise": exercise.name,
+        **analytics.analyze(history, window=window, trend=trend, plateau=plateau)
+    }, status=200)
+
+
+@login_required
+@bumps_data_version
 def addExercises(request):
     """
     Adds the given collection of exercises to the database. Does not do partial
     updates.
+
+    All the referenced bodyparts are validated against the reference registry,
+    then the exercises and their workout and bodypart links are bulk inserted
+    inside a single transaction.
     """
     if (request.method != 'POST'):
         return JsonResponse({
@@ -920,7 +1421,10 @@ def addExercises(request):
         }, status=404)
     
     exercises = data["exercises"]
+
     exAccumulate = []
+    workoutLinks = []
+    bodypartLinks = []
 
     for exercise in exercises:
         name = exercise["name"]
@@ -930,39 +1434,68 @@ def addExercises(request):
             }, status=400)
         
         description = exercise["description"]
-        newExercise = Exercise.objects.create(
+        newExercise = Exercise(
             trainee=request.user,
             name=name, 
             description=description
             )
-        newExercise.workout.add(workout)
+        workoutLinks.append(Exercise.workout.through(
+            exercise=newExercise,
+            workout=workout
+        ))
+
         for bodypart in exercise["bodyparts"]:
             try:
-                bp = BodyPart.objects.get(id=bodypart)
+                bp = registry.body_part(bodypart)
             except BodyPart.DoesNotExist:
                 return JsonResponse({
                     "error": f"Could not add {name}. Bodypart does not exist!"
                 }, status=404)
             
-            newExercise.body_part.add(bp)
+            bodypartLinks.append(Exercise.body_part.through(
+                exercise=newExercise,
+                bodypart=bp
+            ))
         
         exAccumulate.append(newExercise)
     
     # only save when all exercises pass the check, no partial updates
-    for exercise in exAccumulate:
-        exercise.save()
+    with transaction.atomic():
+        Exercise.objects.bulk_create(exAccumulate)
+        Exercise.workout.through.objects.bulk_create(workoutLinks)
+        Exercise.body_part.through.objects.bulk_create(bodypartLinks)
+        ChangeLog.record(request.user.pk, Exercise, [ex.id for ex in exAccumulate])
+        # bulk inserts skip the signals which move the catalog version on
+        User.bump_catalog_version([request.user.pk])
 
     return JsonResponse({
         "message": "Successfully added exercise(s)."
     }, status=201)
 
 
+@login_required
+@etag_data_version
+async def records(request):
+    """
+    Returns the user's personal records for each of their exercises, ordered by
+    the exercises' names.
+    """
+    records = PersonalRecord.objects.filter(
+        trainee=request.user
+        ).select_related("exercise").order_by("exercise__name")
+
+    return JsonResponse({
+        "records": [record.serialize() async for record in records]
+    }, status=200)
+
+
 #==============================================================================#
 #                              BODYPART ROUTES
 #==============================================================================#
 
 @login_required
-def bodypartInRange(request):
+@etag_data_version
+async def bodypartInRange(request):
     """
     Counts the number of entries for each bodypart in the given range and returns
     the tallied up data.
@@ -981,54 +1514,108 @@ def bodypartInRange(request):
             "error": "Invalid arguments to start or end date"
         }, status=400)
     
-    bodypart_counts = BodyPart.objects.annotate(
-        entry_count=Count(
-            'exercise__entry',
-            filter=Q(exercise__entry__timestamp__range=[start_date, end_date])
-        )
-    ).order_by('-entry_count')
+    # tally the trainee's entries per bodypart from their daily counters
+    counts = {part: count async for part, count in BodyPartRollup.objects.filter(
+        trainee=request.user,
+        date__range=(start_date, end_date)
+        ).values_list("body_part").annotate(Sum("entry_count"))}
+
+    bodyparts = sorted(
+        await registry.abody_parts(),
+        key=lambda part : counts.get(part.id, 0),
+        reverse=True
+    )
     
     payload = [{
         "id": part.id,
         "name": part.name,
-        "count": part.entry_count
-        } for part in bodypart_counts]
+        "count": counts.get(part.id, 0)
+        } for part in bodyparts]
     
     return JsonResponse(( {
         "data": payload
     }), status=200)
 
+@login_required
+@etag_data_version
+async def bodypartVolume(request):
+    """
+    Returns the training volume (sets x reps x intensity) per bodypart in the
+    given range, as one time series per bodypart bucketed by ISO week (the
+    default) or by month.
+
+    If no range is provided, covers the current year up to today.
+    """
+    bucket = request.GET.get("bucket", "week")
+    if bucket not in ("week", "month"):
+        return JsonResponse({
+            "error": "Bucket must be either week or month"
+        }, status=400)
+
+    try:
+        end_date = returnDate(request.GET.get("endDate"), datetime.date.today())
+        start_date = returnDate(request.GET.get("startDate"), end_date.replace(month=1, day=1))
+    except ValueError:
+        return JsonResponse({
+            "error": "Invalid arguments to start or end date"
+        }, status=400)
+
+    rows = await Entry.objects.filter(
+        trainee=request.user,
+        timestamp__range=(start_date, end_date)
+        ).abodypart_volume_serialize(bucket)
+
+    bodyparts = {part.id: part for part in await registry.abody_parts()}
+
+    series = []
+    for partId, points in itertools.groupby(rows, lambda row : row.pop("bodypart")):
+        part = bodyparts.get(partId)
+        series.append({
+            "bodypart": {"id": part.id, "name": part.name} if part else None,
+            "points": [{
+                **point,
+                "date": point["date"].strftime('%Y-%m-%d')
+                } for point in points]
+        })
+
+    return JsonResponse({
+        "bucket": bucket,
+        "startDate": start_date.strftime('%Y-%m-%d'),
+        "endDate": end_date.strftime('%Y-%m-%d'),
+        "series": series
+    }, status=200)
+
 #==============================================================================#
 #                              SEARCH ROUTES
 #==============================================================================#
 
 @login_required
-def searchExercises(request):
+@etag_data_version
+async def searchExercises(request):
     """
-    Returns relevant exercises (upto 7) matching the given exercise name search query.
+    Returns relevant exercises (upto 7) matching the given exercise name search query,
+    best matches first.
     """
     if (request.method == 'GET'):
         searchQuery = request.GET.get("q")
         searchQuery = searchQuery.strip()
-        qSet = Exercise.objects.filter(trainee=request.user)
 
         if not searchQuery:
             return JsonResponse({
                 "results": []
             }, status=200)
-        
-        qSet = qSet.filter(name__icontains=searchQuery)
 
         return JsonResponse({
-            "results": [exercise.serialize() for exercise in qSet.order_by('name')[:7]]
+            "results": await typeahead.asearch(request.user, "exercise", searchQuery, 7)
         }, status=200)
     
 
 @login_required
-def searchWorkoutAndExercises(request):
+@etag_data_version
+async def searchWorkoutAndExercises(request):
     """
     Returns relevant exercises and workouts (upto 4 each) matching the given
-    name search query.
+    name search query, best matches first.
     """
     if (request.method == 'GET'):
         searchQuery = request.GET.get("q")
@@ -1040,11 +1627,290 @@ def searchWorkoutAndExercises(request):
                 "exercises": []
             }, status=200)
         
-        exercises = Exercise.objects.filter(trainee=request.user).filter(name__icontains=searchQuery)
-        workouts = Workout.objects.filter(trainee=request.user).filter(name__icontains=searchQuery)
-
         return JsonResponse({
-            "workouts": [workout.serialize() for workout in workouts.order_by('name')[:4]],
-            "exercises": [exercise.serialize() for exercise in exercises.order_by('name')[:4]]
+            "workouts": await typeahead.asearch(request.user, "workout", searchQuery, 4),
+            "exercises": await typeahead.asearch(request.user, "exercise", searchQuery, 4)
         }, status=200)
 
+
+#==============================================================================#
+#                                SYNC ROUTES
+#==============================================================================#
+
+# the keys the synced objects of each logged model are returned under
+SYNC_KEYS = {
+    "program": "programs",
+    "workout": "workouts",
+    "exercise": "exercises",
+    "entry": "entries"
+}
+
+
+@login_required
+@etag_data_version
+def sync(request):
+    """
+    Returns the user's programs, workouts, exercises and entries which changed
+    since the given sync token, so that clients can keep a local copy of them.
+
+    Each kind of object is returned as the `saved` objects, to be inserted or
+    replaced, and the `deleted` IDs, to be removed, along with the token to
+    pass in the next time. Without a token (or with one this server never
+    handed out), everything is returned and `reset` is set, meaning the local
+    copy should be replaced as a whole.
+    """
+    since = request.GET.get("since")
+    if since is not None:
+        try:
+            since = int(since)
+            if since < 0:
+                raise ValueError
+        except ValueError:
+            return JsonResponse({
+                "error": "Invalid sync token"
+            }, status=400)
+
+    # read before the objects, so that anything changed meanwhile is sent again
+    token = ChangeLog.latest_token(request.user)
+    reset = since is None or since > token
+
+    querysets = {
+        "program": Program.objects.all(),
+        "workout": Workout.objects.prefetch_related("day"),
+        "exercise": Exercise.objects.prefetch_related(
+            Prefetch("workout", queryset=Workout.objects.only("id")),
+            "body_part"
+        ),
+        "entry": Entry.objects.all()
+    }
+    if not reset:
+        changes = ChangeLog.changes(request.user, since, token)
+
+    payload = {}
+    for model, queryset in querysets.items():
+        queryset = queryset.filter(trainee=request.user)
+        if reset:
+            deleted = set()
+        else:
+            changed, deleted = changes[model]
+            queryset = queryset.filter(pk__in=changed) if changed else queryset.none()
+
+        saved = [obj.sync_serialize() for obj in queryset]
+        if not reset:
+            # changed objects which are gone by now were deleted since
+            deleted |= changed - {obj["id"] for obj in saved}
+
+        payload[SYNC_KEYS[model]] = {
+            "saved": saved,
+            "deleted": sorted(str(id) for id in deleted)
+        }
+
+    return JsonResponse({
+        "token": str(token),
+        "reset": reset,
+        "currentProgram": request.user.current_program_id,
+        **payload
+    }, status=200)
+
+
+#==============================================================================#
+#                               EXPORT ROUTES
+#==============================================================================#
+
+@login_required
+@etag_data_version
+def exportJournal(request):
+    """
+    Streams out the user's programs, workouts, exercises and entries as NDJSON
+    (the default) or CSV, as a file download.
+
+    Optionally accepts a comma separated `kind` list (of program, workout,
+    exercise and entry) to export only those kinds of objects.
+    """
+    format = request.GET.get("format", "ndjson")
+    if format not in exporting.FORMATS:
+        return JsonResponse({
+            "error": "Format must be either csv or ndjson!"
+        }, status=400)
+
+    kinds = exporting.KINDS
+    if request.GET.get("kind"):
+        kinds = request.GET["kind"].split(",")
+        if not set(kinds) <= set(exporting.KINDS):
+            return JsonResponse({
+                "error": "Kind must be a list of program, workout, exercise or entry!"
+            }, status=400)
+        kinds = [kind for kind in exporting.KINDS if kind in kinds]
+
+    # the ASGI handler would buffer a synchronously streamed response
+    export = exporting.aexport if is_asgi(request) else exporting.export
+    return StreamingHttpResponse(
+        export(request.user, format, kinds),
+        content_type=exporting.CONTENT_TYPES[format],
+        headers={
+            "Content-Disposition": f'attachment; filename="journal.{format}"'
+        }
+    )
+
+
+#==============================================================================#
+#                                BATCH ROUTES
+#==============================================================================#
+
+# upper bound on the number of sub-requests in a single batch
+MAX_BATCH_REQUESTS = 20
+
+BATCH_METHODS = ("GET", "POST", "PUT", "DELETE")
+
+# the JSON API routes sub-requests may go to; the pages, the authentication
+# routes sharing the batch's session, the file upload and download routes and
+# the batch route itself are all left out
+BATCH_ROUTES = frozenset({
+    "program", "allPrograms", "currentProgram", "programWorkouts",
+    "workout", "workoutExercises", "workoutDay", "addExerciseToWorkout",
+    "allBodyparts", "bodypartInRange", "bodypartVolume",
+    "entry", "exerciseEntries", "entriesInRange", "entriesCalendar",
+    "entriesCalendarYear", "entriesSummary", "dashboardWeek", "entries",
+    "exercise", "addExercises", "filterExercises", "exerciseAnalytics", "records",
+    "suggestExercises", "searchWorkoutAndExercises", "sync"
+})
+
+# headers of the batch request which mustn't leak into its sub-requests
+BATCH_DROPPED_HEADERS = (
+    "CONTENT_LENGTH", "CONTENT_TYPE", "HTTP_IF_MATCH", "HTTP_IF_NONE_MATCH",
+    "HTTP_IF_MODIFIED_SINCE", "HTTP_IF_UNMODIFIED_SINCE"
+)
+
+
+def batchSubRequest(request, method, path, params, body):
+    """
+    Returns a request for a single sub-request of a batch, sharing the batch
+    request's session and user.
+    """
+    query = urlencode(params, doseq=True)
+
+    sub = HttpRequest()
+    sub.method = method
+    sub.path = sub.path_info = path
+    sub.META = {
+        key: value for key, value in request.META.items()
+        if key not in BATCH_DROPPED_HEADERS
+    }
+    sub.META.update({
+        "REQUEST_METHOD": method,
+        "PATH_INFO": path,
+        "QUERY_STRING": query,
+        "CONTENT_TYPE": "application/json",
+        "CONTENT_LENGTH": str(len(body)),
+    })
+    sub.GET = QueryDict(query)
+    sub.POST = QueryDict()
+    sub.COOKIES = request.COOKIES
+    sub._body = body
+
+    # the batch request already went through the middleware
+    sub.session = request.session
+    sub.user = request.user
+    sub.csrf_processing_done = True
+
+    async def auser():
+        return request.user
+    sub.auser = auser
+
+    return sub
+
+
+def batchDispatch(request, item):
+    """
+    Runs a single sub-request of a batch through its view and returns its
+    result, i.e., the status code and the decoded response body.
+    """
+    if not isinstance(item, dict):
+        return {"status": 400, "body": {"error": "Sub-request must be an object!"}}
+
+    path = item.get("path")
+    method = str(item.get("method", "GET")).upper()
+    params = item.get("params") or {}
+    if (not isinstance(path, str) or method not in BATCH_METHODS or
+        not isinstance(params, dict)):
+        return {"status": 400, "body": {"error": "Invalid sub-request!"}}
+
+    path = "/" + path.lstrip("/")
+    try:
+        match = resolve(path)
+    except Resolver404:
+        return {"status": 404, "body": {"error": f"No such route {path}"}}
+    # the view name carries the namespace, so that the admin's routes never
+    # pass for the journal's
+    if match.view_name not in BATCH_ROUTES:
+        return {"status": 400, "body": {"error": f"Route {path} cannot be batched!"}}
+
+    body = json.dumps(item["body"]).encode() if "body" in item else b""
+    sub = batchSubRequest(request, method, path, params, body)
+    sub.resolver_match = match
+
+    view = match.func
+    if iscoroutinefunction(view):
+        view = async_to_sync(view)
+    try:
+        response = view(sub, *match.args, **match.kwargs)
+        if response.streaming:
+            content = b"".join(response.streaming_content)
+        else:
+            content = response.content
+    except Exception as exc:
+        # a failing sub-request mustn't turn the whole batch into an error page
+        logger.error(
+            "Internal Server Error: %s", path, exc_info=exc,
+            extra={"status_code": 500, "request": sub}
+        )
+        return {"status": 500, "body": {"error": "Sub-request failed!"}}
+    finally:
+        if method != "GET":
+            # the shared user must see its own writes' versions, so that the
+            # later sub-requests aren't served the trees cached before them
+            request.user.refresh_from_db(fields=["data_version", "catalog_version"])
+
+    if response.get("Content-Type", "").startswith("application/json"):
+        payload = json.loads(content)
+    else:
+        payload = content.decode(response.charset)
+
+    return {"status": response.status_code, "body": payload}
+
+
+@login_required
+def batch(request):
+    """
+    Runs a list of sub-requests against the JSON API (see BATCH_ROUTES) in a
+    single round trip and returns all their results, in order.
+
+    Each sub-request is given as {"path", "method", "params", "body"}, where only
+    the path is required, the params become its query string, and the body is
+    sent as JSON. Each result carries the sub-request's own status code next to
+    its decoded response body.
+    """
+    if (request.method != 'POST'):
+        return JsonResponse({
+            "error": "Post request required!"
+        }, status=400)
+
+    try:
+        requests = json.loads(request.body)["requests"]
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({
+            "error": "A list of requests is required!"
+        }, status=400)
+
+    if not isinstance(requests, list):
+        return JsonResponse({
+            "error": "A list of requests is required!"
+        }, status=400)
+    if len(requests) > MAX_BATCH_REQUESTS:
+        return JsonResponse({
+            "error": f"At most {MAX_BATCH_REQUESTS} requests can be batched!"
+        }, status=400)
+
+    return JsonResponse({
+        "results": [batchDispatch(request, item) for item in requests]
+    }, status=200)